@@ -3,27 +3,78 @@ Qdrant Dashboard Backend API
 FastAPI-based dashboard for managing Qdrant vector database
 """
 
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Depends
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Depends, Query, Request
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, FileResponse, JSONResponse
+from fastapi.responses import HTMLResponse, FileResponse, JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import Optional, List
+import asyncio
+import hashlib
 import httpx
+import json
 import os
-import tempfile
-import uuid
+import time
+from contextlib import asynccontextmanager
 from pathlib import Path
 from customer_manager import CustomerManager, Customer
-from embedding_service import get_embedding_service
-from qdrant_client import QdrantClient
-from qdrant_client.models import PointStruct
+from document_index import create_document_index, build_document_entry, with_size_mb
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.models import FieldCondition, Filter, FilterSelector, MatchValue
+from qdrant_http import QdrantHTTPPool
+from ingestion import (
+    BYTES_PER_MB,
+    EMBEDDING_BACKEND,
+    MAX_UPLOAD_MB,
+    UPSERT_BATCH_SIZE,
+    BatchUpserter,
+    build_collection_config,
+    build_point_payload,
+    cache_n8n_embeddings,
+    embed_document_locally,
+    iter_n8n_embeddings,
+    local_embedding_dimension,
+    local_embedding_stats,
+    shutdown_embedding_executor,
+    start_local_embedding_warmup,
+    upload_size
+)
+from response_cache import ResponseCache
+from embedding_cache import get_embedding_cache
+from search import (
+    SEARCH_DEFAULT_LIMIT,
+    SEARCH_MAX_LIMIT,
+    SEARCH_SCORE_THRESHOLD,
+    build_search_request,
+    build_sparse_search_request,
+    embed_query,
+    hybrid_candidates,
+    parse_fields,
+    query_cache,
+    run_search_batch
+)
+from sparse import SPARSE_VECTOR_NAME, reciprocal_rank_fusion
+from reranker import RERANK_BUDGET_MS, RERANK_DEFAULT, RERANK_TOP_K, rerank, shutdown_rerank_executor
+from job_queue import JobQueue, PermanentJobError
+from metrics import (
+    MetricsMiddleware,
+    N8N_DURATION,
+    QDRANT_ERRORS,
+    QDRANT_LATENCY,
+    UPLOAD_BYTES,
+    UPLOAD_CHUNKS,
+    cache_stats,
+    monitor_event_loop_lag,
+    qdrant_endpoint_label,
+    render_metrics
+)
 from auth import (
-    authenticate_user,
+    authenticate_user_async,
     create_access_token,
     get_current_user,
     get_current_admin_user,
-    change_user_password
+    change_user_password_async,
+    get_token_cache_stats
 )
 
 # Configuration
@@ -31,23 +82,87 @@ QDRANT_URL = os.getenv("QDRANT_URL", "https://qdrant.turklawai.com")
 QDRANT_API_KEY = os.getenv("QDRANT_API_KEY", "PVrZ8QZkHrn4MFCvlZRhor1DMuoDr5l6")
 N8N_WEBHOOK_URL = os.getenv("N8N_WEBHOOK_URL", "")  # n8n embedding webhook
 PORT = int(os.getenv("PORT", 8081))
+DOCUMENT_SCAN_PAGE_SIZE = int(os.getenv("DOCUMENT_SCAN_PAGE_SIZE", 1000))  # Points per scroll page
+OVERVIEW_CONCURRENCY = int(os.getenv("OVERVIEW_CONCURRENCY", 16))  # Parallel collection lookups for the overview
+DOCUMENT_RECONCILE_INTERVAL = int(os.getenv("DOCUMENT_RECONCILE_INTERVAL", 0))  # Seconds, 0 disables
+TRUSTED_PROXY_COUNT = int(os.getenv("TRUSTED_PROXY_COUNT", 0))  # Reverse proxies appending X-Forwarded-For
 
 # Initialize services
 customer_manager = CustomerManager()
-embedding_service = None  # Lazy load
-qdrant_client = None  # Lazy load
+document_index = create_document_index()
+async_qdrant_client = None  # Lazy load
+qdrant_pool = QdrantHTTPPool(QDRANT_URL, QDRANT_API_KEY if QDRANT_API_KEY else None)
+qdrant_cache = ResponseCache()
+embedding_cache = get_embedding_cache()
+
+def get_async_qdrant_client() -> AsyncQdrantClient:
+    """Get or create async Qdrant client"""
+    global async_qdrant_client
+    if async_qdrant_client is None:
+        async_qdrant_client = AsyncQdrantClient(url=QDRANT_URL, api_key=QDRANT_API_KEY if QDRANT_API_KEY else None)
+    return async_qdrant_client
+
+
+async def reconcile_document_index(customer: Customer) -> int:
+    """Rebuild a customer's document manifest from a scroll of their collection"""
+    documents, _ = await scan_collection_documents(customer.collection_name)
+    document_index.replace_customer(customer.customer_id, list(documents.values()))
+    return len(documents)
+
+
+async def reconcile_all_document_indexes() -> dict:
+    """Rebuild the document manifest of every customer"""
+    results = {}
+    for customer in customer_manager.get_all_customers():
+        try:
+            results[customer.customer_id] = await reconcile_document_index(customer)
+        except Exception as e:
+            results[customer.customer_id] = f"error: {e}"
+    return results
+
+
+async def document_reconcile_loop():
+    """Periodically reconcile document manifests with Qdrant"""
+    while True:
+        await asyncio.sleep(DOCUMENT_RECONCILE_INTERVAL)
+        try:
+            results = await reconcile_all_document_indexes()
+            print(f"[*] Document index reconciled for {len(results)} customers")
+        except Exception as e:
+            print(f"[!] Document index reconcile failed: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open shared resources on startup and release them on shutdown"""
+    global async_qdrant_client
+    await qdrant_pool.start()
+    reconcile_task = None
+    if DOCUMENT_RECONCILE_INTERVAL > 0:
+        reconcile_task = asyncio.create_task(document_reconcile_loop())
+    if EMBEDDING_BACKEND == "local":
+        start_local_embedding_warmup()
+    loop_lag_task = asyncio.create_task(monitor_event_loop_lag())
+    await job_queue.start()
+    yield
+    await job_queue.stop()
+    shutdown_embedding_executor()
+    shutdown_rerank_executor()
+    loop_lag_task.cancel()
+    if reconcile_task is not None:
+        reconcile_task.cancel()
+    customer_manager.flush()
+    await qdrant_pool.close()
+    if async_qdrant_client is not None:
+        await async_qdrant_client.close()
+        async_qdrant_client = None
 
-def get_qdrant_client():
-    """Get or create Qdrant client"""
-    global qdrant_client
-    if qdrant_client is None:
-        qdrant_client = QdrantClient(url=QDRANT_URL, api_key=QDRANT_API_KEY if QDRANT_API_KEY else None)
-    return qdrant_client
 
 app = FastAPI(
     title="Qdrant Dashboard API",
     description="Management dashboard for Qdrant vector database with multi-tenant support",
-    version="2.0.0"
+    version="2.0.0",
+    lifespan=lifespan
 )
 
 # Pydantic models
@@ -83,37 +198,90 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Prometheus request metrics for every route
+app.add_middleware(MetricsMiddleware)
+
+# Cache hit ratios exported on /metrics
+cache_stats.register("qdrant_response", lambda: qdrant_cache.stats())
+cache_stats.register("auth_token", get_token_cache_stats)
+cache_stats.register("query_embedding", query_cache.stats)
+if embedding_cache is not None:
+    cache_stats.register("embedding", embedding_cache.stats)
+
 # Static files
 BASE_DIR = Path(__file__).resolve().parent
 app.mount("/static", StaticFiles(directory=BASE_DIR / "static"), name="static")
 
 
 # Helper function for Qdrant API calls
-async def qdrant_request(endpoint: str, method: str = "GET", data: dict = None):
-    """Make authenticated requests to Qdrant API"""
-    headers = {}
-    if QDRANT_API_KEY:
-        headers["api-key"] = QDRANT_API_KEY
-
-    url = f"{QDRANT_URL}/{endpoint.lstrip('/')}"
+async def qdrant_request(endpoint: str, method: str = "GET", data: dict = None, timeout: float = None):
+    """Make authenticated requests to Qdrant API through the shared connection pool"""
+    if method not in ("GET", "POST", "PUT", "DELETE"):
+        raise ValueError(f"Unsupported method: {method}")
 
+    label = qdrant_endpoint_label(endpoint)
+    started = time.perf_counter()
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            if method == "GET":
-                response = await client.get(url, headers=headers)
-            elif method == "POST":
-                response = await client.post(url, json=data, headers=headers)
-            elif method == "PUT":
-                response = await client.put(url, json=data, headers=headers)
-            elif method == "DELETE":
-                response = await client.delete(url, headers=headers)
-            else:
-                raise ValueError(f"Unsupported method: {method}")
-
-            response.raise_for_status()
-            return response.json()
+        response = await qdrant_pool.request(
+            method,
+            endpoint,
+            json=data if method in ("POST", "PUT") else None,
+            timeout=timeout
+        )
+        response.raise_for_status()
+        return response.json()
     except httpx.HTTPError as e:
+        QDRANT_ERRORS.labels(method, label).inc()
         raise HTTPException(status_code=500, detail=f"Qdrant API error: {str(e)}")
+    finally:
+        QDRANT_LATENCY.labels(method, label).observe(time.perf_counter() - started)
+
+
+_proxy_warning_shown = False
+
+
+def get_client_ip(request: Request) -> Optional[str]:
+    """
+    Client IP for per-IP throttling
+
+    Only the X-Forwarded-For hops appended by the TRUSTED_PROXY_COUNT
+    proxies in front of the app are trusted; anything to their left is
+    client-controlled. Without trusted proxies the socket peer is used,
+    unless the request came through a proxy anyway (X-Forwarded-For set):
+    then the peer is the proxy shared by every client, and None is
+    returned so no per-IP limit is keyed on it.
+    """
+    global _proxy_warning_shown
+    forwarded_for = request.headers.get("x-forwarded-for", "")
+    if TRUSTED_PROXY_COUNT > 0:
+        hops = [hop.strip() for hop in forwarded_for.split(",") if hop.strip()]
+        if len(hops) >= TRUSTED_PROXY_COUNT:
+            return hops[-TRUSTED_PROXY_COUNT]
+    elif forwarded_for:
+        if not _proxy_warning_shown:
+            _proxy_warning_shown = True
+            print("[!] Requests arrive through a proxy but TRUSTED_PROXY_COUNT=0; "
+                  "per-IP login throttling is off until it is set")
+        return None
+    return request.client.host if request.client else None
+
+
+async def get_collection_params(collection_name: str) -> dict:
+    """Config params of a collection (from the cached collection info)"""
+    endpoint = f"/collections/{collection_name}"
+    info = await qdrant_cache.get_or_fetch("collection", endpoint, lambda: qdrant_request(endpoint))
+    return info.get("result", {}).get("config", {}).get("params", {})
+
+
+def dense_vector_size(params: dict) -> Optional[int]:
+    """Size of the unnamed dense vector in collection params"""
+    vectors = params.get("vectors", {})
+    return vectors.get("size") if isinstance(vectors, dict) else None
+
+
+def has_sparse_vectors(params: dict) -> bool:
+    """Whether the collection stores BM25 sparse vectors"""
+    return SPARSE_VECTOR_NAME in (params.get("sparse_vectors") or {})
 
 
 # Routes
@@ -137,10 +305,24 @@ async def health_check():
     """Check dashboard API health"""
     return {
         "status": "healthy",
-        "qdrant_url": QDRANT_URL
+        "qdrant_url": QDRANT_URL,
+        "qdrant_pool": qdrant_pool.stats(),
+        "auth_cache": get_token_cache_stats(),
+        "response_cache": qdrant_cache.stats(),
+        "job_queue": job_queue.stats(),
+        "embedding": local_embedding_stats(),
+        "embedding_cache": embedding_cache.stats() if embedding_cache else {"enabled": False},
+        "query_cache": query_cache.stats()
     }
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics of this dashboard process"""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+
 @app.get("/api/debug/users")
 async def debug_users():
     """Debug endpoint to check users.json"""
@@ -183,13 +365,17 @@ async def debug_users():
 # ============================================
 
 @app.post("/api/auth/login", response_model=TokenResponse)
-async def login(login_data: LoginRequest):
+async def login(login_data: LoginRequest, request: Request):
     """
     Authenticate user and return JWT token
     Default credentials: admin / admin123
     """
     try:
-        user = authenticate_user(login_data.username, login_data.password)
+        user = await authenticate_user_async(
+            login_data.username,
+            login_data.password,
+            client_ip=get_client_ip(request)
+        )
 
         if not user:
             raise HTTPException(
@@ -230,7 +416,7 @@ async def change_password(
     """Change current user's password"""
     username = current_user["username"]
 
-    success = change_user_password(
+    success = await change_user_password_async(
         username,
         password_data.old_password,
         password_data.new_password
@@ -258,7 +444,7 @@ async def get_current_user_info(current_user: dict = Depends(get_current_user)):
 async def qdrant_status():
     """Get Qdrant instance status"""
     try:
-        result = await qdrant_request("/")
+        result = await qdrant_cache.get_or_fetch("status", "/", lambda: qdrant_request("/"))
         return {
             "status": "online",
             "data": result
@@ -274,17 +460,67 @@ async def qdrant_status():
 async def get_collections():
     """Get all collections from Qdrant"""
     try:
-        result = await qdrant_request("/collections")
+        result = await qdrant_cache.get_or_fetch(
+            "collections", "/collections", lambda: qdrant_request("/collections")
+        )
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/qdrant/collections/overview")
+async def get_collections_overview(request: Request, fields: Optional[str] = None):
+    """
+    Get all collections with their details in one response
+
+    Details are fetched from Qdrant concurrently, at most OVERVIEW_CONCURRENCY
+    at a time. fields is an optional comma-separated list of collection info
+    fields to return (e.g. "points_count,config"). Supports ETag/If-None-Match.
+    """
+    try:
+        listing = await qdrant_cache.get_or_fetch(
+            "collections", "/collections", lambda: qdrant_request("/collections")
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    names = [c["name"] for c in (listing.get("result") or {}).get("collections", [])]
+    selected = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+    semaphore = asyncio.Semaphore(OVERVIEW_CONCURRENCY)
+
+    async def fetch_details(name: str) -> dict:
+        endpoint = f"/collections/{name}"
+        async with semaphore:
+            try:
+                detail = await qdrant_cache.get_or_fetch(
+                    "collection", endpoint, lambda: qdrant_request(endpoint)
+                )
+            except Exception as e:
+                return {"name": name, "error": getattr(e, "detail", str(e))}
+
+        info = detail.get("result") or {}
+        if selected is not None:
+            info = {field: info.get(field) for field in selected}
+        return {"name": name, **info}
+
+    collections = await asyncio.gather(*(fetch_details(name) for name in names))
+    body = {"collections": list(collections), "total": len(collections)}
+
+    etag = '"' + hashlib.sha1(json.dumps(body, sort_keys=True, default=str).encode()).hexdigest() + '"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+
+    return JSONResponse(body, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+
 @app.get("/api/qdrant/collections/{collection_name}")
 async def get_collection_info(collection_name: str):
     """Get specific collection information"""
     try:
-        result = await qdrant_request(f"/collections/{collection_name}")
+        endpoint = f"/collections/{collection_name}"
+        result = await qdrant_cache.get_or_fetch(
+            "collection", endpoint, lambda: qdrant_request(endpoint)
+        )
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -299,6 +535,7 @@ async def create_collection(collection_name: str, config: dict):
             method="PUT",
             data=config
         )
+        qdrant_cache.invalidate("/collections")
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -312,6 +549,7 @@ async def delete_collection(collection_name: str):
             f"/collections/{collection_name}",
             method="DELETE"
         )
+        qdrant_cache.invalidate("/collections")
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -321,7 +559,7 @@ async def delete_collection(collection_name: str):
 async def get_cluster_info():
     """Get cluster information"""
     try:
-        result = await qdrant_request("/cluster")
+        result = await qdrant_cache.get_or_fetch("cluster", "/cluster", lambda: qdrant_request("/cluster"))
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -331,7 +569,7 @@ async def get_cluster_info():
 async def get_telemetry():
     """Get Qdrant telemetry data"""
     try:
-        result = await qdrant_request("/telemetry")
+        result = await qdrant_cache.get_or_fetch("telemetry", "/telemetry", lambda: qdrant_request("/telemetry"))
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -341,10 +579,9 @@ async def get_telemetry():
 async def get_metrics():
     """Get Qdrant Prometheus metrics"""
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.get(f"{QDRANT_URL}/metrics")
-            response.raise_for_status()
-            return {"metrics": response.text}
+        response = await qdrant_pool.request("GET", "/metrics")
+        response.raise_for_status()
+        return {"metrics": response.text}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -363,6 +600,35 @@ async def search_points(collection_name: str, search_data: dict):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/qdrant/search/batch")
+async def search_points_batch(batch_data: dict):
+    """
+    Run many searches in one call, across one or more collections
+
+    Body: {"searches": [{"collection": name, "vector": [...], "limit": 5, ...}, ...]}
+    Searches are sent as one Qdrant search/batch request per collection,
+    collections run concurrently, and results are returned in request order.
+    """
+    searches = batch_data.get("searches")
+    if not isinstance(searches, list) or not searches:
+        raise HTTPException(status_code=400, detail="searches must be a non-empty list")
+
+    async def search_batch(collection_name: str, bodies: list) -> list:
+        result = await qdrant_request(
+            f"/collections/{collection_name}/points/search/batch",
+            method="POST",
+            data={"searches": bodies}
+        )
+        return result.get("result", [])
+
+    try:
+        results = await run_search_batch(searches, search_batch)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return {"results": results}
+
+
 # ============================================
 # Customer Management Endpoints
 # ============================================
@@ -380,7 +646,14 @@ async def get_all_customers():
 @app.get("/api/customers/stats")
 async def get_customer_stats():
     """Get customer statistics"""
-    return customer_manager.get_stats()
+    stats = customer_manager.get_stats()
+    totals = document_index.totals()
+    stats.update({
+        "indexed_documents": totals["documents"],
+        "total_chunks": totals["chunks"],
+        "total_document_mb": round(totals["bytes"] / (1024 * 1024), 2)
+    })
+    return stats
 
 
 @app.get("/api/customers/{customer_id}")
@@ -403,12 +676,11 @@ async def create_customer(customer_data: CustomerCreate):
         )
 
         # Create collection for customer in Qdrant
-        collection_config = {
-            "vectors": {
-                "size": 1536,  # Default OpenAI embedding size
-                "distance": "Cosine"
-            }
-        }
+        if EMBEDDING_BACKEND == "local":
+            vector_size = await local_embedding_dimension()
+        else:
+            vector_size = 1536  # Default OpenAI embedding size (n8n workflow)
+        collection_config = build_collection_config(vector_size)
 
         try:
             await qdrant_request(
@@ -416,6 +688,7 @@ async def create_customer(customer_data: CustomerCreate):
                 method="PUT",
                 data=collection_config
             )
+            qdrant_cache.invalidate("/collections")
         except Exception as e:
             print(f"Warning: Could not create Qdrant collection: {e}")
 
@@ -456,10 +729,12 @@ async def delete_customer(customer_id: str):
             f"/collections/{customer.collection_name}",
             method="DELETE"
         )
+        qdrant_cache.invalidate("/collections")
     except Exception as e:
         print(f"Warning: Could not delete Qdrant collection: {e}")
 
-    # Delete customer record
+    # Drop document manifest and customer record
+    document_index.drop_customer(customer_id)
     success = customer_manager.delete_customer(customer_id)
 
     return {
@@ -468,7 +743,172 @@ async def delete_customer(customer_id: str):
     }
 
 
-@app.post("/api/customers/{customer_id}/upload")
+async def iter_job_embeddings(job: dict, customer: Customer):
+    """
+    Yield embedding items for a stored upload from EMBEDDING_BACKEND
+
+    Both backends produce the n8n payload schema:
+    [{ id, text, embedding, chunk_index, chunk_total, metadata, ... }]
+    """
+    filename = job["filename"]
+
+    if EMBEDDING_BACKEND == "local":
+        print(f"[*] Embedding document locally: {filename}")
+        items = await embed_document_locally(job["file_path"], Path(filename).suffix.lower())
+        print(f"[*] Local embedding complete")
+        for item in items:
+            yield item
+        return
+
+    print(f"[*] Sending document to n8n webhook: {filename}")
+    started = time.perf_counter()
+
+    try:
+        # Stream the stored upload to n8n and yield items as the response is parsed
+        async with httpx.AsyncClient(timeout=300.0) as http_client:
+            with open(job["file_path"], 'rb') as upload:
+                # Prepare multipart form data
+                files = {
+                    'file': (filename, upload, job["content_type"])
+                }
+                data = {
+                    'customer_id': customer.customer_id,
+                    'customer_name': customer.name,
+                    'customer_email': customer.email,
+                    'description': job["description"] or '',
+                    'collection_name': customer.collection_name
+                }
+
+                async with http_client.stream("POST", N8N_WEBHOOK_URL, files=files, data=data) as response:
+                    response.raise_for_status()
+                    # Record embeddings in the embedding cache one upsert batch at a time
+                    pending = []
+                    async for item in iter_n8n_embeddings(response):
+                        pending.append(item)
+                        if len(pending) >= UPSERT_BATCH_SIZE:
+                            for cached_item in await cache_n8n_embeddings(pending):
+                                yield cached_item
+                            pending = []
+                    for cached_item in await cache_n8n_embeddings(pending):
+                        yield cached_item
+    except Exception:
+        N8N_DURATION.labels("error").observe(time.perf_counter() - started)
+        raise
+
+    # Covers the streamed response, including time spent upserting between items
+    N8N_DURATION.labels("success").observe(time.perf_counter() - started)
+    print(f"[*] n8n processing complete")
+
+
+async def delete_job_points(client: AsyncQdrantClient, collection_name: str, job_id: str):
+    """Delete every point written by an ingestion job"""
+    await client.delete(
+        collection_name=collection_name,
+        points_selector=FilterSelector(filter=Filter(must=[
+            FieldCondition(key="job_id", match=MatchValue(value=job_id))
+        ]))
+    )
+
+
+async def run_ingestion_job(job: dict, progress) -> dict:
+    """
+    Ingestion job handler: embed the stored upload (n8n or local), upsert
+    the embeddings in batches and update usage accounting
+    """
+    customer_id = job["customer_id"]
+    customer = customer_manager.get_customer(customer_id)
+    if not customer:
+        raise PermanentJobError("Customer not found")
+
+    client = get_async_qdrant_client()
+    if job["attempts"] > 1:
+        # Remove points left behind by an interrupted earlier attempt
+        await delete_job_points(client, customer.collection_name, job["job_id"])
+
+    filename = job["filename"]
+    description = job["description"]
+    file_size_mb = job["size_bytes"] / BYTES_PER_MB
+    point_ids = []
+    cached_chunks = 0
+    first_item = None
+    collection_params = await get_collection_params(customer.collection_name)
+    upserter = BatchUpserter(
+        client,
+        customer.collection_name,
+        on_progress=lambda upserted: progress(upserted, first_item.get('chunk_total') if first_item else None),
+        sparse=has_sparse_vectors(collection_params)
+    )
+
+    try:
+        # Upsert points as embeddings arrive from the selected backend
+        async for item in iter_job_embeddings(job, customer):
+            if first_item is None:
+                first_item = {k: v for k, v in item.items() if k != 'embedding'}
+            point_ids.append(item['id'])
+            cached_chunks += 1 if item.get('cached') else 0
+            await upserter.add(item['id'], item['embedding'], build_point_payload(
+                item, customer_id, filename, description, file_size_mb, job_id=job["job_id"]
+            ))
+
+        if not point_ids:
+            raise Exception(f"No embeddings returned from {EMBEDDING_BACKEND}")
+
+        # Upload remaining points to Qdrant collection
+        batch_count = await upserter.finish()
+        progress(upserter.points_upserted, len(point_ids))
+    except Exception:
+        await upserter.abort()
+        raise
+
+    # Update usage; add_usage refuses increments beyond the quota
+    if not customer_manager.add_usage(customer_id, file_size_mb):
+        # cleanup_failed_job removes the points
+        raise PermanentJobError("Quota exceeded, uploaded points were removed")
+    customer_manager.increment_document_count(customer_id)
+    qdrant_cache.invalidate(f"/collections/{customer.collection_name}")
+
+    # Record document in the customer's manifest
+    document_index.record_upload(customer_id, build_document_entry(
+        filename=filename,
+        point_ids=point_ids,
+        size_bytes=job["size_bytes"],
+        description=description,
+        embedding_model=first_item.get('embedding_model')
+    ))
+
+    UPLOAD_BYTES.labels(EMBEDDING_BACKEND).inc(job["size_bytes"])
+    UPLOAD_CHUNKS.labels(EMBEDDING_BACKEND).inc(len(point_ids))
+
+    print(f"[*] Document uploaded successfully: {len(point_ids)} chunks in {batch_count} batches")
+
+    return {
+        "file_name": filename,
+        "size_mb": round(file_size_mb, 2),
+        "chunks_created": len(point_ids),
+        "embedding_model": first_item.get('embedding_model', 'unknown'),
+        "embedding_dim": first_item.get('embedding_dim', 1536),
+        "embedding_cache": {
+            "hits": cached_chunks,
+            "misses": len(point_ids) - cached_chunks,
+            "hit_rate": round(cached_chunks / len(point_ids), 3)
+        }
+    }
+
+
+async def cleanup_failed_job(job: dict):
+    """Remove the points a failed ingestion job upserted before it gave up"""
+    customer = customer_manager.get_customer(job["customer_id"])
+    if not customer:
+        return
+    await delete_job_points(get_async_qdrant_client(), customer.collection_name, job["job_id"])
+    qdrant_cache.invalidate(f"/collections/{customer.collection_name}")
+    print(f"[*] Removed points of failed ingestion job {job['job_id']}")
+
+
+job_queue = JobQueue(run_ingestion_job, on_failed=cleanup_failed_job)
+
+
+@app.post("/api/customers/{customer_id}/upload", status_code=202)
 async def upload_document(
     customer_id: str,
     file: UploadFile = File(...),
@@ -479,161 +919,176 @@ async def upload_document(
 
     Process:
     1. Validate customer and quota
-    2. Send file to n8n webhook for processing
-    3. n8n returns embeddings
-    4. Write embeddings to Qdrant
-    5. Update customer usage
+    2. Store the file and queue an ingestion job (returned immediately)
+    3. A worker sends the file to n8n, which returns embeddings
+    4. Embeddings are written to Qdrant in batches
+    5. Customer usage is updated
+
+    Poll GET /api/jobs/{job_id} for progress.
     """
     customer = customer_manager.get_customer(customer_id)
     if not customer:
         raise HTTPException(status_code=404, detail="Customer not found")
 
-    # Read file
-    content = await file.read()
-    file_size_mb = len(content) / (1024 * 1024)
-
-    # Check quota
-    if customer.used_mb + file_size_mb > customer.quota_mb:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Quota exceeded. Used: {customer.used_mb}MB, Limit: {customer.quota_mb}MB"
-        )
-
     # Get file extension
     file_extension = Path(file.filename).suffix.lower()
     if file_extension not in ['.pdf', '.txt', '.doc', '.docx']:
         raise HTTPException(status_code=400, detail="Unsupported file type. Use PDF, TXT, DOC, or DOCX")
 
     # Check n8n webhook configured
-    if not N8N_WEBHOOK_URL:
+    if EMBEDDING_BACKEND == "n8n" and not N8N_WEBHOOK_URL:
         raise HTTPException(status_code=500, detail="N8N_WEBHOOK_URL not configured")
 
-    try:
-        print(f"[*] Sending document to n8n webhook: {file.filename}")
+    # Queued and running uploads are not in used_mb yet, so they reserve quota too
+    remaining_bytes = int(max(customer.quota_mb - customer.used_mb, 0) * BYTES_PER_MB)
+    remaining_bytes = max(remaining_bytes - job_queue.pending_bytes(customer_id), 0)
+    max_upload_bytes = int(MAX_UPLOAD_MB * BYTES_PER_MB)
+    file_size = upload_size(file)
 
-        # Send to n8n webhook
-        async with httpx.AsyncClient(timeout=300.0) as client:
-            # Prepare multipart form data
-            files = {
-                'file': (file.filename, content, file.content_type)
-            }
-            data = {
-                'customer_id': customer_id,
-                'customer_name': customer.name,
-                'customer_email': customer.email,
-                'description': description or '',
-                'collection_name': customer.collection_name
-            }
-
-            response = await client.post(
-                N8N_WEBHOOK_URL,
-                files=files,
-                data=data
-            )
-            response.raise_for_status()
-            n8n_result = response.json()
-
-        print(f"[*] n8n processing complete")
-
-        # n8n returns embeddings in format: [{ id, text, embedding, metadata }]
-        embeddings_data = n8n_result.get('embeddings', [])
-
-        if not embeddings_data:
-            raise HTTPException(status_code=500, detail="No embeddings returned from n8n")
-
-        # Upload to Qdrant
-        client = get_qdrant_client()
-
-        points = []
-        for item in embeddings_data:
-            points.append(
-                PointStruct(
-                    id=item['id'],
-                    vector=item['embedding'],
-                    payload={
-                        "customer_id": customer_id,
-                        "filename": file.filename,
-                        "text": item['text'],
-                        "kind": item.get('kind', 'document'),
-                        "question": item.get('question'),
-                        "answer": item.get('answer'),
-                        "chunk_index": item.get('chunk_index', 0),
-                        "chunk_total": item.get('chunk_total', 1),
-                        "description": description or "",
-                        "file_size_mb": file_size_mb,
-                        "metadata": item.get('metadata', {})
-                    }
-                )
-            )
-
-        # Upload to Qdrant collection
-        client.upsert(
-            collection_name=customer.collection_name,
-            points=points
+    # Check quota
+    if file_size > remaining_bytes:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Quota exceeded. Used: {customer.used_mb}MB, Limit: {customer.quota_mb}MB"
+        )
+    if file_size > max_upload_bytes:
+        raise HTTPException(status_code=413, detail=f"File too large. Limit: {MAX_UPLOAD_MB}MB")
+
+    job = await job_queue.enqueue(
+        customer_id=customer_id,
+        filename=file.filename,
+        file_obj=file.file,
+        size_bytes=file_size,
+        content_type=file.content_type,
+        description=description,
+        byte_limit=int(max(customer.quota_mb - customer.used_mb, 0) * BYTES_PER_MB)
+    )
+    if job is None:
+        # A concurrent upload reserved the remaining quota first
+        raise HTTPException(
+            status_code=400,
+            detail=f"Quota exceeded. Used: {customer.used_mb}MB, Limit: {customer.quota_mb}MB (including queued uploads)"
         )
 
-        # Update usage
-        customer_manager.add_usage(customer_id, file_size_mb)
-        customer_manager.increment_document_count(customer_id)
+    print(f"[*] Queued ingestion job {job['job_id']} for {file.filename}")
 
-        print(f"[*] Document uploaded successfully: {len(points)} chunks")
+    return {
+        "success": True,
+        "message": "Document queued for embedding",
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "status_url": f"/api/jobs/{job['job_id']}",
+        "file_name": file.filename,
+        "size_mb": round(file_size / BYTES_PER_MB, 2)
+    }
 
-        return {
-            "success": True,
-            "message": "Document uploaded and embedded successfully",
-            "file_name": file.filename,
-            "size_mb": round(file_size_mb, 2),
-            "chunks_created": len(points),
-            "embedding_model": embeddings_data[0].get('embedding_model', 'unknown'),
-            "embedding_dim": embeddings_data[0].get('embedding_dim', 1536),
-            "customer": customer_manager.get_customer(customer_id).to_dict()
-        }
 
-    except httpx.HTTPError as e:
-        print(f"[!] n8n webhook error: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"n8n processing failed: {str(e)}")
-    except Exception as e:
-        print(f"[!] Upload error: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Get ingestion job status and progress (chunks upserted/total)"""
+    job = job_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
 
 
-@app.get("/api/customers/{customer_id}/documents")
-async def get_customer_documents(customer_id: str):
-    """Get list of documents for a customer from their Qdrant collection"""
-    customer = customer_manager.get_customer(customer_id)
-    if not customer:
-        raise HTTPException(status_code=404, detail="Customer not found")
+@app.get("/api/customers/{customer_id}/jobs")
+async def get_customer_jobs(customer_id: str, limit: int = 50):
+    """Get recent ingestion jobs for a customer"""
+    return {
+        "customer_id": customer_id,
+        "jobs": job_queue.list_for_customer(customer_id, max(min(limit, 500), 1))
+    }
 
-    try:
-        client = get_qdrant_client()
 
-        # Scroll through collection to get unique documents
-        scroll_result = client.scroll(
-            collection_name=customer.collection_name,
-            limit=100,
-            with_payload=True,
+async def scan_collection_documents(collection_name: str) -> tuple:
+    """
+    Scroll through the whole collection page by page and group chunks by filename
+
+    Only the payload fields needed for the listing are requested, and
+    documents are aggregated as pages arrive. A filename uploaded several
+    times counts the bytes of each upload (told apart by job_id), like
+    the manifest and used_mb do.
+    Returns (document manifest entries keyed by filename, total chunk count).
+    """
+    client = get_async_qdrant_client()
+    documents = {}
+    upload_jobs = {}  # filename -> job_ids seen, to count each upload's bytes once
+    total_chunks = 0
+    offset = None
+
+    while True:
+        points, offset = await client.scroll(
+            collection_name=collection_name,
+            limit=DOCUMENT_SCAN_PAGE_SIZE,
+            offset=offset,
+            with_payload=["filename", "description", "file_size_mb", "embedding_model", "job_id"],
             with_vectors=False
         )
 
-        # Group by filename
-        documents = {}
-        for point in scroll_result[0]:
-            filename = point.payload.get("filename", "unknown")
+        for point in points:
+            payload = point.payload or {}
+            filename = payload.get("filename", "unknown")
+            point_id = str(point.id)
             if filename not in documents:
                 documents[filename] = {
                     "filename": filename,
                     "chunks": 0,
-                    "description": point.payload.get("description", ""),
-                    "file_size_mb": point.payload.get("file_size_mb", 0)
+                    "first_point_id": point_id,
+                    "last_point_id": point_id,
+                    "bytes": 0,
+                    "description": payload.get("description", ""),
+                    "embedding_model": payload.get("embedding_model"),
+                    "uploaded_at": None
                 }
-            documents[filename]["chunks"] += 1
+                upload_jobs[filename] = set()
+            document = documents[filename]
+            if payload.get("job_id") not in upload_jobs[filename]:
+                upload_jobs[filename].add(payload.get("job_id"))
+                document["bytes"] += int((payload.get("file_size_mb") or 0) * 1024 * 1024)
+            document["chunks"] += 1
+            document["first_point_id"] = min(document["first_point_id"], point_id)
+            document["last_point_id"] = max(document["last_point_id"], point_id)
+        total_chunks += len(points)
+
+        if offset is None:
+            break
+
+    return documents, total_chunks
+
+
+@app.get("/api/customers/{customer_id}/documents")
+async def get_customer_documents(customer_id: str, offset: int = 0, limit: int = 100, source: str = "index"):
+    """
+    Get list of documents for a customer
+
+    Served from the document manifest written at upload time. source=scan
+    scrolls the Qdrant collection instead and refreshes the manifest; this
+    also happens automatically when the manifest is empty but the customer
+    has documents (e.g. data uploaded before the manifest existed).
+    Documents are paginated with offset/limit; totals cover all documents.
+    """
+    customer = customer_manager.get_customer(customer_id)
+    if not customer:
+        raise HTTPException(status_code=404, detail="Customer not found")
+
+    offset = max(offset, 0)
+    limit = max(min(limit, 1000), 1)
+
+    try:
+        documents = document_index.list(customer_id)
+        if source == "scan" or (not documents and customer.document_count > 0):
+            await reconcile_document_index(customer)
+            documents = document_index.list(customer_id)
 
         return {
             "customer_id": customer_id,
             "collection_name": customer.collection_name,
-            "documents": list(documents.values()),
+            "documents": [with_size_mb(d) for d in documents[offset:offset + limit]],
             "total_documents": len(documents),
-            "total_chunks": len(scroll_result[0])
+            "total_chunks": sum(d["chunks"] for d in documents),
+            "offset": offset,
+            "limit": limit
         }
 
     except Exception as e:
@@ -643,10 +1098,144 @@ async def get_customer_documents(customer_id: str):
             "documents": [],
             "total_documents": 0,
             "total_chunks": 0,
+            "offset": offset,
+            "limit": limit,
             "error": str(e)
         }
 
 
+@app.get("/api/customers/{customer_id}/search")
+async def search_customer_documents(
+    customer_id: str,
+    q: str,
+    limit: int = SEARCH_DEFAULT_LIMIT,
+    score_threshold: Optional[float] = SEARCH_SCORE_THRESHOLD,
+    fields: Optional[str] = None,
+    mode: str = "auto",
+    rerank_results: bool = Query(RERANK_DEFAULT, alias="rerank"),
+    rerank_budget_ms: float = RERANK_BUDGET_MS
+):
+    """
+    Search a customer's documents
+
+    mode=dense embeds the query server-side with the local EmbeddingService
+    (repeated queries are served from an LRU cache of query embeddings);
+    mode=sparse matches BM25 terms; mode=hybrid fuses both with reciprocal
+    rank fusion. auto uses hybrid when the collection has sparse vectors,
+    falling back to sparse when the local model cannot embed queries for
+    the collection (n8n backend or a different vector size).
+    score_threshold applies to dense scores. fields selects the payload
+    fields returned (comma separated).
+
+    rerank=true reorders the top RERANK_TOP_K candidates with a
+    cross-encoder within rerank_budget_ms, falling back to vector order.
+    timings_ms reports the latency of each stage.
+    """
+    started = time.perf_counter()
+    timings = {}
+
+    def mark(stage: str, since: float) -> float:
+        now = time.perf_counter()
+        timings[stage] = round((now - since) * 1000, 2)
+        return now
+
+    customer = customer_manager.get_customer(customer_id)
+    if not customer:
+        raise HTTPException(status_code=404, detail="Customer not found")
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="Query must not be empty")
+    mode = mode.lower()
+    if mode not in ("auto", "dense", "sparse", "hybrid"):
+        raise HTTPException(status_code=400, detail="mode must be auto, dense, sparse or hybrid")
+
+    limit = max(min(limit, SEARCH_MAX_LIMIT), 1)
+    payload_fields = parse_fields(fields)
+    # Reranking needs the chunk text even if the caller did not ask for it
+    retrieve_fields = payload_fields if not rerank_results or "text" in payload_fields else payload_fields + ["text"]
+    retrieve_limit = max(limit, RERANK_TOP_K) if rerank_results else limit
+
+    params = await get_collection_params(customer.collection_name)
+    sparse_available = has_sparse_vectors(params)
+    if mode == "auto":
+        # Dense needs query vectors from the local model matching the collection
+        dense_usable = EMBEDDING_BACKEND == "local" and (
+            dense_vector_size(params) in (None, await local_embedding_dimension())
+        )
+        if dense_usable:
+            mode = "hybrid" if sparse_available else "dense"
+        else:
+            mode = "sparse" if sparse_available else "dense"
+    # Reject before loading the local model into the API process for nothing
+    if mode != "sparse" and EMBEDDING_BACKEND != "local":
+        raise HTTPException(
+            status_code=400,
+            detail="Dense search embeds queries with the local model and needs EMBEDDING_BACKEND=local; use mode=sparse"
+        )
+    if mode != "dense" and not sparse_available:
+        raise HTTPException(
+            status_code=400,
+            detail="Collection has no sparse vectors (created before hybrid search was enabled); use mode=dense"
+        )
+
+    candidates = hybrid_candidates(retrieve_limit) if mode == "hybrid" else retrieve_limit
+    searches = {}
+    cached = None
+    stage_start = time.perf_counter()
+    if mode in ("dense", "hybrid"):
+        vector, cached = await embed_query(q)
+        stage_start = mark("embed", stage_start)
+        vector_size = dense_vector_size(params)
+        if vector_size is not None and vector_size != len(vector):
+            raise HTTPException(
+                status_code=400,
+                detail=f"Collection vectors have {vector_size} dimensions but the query model produces {len(vector)}; "
+                       f"documents were embedded with a different model"
+            )
+        searches["dense"] = build_search_request(vector, candidates, retrieve_fields, score_threshold)
+    if mode in ("sparse", "hybrid"):
+        sparse_search = build_sparse_search_request(q, candidates, retrieve_fields)
+        if sparse_search is not None:
+            searches["sparse"] = sparse_search
+
+    rankings = {}
+    if searches:
+        result = await qdrant_request(
+            f"/collections/{customer.collection_name}/points/search/batch",
+            method="POST",
+            data={"searches": list(searches.values())}
+        )
+        rankings = dict(zip(searches, result.get("result", [])))
+    stage_start = mark("retrieve", stage_start)
+
+    if mode == "hybrid":
+        results = reciprocal_rank_fusion(rankings, retrieve_limit)
+        stage_start = mark("fuse", stage_start)
+    else:
+        results = [
+            {"id": point["id"], "score": point["score"], "payload": point.get("payload") or {}}
+            for point in rankings.get(mode, [])
+        ]
+
+    rerank_info = None
+    if rerank_results:
+        results, rerank_info = await rerank(q, results, rerank_budget_ms)
+        stage_start = mark("rerank", stage_start)
+        if "text" not in payload_fields:
+            for item in results:
+                item["payload"].pop("text", None)
+
+    mark("total", started)
+    return {
+        "customer_id": customer_id,
+        "query": q,
+        "mode": mode,
+        "cached_embedding": cached,
+        "rerank": rerank_info,
+        "timings_ms": timings,
+        "results": results[:limit]
+    }
+
+
 # Admin-only endpoints
 @app.post("/api/admin/sync-customers")
 async def sync_customers_from_data(
@@ -657,6 +1246,7 @@ async def sync_customers_from_data(
     Admin-only: Sync customers.json file with provided data
     This allows updating production customers.json without shell access
     """
+    backup_data = None
     try:
         # Validate data structure
         if "customers" not in customers_data:
@@ -665,11 +1255,11 @@ async def sync_customers_from_data(
                 detail="Invalid data format. Expected: {\"customers\": [...]}"
             )
 
-        # Backup existing file
-        backup_file = Path(customer_manager.customers_file.parent / "customers.json.backup")
-        if customer_manager.customers_file.exists():
-            import shutil
-            shutil.copy(customer_manager.customers_file, backup_file)
+        # Backup existing data
+        backup_data = customer_manager._load_data()
+        backup_file = BASE_DIR / "customers.json.backup"
+        with open(backup_file, 'w', encoding='utf-8') as f:
+            json.dump(backup_data, f, indent=2, ensure_ascii=False)
 
         # Write new data
         customer_manager._save_data(customers_data)
@@ -685,11 +1275,12 @@ async def sync_customers_from_data(
             "customers": [c.to_dict() for c in loaded_customers]
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
-        # Restore from backup if exists
-        if backup_file.exists():
-            import shutil
-            shutil.copy(backup_file, customer_manager.customers_file)
+        # Restore from backup if taken
+        if backup_data is not None:
+            customer_manager._save_data(backup_data)
 
         raise HTTPException(
             status_code=500,
@@ -697,6 +1288,29 @@ async def sync_customers_from_data(
         )
 
 
+@app.post("/api/admin/reconcile-documents")
+async def reconcile_documents(
+    customer_id: Optional[str] = None,
+    current_user: dict = Depends(get_current_admin_user)
+):
+    """Admin-only: Rebuild document manifests from the customers' Qdrant collections"""
+    if customer_id:
+        customer = customer_manager.get_customer(customer_id)
+        if not customer:
+            raise HTTPException(status_code=404, detail="Customer not found")
+        try:
+            results = {customer_id: await reconcile_document_index(customer)}
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Reconcile failed: {str(e)}")
+    else:
+        results = await reconcile_all_document_indexes()
+
+    return {
+        "success": True,
+        "documents": results
+    }
+
+
 if __name__ == "__main__":
     import uvicorn
     print(f"[*] Qdrant Dashboard starting on http://0.0.0.0:{PORT}")
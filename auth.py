@@ -3,10 +3,15 @@ Authentication module for Qdrant Dashboard
 Handles password hashing, JWT token generation, and user authentication
 """
 
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import List, Optional
+import asyncio
 import json
 import os
+import threading
+import time
 from pathlib import Path
 import bcrypt
 
@@ -14,16 +19,197 @@ from jose import JWTError, jwt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
+from storage import STORAGE_BACKEND, SQLiteUserStore, get_database
+
 # Security configuration
 SECRET_KEY = os.getenv("SECRET_KEY", "qdrant-dashboard-secret-key-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 24 hours
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", 1024))  # Validated tokens kept in memory
+TOKEN_CACHE_TTL = float(os.getenv("TOKEN_CACHE_TTL", 60))  # Seconds before a token is re-validated
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 2))  # Threads running bcrypt
+PASSWORD_HASH_QUEUE_LIMIT = int(os.getenv("PASSWORD_HASH_QUEUE_LIMIT", 16))  # Pending bcrypt jobs before 503
+LOGIN_MAX_ATTEMPTS = int(os.getenv("LOGIN_MAX_ATTEMPTS", 10))  # Per username and per IP
+LOGIN_ATTEMPT_WINDOW = float(os.getenv("LOGIN_ATTEMPT_WINDOW", 60))  # Seconds
 
 # HTTP Bearer token scheme
 security = HTTPBearer()
 
 # Users file
 USERS_FILE = Path(__file__).parent / "users.json"
+_user_store = None
+
+
+class TokenCache:
+    """
+    Bounded TTL/LRU cache of validated JWT -> user record
+
+    Entries expire after TOKEN_CACHE_TTL seconds or when the token itself
+    expires, whichever comes first. The whole cache is dropped when users
+    are saved or users.json changes on disk (mtime, inode or size).
+    Changes made by other workers are picked up within the TTL.
+    """
+
+    def __init__(self, max_size: int = TOKEN_CACHE_SIZE, ttl: float = TOKEN_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._users_file_stamp = self._stat_users_file()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _stat_users_file():
+        try:
+            stat = os.stat(USERS_FILE)
+            return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            return None
+
+    def users_file_changed(self) -> bool:
+        """Drop all entries if users.json changed since the last check"""
+        stamp = self._stat_users_file()
+        if stamp == self._users_file_stamp:
+            return False
+        self._users_file_stamp = stamp
+        self.clear()
+        return True
+
+    def get(self, token: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None or entry[0] <= time.time():
+                if entry is not None:
+                    del self._entries[token]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return dict(entry[1])
+
+    def put(self, token: str, user: dict, token_exp: Optional[float] = None):
+        expires_at = time.time() + self.ttl
+        if token_exp:
+            expires_at = min(expires_at, float(token_exp))
+        with self._lock:
+            self._entries[token] = (expires_at, dict(user))
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 3) if total else 0,
+            "invalidations": self.invalidations
+        }
+
+
+_token_cache = TokenCache()
+
+
+def get_token_cache_stats() -> dict:
+    """Get hit/miss counters of the authenticated-user cache"""
+    return _token_cache.stats()
+
+
+# bcrypt releases the GIL, so a small thread pool keeps hashing off the event loop
+_password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+_password_tasks_pending = 0
+
+
+async def run_password_task(func, *args):
+    """
+    Run a bcrypt function on the password executor
+    Raises 503 when PASSWORD_HASH_QUEUE_LIMIT jobs are already pending
+    """
+    global _password_tasks_pending
+    if _password_tasks_pending >= PASSWORD_HASH_QUEUE_LIMIT:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many login attempts in progress, try again shortly",
+            headers={"Retry-After": "1"},
+        )
+
+    _password_tasks_pending += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_password_executor, func, *args)
+    finally:
+        _password_tasks_pending -= 1
+
+
+class LoginThrottle:
+    """
+    Sliding-window limit of failed login attempts per username and per client IP
+
+    Only failures are recorded, so successful logins from a busy IP never
+    lock anyone out.
+    """
+
+    def __init__(self, max_attempts: int = LOGIN_MAX_ATTEMPTS, window: float = LOGIN_ATTEMPT_WINDOW):
+        self.max_attempts = max_attempts
+        self.window = window
+        self._attempts = {}
+
+    def _recent(self, key: str) -> deque:
+        attempts = self._attempts.setdefault(key, deque())
+        cutoff = time.time() - self.window
+        while attempts and attempts[0] < cutoff:
+            attempts.popleft()
+        return attempts
+
+    @staticmethod
+    def _keys(username: str, client_ip: Optional[str]) -> List[str]:
+        keys = [f"user:{username}"]
+        if client_ip:
+            keys.append(f"ip:{client_ip}")
+        return keys
+
+    def check(self, username: str, client_ip: Optional[str]):
+        """Raise 429 if the username or IP has too many recent failures"""
+        for key in self._keys(username, client_ip):
+            attempts = self._recent(key)
+            if len(attempts) >= self.max_attempts:
+                retry_after = int(attempts[0] + self.window - time.time()) + 1
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Too many login attempts, try again later",
+                    headers={"Retry-After": str(retry_after)},
+                )
+
+    def record_failure(self, username: str, client_ip: Optional[str]):
+        """Count a failed login against the username and IP"""
+        now = time.time()
+        for key in self._keys(username, client_ip):
+            self._recent(key).append(now)
+
+        if len(self._attempts) > 10000:
+            self._prune()
+
+    def reset(self, username: str):
+        """Forget attempts for a username after a successful login"""
+        self._attempts.pop(f"user:{username}", None)
+
+    def _prune(self):
+        for key in list(self._attempts):
+            if not self._recent(key):
+                del self._attempts[key]
+
+
+login_throttle = LoginThrottle()
 
 
 def get_password_hash(password: str) -> str:
@@ -74,18 +260,66 @@ def decode_token(token: str) -> dict:
         )
 
 
+def _default_users() -> dict:
+    """Default admin user"""
+    return {
+        "admin": {
+            "username": "admin",
+            "hashed_password": get_password_hash("admin123"),
+            "role": "admin",
+            "created_at": datetime.utcnow().isoformat()
+        }
+    }
+
+
+def _convert_users_list(users_data: list) -> dict:
+    """Convert old list format to dict keyed by username"""
+    users_dict = {}
+    for user in users_data:
+        username = user.get("username")
+        if username:
+            users_dict[username] = {
+                "username": username,
+                "hashed_password": user.get("password_hash", ""),
+                "role": user.get("role", "user"),
+                "created_at": datetime.utcnow().isoformat()
+            }
+    return users_dict
+
+
+def _get_user_store() -> Optional[SQLiteUserStore]:
+    """Get the SQLite user store, or None when STORAGE_BACKEND is json"""
+    global _user_store
+    if STORAGE_BACKEND == "json":
+        return None
+
+    if _user_store is None:
+        _user_store = SQLiteUserStore(get_database())
+        _import_users_file(_user_store)
+    return _user_store
+
+
+def _import_users_file(store: SQLiteUserStore):
+    """Pick up users.json on first start and whenever it is rewritten (init.sh, reset script)"""
+    get_database().import_json(
+        USERS_FILE,
+        lambda data: store.upsert_many(_convert_users_list(data) if isinstance(data, list) else data)
+    )
+
+
 def get_users() -> dict:
-    """Load users from file"""
+    """Load users from storage"""
+    store = _get_user_store()
+    if store is not None:
+        users = store.load()
+        if not users:
+            users = _default_users()
+            save_users(users)
+        return users
+
     if not USERS_FILE.exists():
         # Create default admin user
-        default_users = {
-            "admin": {
-                "username": "admin",
-                "hashed_password": get_password_hash("admin123"),
-                "role": "admin",
-                "created_at": datetime.utcnow().isoformat()
-            }
-        }
+        default_users = _default_users()
         save_users(default_users)
         return default_users
 
@@ -95,16 +329,7 @@ def get_users() -> dict:
 
         # Handle old list format - convert to dict
         if isinstance(users_data, list):
-            users_dict = {}
-            for user in users_data:
-                username = user.get("username")
-                if username:
-                    users_dict[username] = {
-                        "username": username,
-                        "hashed_password": user.get("password_hash", ""),
-                        "role": user.get("role", "user"),
-                        "created_at": datetime.utcnow().isoformat()
-                    }
+            users_dict = _convert_users_list(users_data)
             # Save in new format
             save_users(users_dict)
             return users_dict
@@ -112,20 +337,21 @@ def get_users() -> dict:
         return users_data
     except (json.JSONDecodeError, FileNotFoundError):
         # If file is corrupted, recreate default user
-        default_users = {
-            "admin": {
-                "username": "admin",
-                "hashed_password": get_password_hash("admin123"),
-                "role": "admin",
-                "created_at": datetime.utcnow().isoformat()
-            }
-        }
+        default_users = _default_users()
         save_users(default_users)
         return default_users
 
 
 def save_users(users: dict):
-    """Save users to file"""
+    """Save users to storage"""
+    # Cached principals may hold stale passwords or roles
+    _token_cache.clear()
+
+    store = _get_user_store()
+    if store is not None:
+        store.replace_all(users)
+        return
+
     with open(USERS_FILE, 'w', encoding='utf-8') as f:
         json.dump(users, f, indent=2, ensure_ascii=False)
 
@@ -163,12 +389,59 @@ def change_user_password(username: str, old_password: str, new_password: str) ->
     return True
 
 
+async def authenticate_user_async(username: str, password: str, client_ip: Optional[str] = None) -> Optional[dict]:
+    """Throttled authenticate_user with bcrypt running off the event loop"""
+    login_throttle.check(username, client_ip)
+
+    users = get_users()
+    if username not in users:
+        login_throttle.record_failure(username, client_ip)
+        return None
+
+    user = users[username]
+    if not await run_password_task(verify_password, password, user["hashed_password"]):
+        login_throttle.record_failure(username, client_ip)
+        return None
+
+    login_throttle.reset(username)
+    return user
+
+
+async def change_user_password_async(username: str, old_password: str, new_password: str) -> bool:
+    """change_user_password with bcrypt running off the event loop"""
+    users = get_users()
+
+    if username not in users:
+        return False
+
+    user = users[username]
+    if not await run_password_task(verify_password, old_password, user["hashed_password"]):
+        return False
+
+    # Update password
+    users[username]["hashed_password"] = await run_password_task(get_password_hash, new_password)
+    users[username]["password_changed_at"] = datetime.utcnow().isoformat()
+    save_users(users)
+
+    return True
+
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
     """
     Dependency to get current authenticated user from JWT token
     Usage: user = Depends(get_current_user)
     """
     token = credentials.credentials
+
+    if _token_cache.users_file_changed():
+        store = _get_user_store()
+        if store is not None:
+            _import_users_file(store)
+
+    cached_user = _token_cache.get(token)
+    if cached_user is not None:
+        return cached_user
+
     payload = decode_token(token)
 
     username = payload.get("sub")
@@ -185,6 +458,7 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
             detail="User not found",
         )
 
+    _token_cache.put(token, users[username], payload.get("exp"))
     return users[username]
 
 
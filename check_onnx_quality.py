@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Compare the ONNX int8 embedding backend with the fp32 torch model
+Reports cosine agreement on a sample set, throughput and peak RSS
+
+Usage: python check_onnx_quality.py [sample.txt]
+(sample.txt: one text per line; a built-in Turkish/English sample is used otherwise)
+"""
+
+import resource
+import sys
+import time
+
+import numpy as np
+
+from embedding_service import EMBEDDING_MODEL, load_sentence_model
+
+MIN_MEAN_COSINE = 0.99  # Below this the quantized model is not a drop-in replacement
+BENCHMARK_REPEAT = 20
+
+SAMPLE_TEXTS = [
+    "Kiracı, kira bedelini her ayın beşinci gününe kadar ödemekle yükümlüdür.",
+    "Taraflar arasında doğan uyuşmazlıklarda İstanbul mahkemeleri yetkilidir.",
+    "İşveren, işçinin kıdem tazminatını fesih tarihinden itibaren ödemelidir.",
+    "Sözleşme, tarafların yazılı mutabakatı olmadan değiştirilemez.",
+    "Kişisel veriler, KVKK kapsamında açık rıza alınmadan işlenemez.",
+    "Davacı, tapu kaydının iptali ve adına tescilini talep etmiştir.",
+    "Bu madde kapsamında verilen bildirimler noter aracılığıyla yapılır.",
+    "The lessee shall return the premises in the condition received.",
+    "Either party may terminate this agreement with thirty days notice.",
+    "Force majeure events suspend the obligations of the affected party.",
+]
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process (Linux reports KB)"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def benchmark(model, texts):
+    """Encode texts; returns (vectors, chunks per second over BENCHMARK_REPEAT runs)"""
+    vectors = model.encode(texts, convert_to_numpy=True, normalize_embeddings=True)
+    started = time.perf_counter()
+    for _ in range(BENCHMARK_REPEAT):
+        model.encode(texts, convert_to_numpy=True)
+    elapsed = time.perf_counter() - started
+    return vectors, len(texts) * BENCHMARK_REPEAT / elapsed
+
+
+def main():
+    texts = SAMPLE_TEXTS
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], 'r', encoding='utf-8') as f:
+            texts = [line.strip() for line in f if line.strip()]
+
+    print(f"[*] Model: {EMBEDDING_MODEL}, {len(texts)} sample texts")
+
+    rss_before = peak_rss_mb()
+    fp32_model, _ = load_sentence_model(EMBEDDING_MODEL, "torch")
+    fp32_vectors, fp32_rate = benchmark(fp32_model, texts)
+    fp32_rss = peak_rss_mb() - rss_before
+    print(f"[*] torch fp32: {fp32_rate:.1f} chunks/s, +{fp32_rss:.0f} MB peak RSS")
+
+    rss_before = peak_rss_mb()
+    int8_model, inference = load_sentence_model(EMBEDDING_MODEL, "onnx-int8")
+    if inference != "onnx-int8":
+        print("[!] ONNX int8 backend could not be loaded (pip install \"sentence-transformers[onnx]>=3.2\")")
+        sys.exit(1)
+    int8_vectors, int8_rate = benchmark(int8_model, texts)
+    int8_rss = peak_rss_mb() - rss_before
+    print(f"[*] onnx int8: {int8_rate:.1f} chunks/s, +{int8_rss:.0f} MB peak RSS "
+          f"(peak RSS only grows, so this undercounts when torch was loaded first)")
+
+    if fp32_vectors.shape != int8_vectors.shape:
+        print(f"[!] Dimension mismatch: {fp32_vectors.shape[1]} vs {int8_vectors.shape[1]}")
+        sys.exit(1)
+
+    cosines = np.sum(fp32_vectors * int8_vectors, axis=1)
+    print(f"[*] Cosine agreement: mean {cosines.mean():.4f}, min {cosines.min():.4f}")
+    print(f"[*] Speedup: {int8_rate / fp32_rate:.2f}x")
+
+    if cosines.mean() < MIN_MEAN_COSINE:
+        print(f"[!] Mean cosine below {MIN_MEAN_COSINE}, keep EMBEDDING_INFERENCE=torch")
+        sys.exit(1)
+    print("✅ ONNX int8 backend agrees with fp32")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""
+Token-Aware Chunking
+Single-pass chunker that packs text segments into chunks of at most the
+embedding model's max sequence length, measured with the model tokenizer
+"""
+
+import json
+import os
+import re
+from pathlib import Path
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+# Configuration
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", 0)) or None  # Override; default is the model max_seq_length
+FALLBACK_MAX_TOKENS = 128  # When the model config cannot be read
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", 16))
+SENTENCE_END_CHARS = ".!?\n"
+SEGMENT_CHARS = 64 * 1024  # Block size when chunking one large text
+
+_WORD_PATTERN = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+
+class Chunk(NamedTuple):
+    """A chunk with its character offsets in the whole document"""
+    text: str
+    start: int
+    end: int
+    tokens: int
+
+
+class _RegexTokenizer:
+    """Word/punctuation tokenizer used when no model tokenizer is available"""
+
+    def offsets(self, text: str) -> List[Tuple[int, int]]:
+        return [match.span() for match in _WORD_PATTERN.finditer(text)]
+
+    def num_special_tokens(self) -> int:
+        return 0
+
+
+class _HFTokenizer:
+    """Offsets from a HuggingFace fast tokenizer"""
+
+    def __init__(self, tokenizer):
+        self.tokenizer = tokenizer
+
+    def offsets(self, text: str) -> List[Tuple[int, int]]:
+        encoded = self.tokenizer(
+            text, add_special_tokens=False, return_offsets_mapping=True, return_attention_mask=False,
+            verbose=False
+        )
+        return [(start, end) for start, end in encoded["offset_mapping"] if end > start]
+
+    def num_special_tokens(self) -> int:
+        return self.tokenizer.num_special_tokens_to_add()
+
+
+_tokenizer = None
+
+
+def get_tokenizer(model_name: str = EMBEDDING_MODEL):
+    """Load the model tokenizer once per process (regex fallback if unavailable)"""
+    global _tokenizer
+    if _tokenizer is None:
+        try:
+            from transformers import AutoTokenizer
+            tokenizer = AutoTokenizer.from_pretrained(model_name, use_fast=True)
+            if not tokenizer.is_fast:
+                raise ValueError("offsets need a fast tokenizer")
+            _tokenizer = _HFTokenizer(tokenizer)
+        except Exception as e:
+            print(f"[!] Tokenizer for {model_name} unavailable, chunking by words: {e}")
+            _tokenizer = _RegexTokenizer()
+    return _tokenizer
+
+
+_max_tokens: Optional[int] = None
+
+
+def model_max_seq_length(model_name: str = EMBEDDING_MODEL) -> Optional[int]:
+    """
+    max_seq_length from the model's sentence_bert_config.json
+
+    Read from a local model directory or the HuggingFace cache (downloaded
+    if needed), without loading the model itself.
+    """
+    try:
+        config_path = Path(model_name) / "sentence_bert_config.json"
+        if not config_path.is_file():
+            from huggingface_hub import hf_hub_download
+            config_path = hf_hub_download(model_name, "sentence_bert_config.json")
+        with open(config_path, 'r', encoding='utf-8') as f:
+            return int(json.load(f)["max_seq_length"])
+    except Exception as e:
+        print(f"[!] max_seq_length of {model_name} unavailable: {e}")
+        return None
+
+
+def get_chunk_max_tokens(model_name: str = EMBEDDING_MODEL) -> int:
+    """Chunk size in tokens: CHUNK_MAX_TOKENS if set, else the model max_seq_length"""
+    global _max_tokens
+    if _max_tokens is None:
+        _max_tokens = CHUNK_MAX_TOKENS or model_max_seq_length(model_name) or FALLBACK_MAX_TOKENS
+    return _max_tokens
+
+
+class TokenChunker:
+    """
+    Pack tokens into chunks of at most max_tokens with overlap_tokens overlap
+
+    Segments (e.g. pages) are tokenized once as they arrive and chunks are
+    cut on token offsets, preferring the last sentence end in the second
+    half of the window. Only the text of the current window is kept, and
+    each chunk string is copied once when it is emitted.
+    """
+
+    def __init__(
+        self,
+        tokenizer=None,
+        max_tokens: Optional[int] = None,
+        overlap_tokens: int = CHUNK_OVERLAP_TOKENS
+    ):
+        self.tokenizer = tokenizer or get_tokenizer()
+        max_tokens = max_tokens or get_chunk_max_tokens()
+        self.budget = max(max_tokens - self.tokenizer.num_special_tokens(), 8)
+        self.overlap = min(max(overlap_tokens, 0), self.budget // 4)
+
+    def chunks(self, segments: Iterable[str]) -> Iterator[Chunk]:
+        """Yield chunks over the concatenation of segments"""
+        window: List[Tuple[int, int, bool]] = []  # (start, end, ends_sentence) in document offsets
+        buffer = ""  # Document text from buffer_start on
+        buffer_start = 0
+        offset = 0
+
+        for segment in segments:
+            if not segment:
+                continue
+            buffer += segment
+            for start, end in self.tokenizer.offsets(segment):
+                ends_sentence = segment[end - 1] in SENTENCE_END_CHARS or segment[end:end + 1] == "\n"
+                window.append((offset + start, offset + end, ends_sentence))
+                if len(window) > self.budget:
+                    chunk, window = self._cut(window, buffer, buffer_start)
+                    yield chunk
+            offset += len(segment)
+
+            # Drop text before the window once per segment
+            keep_from = window[0][0] if window else offset
+            buffer, buffer_start = buffer[keep_from - buffer_start:], keep_from
+
+        while window:
+            if len(window) <= self.budget:
+                yield self._emit(window, len(window), buffer, buffer_start)
+                break
+            chunk, window = self._cut(window, buffer, buffer_start)
+            yield chunk
+
+    def _cut(self, window: List, buffer: str, buffer_start: int) -> Tuple[Chunk, List]:
+        """Emit one chunk from a full window, return it and the remaining window"""
+        cut = self.budget
+        for index in range(self.budget - 1, self.budget // 2 - 1, -1):
+            if window[index][2]:
+                cut = index + 1
+                break
+        chunk = self._emit(window, cut, buffer, buffer_start)
+        return chunk, window[cut - self.overlap:]
+
+    @staticmethod
+    def _emit(window: List, count: int, buffer: str, buffer_start: int) -> Chunk:
+        start, end = window[0][0], window[count - 1][1]
+        return Chunk(buffer[start - buffer_start:end - buffer_start], start, end, count)
+
+
+def split_segments(text: str, size: int = SEGMENT_CHARS) -> Iterator[str]:
+    """Split a large text into blocks ending at a newline (or space) for chunk_segments"""
+    start = 0
+    while start < len(text):
+        end = start + size
+        if end < len(text):
+            cut = text.rfind("\n", start, end)
+            if cut <= start:
+                cut = text.rfind(" ", start, end)
+            end = cut + 1 if cut > start else end
+        yield text[start:end]
+        start = end
+
+
+def chunk_segments(
+    segments: Iterable[str],
+    max_tokens: Optional[int] = None,
+    overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+    tokenizer=None
+) -> Iterator[Chunk]:
+    """Chunk text segments with the model tokenizer (max_tokens defaults to get_chunk_max_tokens())"""
+    return TokenChunker(tokenizer, max_tokens, overlap_tokens).chunks(segments)
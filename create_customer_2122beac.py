@@ -1,46 +1,30 @@
 #!/usr/bin/env python3
 """
-Script to create customer_2122beac in customers.json
+Script to create customer_2122beac in the customer store
 Run once to restore customer data
 """
 
-import json
-from datetime import datetime
-from pathlib import Path
+from customer_manager import CustomerManager
 
 # Customer data
 customer_data = {
-    "customer_2122beac": {
-        "customer_id": "customer_2122beac",
-        "name": "Customer 2122beac",
-        "collection_name": "customer_2122beac",
-        "quota_mb": 1000,
-        "used_mb": 0,  # Will be calculated from Qdrant
-        "document_count": 2,
-        "created_at": "2025-10-01T00:00:00",
-        "updated_at": datetime.utcnow().isoformat()
-    }
+    "customer_id": "customer_2122beac",
+    "name": "Customer 2122beac",
+    "email": "",
+    "collection_name": "customer_2122beac",
+    "quota_mb": 1000,
+    "used_mb": 0,  # Will be calculated from Qdrant
+    "document_count": 2,
+    "created_at": "2025-10-01T00:00:00"
 }
 
-# Path to customers.json
-customers_file = Path(__file__).parent / "customers.json"
+# Add/update customer_2122beac through CustomerManager (SQLite or
+# customers.json, whichever STORAGE_BACKEND selects)
+manager = CustomerManager()
+manager.save_customer(customer_data)
+manager.flush()
 
-# Read existing customers
-try:
-    with open(customers_file, 'r', encoding='utf-8') as f:
-        customers = json.load(f)
-    print(f"✅ Loaded existing customers: {list(customers.keys())}")
-except (FileNotFoundError, json.JSONDecodeError):
-    customers = {}
-    print("⚠️  No existing customers.json found, creating new")
-
-# Add/update customer_2122beac
-customers.update(customer_data)
-
-# Save
-with open(customers_file, 'w', encoding='utf-8') as f:
-    json.dump(customers, f, indent=2, ensure_ascii=False)
-
-print(f"✅ Customer saved to {customers_file}")
+customers = [c.customer_id for c in manager.get_all_customers()]
+print(f"✅ Customer saved: {customer_data['customer_id']}")
 print(f"📊 Total customers: {len(customers)}")
-print(f"👤 Customers: {list(customers.keys())}")
+print(f"👤 Customers: {customers}")
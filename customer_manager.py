@@ -3,13 +3,19 @@ Customer Management Module
 Multi-tenant customer tracking with quota management
 """
 
+import atexit
 import json
+import os
+import threading
 import uuid
 from datetime import datetime
 from pathlib import Path
 from typing import List, Dict, Optional
 
+from storage import STORAGE_BACKEND, SQLiteCustomerStore, get_database, write_json_atomic
+
 CUSTOMERS_FILE = Path(__file__).parent / "customers.json"
+CUSTOMERS_WRITE_DELAY = float(os.getenv("CUSTOMERS_WRITE_DELAY", 0.5))  # Seconds to coalesce writes
 
 
 class Customer:
@@ -73,31 +79,235 @@ class Customer:
         return customer
 
 
-class CustomerManager:
-    """Manage customers and their quotas"""
+class JSONCustomerStore:
+    """
+    Customer records in customers.json
+
+    Customers are kept in memory, indexed by customer_id, collection_name
+    and email. Mutations are persisted with a coalesced write-behind: all
+    changes made within CUSTOMERS_WRITE_DELAY seconds share one atomic
+    write. The file is only re-read when its mtime changes on disk.
+    """
 
-    def __init__(self):
-        self.customers_file = CUSTOMERS_FILE
+    def __init__(self, customers_file: Path = CUSTOMERS_FILE, write_delay: float = CUSTOMERS_WRITE_DELAY):
+        self.customers_file = customers_file
+        self.write_delay = write_delay
+        self._lock = threading.RLock()
+        self._customers: Dict[str, Dict] = {}
+        self._by_collection: Dict[str, str] = {}
+        self._by_email: Dict[str, str] = {}
+        self._file_stamp = None
+        self._dirty = False
+        self._flush_timer: Optional[threading.Timer] = None
         self._ensure_file_exists()
+        self._reload()
+        atexit.register(self.flush)
 
     def _ensure_file_exists(self):
         """Create customers file if not exists"""
         if not self.customers_file.exists():
-            self._save_data({"customers": []})
+            self._write_file({"customers": []})
 
-    def _load_data(self) -> Dict:
-        """Load customers from JSON"""
+    def _stat_file(self):
+        """Get (mtime_ns, size) of the customers file, or None if missing"""
+        try:
+            stat = os.stat(self.customers_file)
+            return (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            return None
+
+    def _reload(self):
+        """Rebuild the in-memory store and indexes from JSON"""
         try:
             with open(self.customers_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
+                data = json.load(f)
         except Exception as e:
             print(f"Error loading customers: {e}")
-            return {"customers": []}
+            data = {"customers": []}
+
+        self._customers = {}
+        self._by_collection = {}
+        self._by_email = {}
+        for c in data.get('customers', []):
+            self._index(c)
+        self._file_stamp = self._stat_file()
+
+    def _refresh(self):
+        """Reload if the file was changed by someone else"""
+        if self._dirty:
+            return  # In-memory state is newer than the file
+        if self._stat_file() != self._file_stamp:
+            self._reload()
+
+    def _index(self, c: Dict):
+        """Add a customer record to the store and indexes"""
+        self._customers[c['customer_id']] = c
+        if c.get('collection_name'):
+            self._by_collection[c['collection_name']] = c['customer_id']
+        if c.get('email'):
+            self._by_email[c['email'].lower()] = c['customer_id']
+
+    def _unindex(self, c: Dict):
+        """Remove a customer record from the store and indexes"""
+        self._customers.pop(c['customer_id'], None)
+        if self._by_collection.get(c.get('collection_name')) == c['customer_id']:
+            del self._by_collection[c['collection_name']]
+        email = (c.get('email') or '').lower()
+        if self._by_email.get(email) == c['customer_id']:
+            del self._by_email[email]
+
+    def _write_file(self, data: Dict):
+        """Atomically write customers JSON"""
+        write_json_atomic(self.customers_file, data)
+
+    def _mark_dirty(self):
+        """Schedule a coalesced write of the in-memory store"""
+        self._dirty = True
+        if self.write_delay <= 0:
+            self.flush()
+        elif self._flush_timer is None:
+            self._flush_timer = threading.Timer(self.write_delay, self.flush)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+
+    def flush(self):
+        """Write pending changes to disk now"""
+        with self._lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            if not self._dirty:
+                return
+            self._write_file({"customers": [dict(c) for c in self._customers.values()]})
+            self._file_stamp = self._stat_file()
+            self._dirty = False
+
+    def get(self, customer_id: str) -> Optional[Dict]:
+        with self._lock:
+            self._refresh()
+            c = self._customers.get(customer_id)
+            return dict(c) if c else None
+
+    def get_by_collection(self, collection_name: str) -> Optional[Dict]:
+        with self._lock:
+            self._refresh()
+            customer_id = self._by_collection.get(collection_name)
+            return self.get(customer_id) if customer_id else None
+
+    def get_by_email(self, email: str) -> Optional[Dict]:
+        with self._lock:
+            self._refresh()
+            customer_id = self._by_email.get(email.lower())
+            return self.get(customer_id) if customer_id else None
+
+    def all(self) -> List[Dict]:
+        with self._lock:
+            self._refresh()
+            return [dict(c) for c in self._customers.values()]
+
+    def insert(self, record: Dict):
+        with self._lock:
+            self._refresh()
+            self._index(dict(record))
+            self._mark_dirty()
+
+    def replace_all(self, records: List[Dict]):
+        """Replace all customers and write them to JSON immediately"""
+        with self._lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            self._write_file({"customers": records})
+            self._dirty = False
+            self._reload()
+
+    def update(self, customer_id: str, updates: Dict) -> bool:
+        with self._lock:
+            self._refresh()
+            c = self._customers.get(customer_id)
+            if c is None:
+                return False
+
+            self._unindex(c)
+            c.update(updates)
+            self._index(c)
+            self._mark_dirty()
+            return True
+
+    def delete(self, customer_id: str) -> bool:
+        with self._lock:
+            self._refresh()
+            c = self._customers.get(customer_id)
+            if c is None:
+                return False
+
+            self._unindex(c)
+            self._mark_dirty()
+            return True
+
+    def add_usage(self, customer_id: str, mb: float, timestamp: str) -> bool:
+        """Add usage unless it would exceed the quota"""
+        with self._lock:
+            c = self.get(customer_id)
+            if c is None:
+                return False
+
+            new_used = c.get('used_mb', 0.0) + mb
+            if new_used > c.get('quota_mb', 100):
+                return False  # Quota exceeded
+
+            return self.update(customer_id, {
+                "used_mb": round(new_used, 2),
+                "last_upload": timestamp
+            })
+
+    def increment_document_count(self, customer_id: str, timestamp: str) -> bool:
+        with self._lock:
+            c = self.get(customer_id)
+            if c is None:
+                return False
+
+            return self.update(customer_id, {
+                "document_count": c.get('document_count', 0) + 1,
+                "last_upload": timestamp
+            })
+
+
+def create_customer_store():
+    """Create the customer store selected by STORAGE_BACKEND"""
+    if STORAGE_BACKEND == "json":
+        return JSONCustomerStore()
+
+    store = SQLiteCustomerStore(get_database())
+    # customers.json is import-only under SQLite: customers added to it are
+    # picked up, edits to existing ones are not (rows in the database win).
+    # Scripts that change customers go through CustomerManager instead.
+    get_database().import_json(
+        CUSTOMERS_FILE,
+        lambda data: store.import_new([
+            Customer.from_dict(c).to_dict() for c in data.get('customers', [])
+        ])
+    )
+    return store
+
+
+class CustomerManager:
+    """Manage customers and their quotas"""
+
+    def __init__(self, store=None):
+        self.store = store or create_customer_store()
+
+    def _load_data(self) -> Dict:
+        """Get all customers as the customers.json structure"""
+        return {"customers": self.store.all()}
 
     def _save_data(self, data: Dict):
-        """Save customers to JSON"""
-        with open(self.customers_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        """Replace all customers"""
+        self.store.replace_all(data['customers'])
+
+    def flush(self):
+        """Persist pending changes"""
+        self.store.flush()
 
     def create_customer(
         self,
@@ -114,71 +324,50 @@ class CustomerManager:
             quota_mb=quota_mb
         )
 
-        data = self._load_data()
-        data['customers'].append(customer.to_dict())
-        self._save_data(data)
+        self.store.insert(customer.to_dict())
 
         return customer
 
     def get_customer(self, customer_id: str) -> Optional[Customer]:
         """Get customer by ID"""
-        data = self._load_data()
-        for c in data['customers']:
-            if c['customer_id'] == customer_id:
-                return Customer.from_dict(c)
-        return None
+        c = self.store.get(customer_id)
+        return Customer.from_dict(c) if c else None
+
+    def get_customer_by_collection(self, collection_name: str) -> Optional[Customer]:
+        """Get customer by Qdrant collection name"""
+        c = self.store.get_by_collection(collection_name)
+        return Customer.from_dict(c) if c else None
+
+    def get_customer_by_email(self, email: str) -> Optional[Customer]:
+        """Get customer by email (case-insensitive)"""
+        c = self.store.get_by_email(email)
+        return Customer.from_dict(c) if c else None
 
     def get_all_customers(self) -> List[Customer]:
         """Get all customers"""
-        data = self._load_data()
-        return [Customer.from_dict(c) for c in data['customers']]
+        return [Customer.from_dict(c) for c in self.store.all()]
+
+    def save_customer(self, data: Dict) -> Customer:
+        """Insert or replace a customer record as given (used by helper scripts)"""
+        customer = Customer.from_dict(data)
+        self.store.insert(customer.to_dict())
+        return customer
 
     def update_customer(self, customer_id: str, updates: Dict) -> bool:
         """Update customer data"""
-        data = self._load_data()
-        for i, c in enumerate(data['customers']):
-            if c['customer_id'] == customer_id:
-                data['customers'][i].update(updates)
-                self._save_data(data)
-                return True
-        return False
+        return self.store.update(customer_id, updates)
 
     def delete_customer(self, customer_id: str) -> bool:
         """Delete customer"""
-        data = self._load_data()
-        original_len = len(data['customers'])
-        data['customers'] = [c for c in data['customers'] if c['customer_id'] != customer_id]
-
-        if len(data['customers']) < original_len:
-            self._save_data(data)
-            return True
-        return False
+        return self.store.delete(customer_id)
 
     def add_usage(self, customer_id: str, mb: float) -> bool:
         """Add usage to customer quota"""
-        customer = self.get_customer(customer_id)
-        if not customer:
-            return False
-
-        new_used = customer.used_mb + mb
-        if new_used > customer.quota_mb:
-            return False  # Quota exceeded
-
-        return self.update_customer(customer_id, {
-            "used_mb": round(new_used, 2),
-            "last_upload": datetime.utcnow().isoformat()
-        })
+        return self.store.add_usage(customer_id, mb, datetime.utcnow().isoformat())
 
     def increment_document_count(self, customer_id: str) -> bool:
         """Increment document count"""
-        customer = self.get_customer(customer_id)
-        if not customer:
-            return False
-
-        return self.update_customer(customer_id, {
-            "document_count": customer.document_count + 1,
-            "last_upload": datetime.utcnow().isoformat()
-        })
+        return self.store.increment_document_count(customer_id, datetime.utcnow().isoformat())
 
     def get_stats(self) -> Dict:
         """Get overall statistics"""
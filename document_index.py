@@ -0,0 +1,110 @@
+"""
+Document Index
+Per-customer manifest of uploaded documents, so listings and stats can be
+served in O(documents) without scrolling the customer's Qdrant collection
+"""
+
+import json
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from storage import STORAGE_BACKEND, SQLiteDocumentIndex, get_database, write_json_atomic
+
+DOCUMENTS_FILE = Path(__file__).parent / "documents.json"
+
+
+def build_document_entry(
+    filename: str,
+    point_ids: List,
+    size_bytes: int,
+    description: str = "",
+    embedding_model: Optional[str] = None,
+    uploaded_at: Optional[str] = None
+) -> Dict:
+    """Build a manifest entry for an uploaded document"""
+    ids = sorted(str(point_id) for point_id in point_ids)
+    return {
+        "filename": filename,
+        "chunks": len(ids),
+        "first_point_id": ids[0] if ids else None,
+        "last_point_id": ids[-1] if ids else None,
+        "bytes": int(size_bytes),
+        "description": description or "",
+        "embedding_model": embedding_model,
+        "uploaded_at": uploaded_at or datetime.utcnow().isoformat()
+    }
+
+
+def with_size_mb(document: Dict) -> Dict:
+    """Add file_size_mb for API responses"""
+    document = dict(document)
+    document["file_size_mb"] = round((document.get("bytes") or 0) / (1024 * 1024), 4)
+    return document
+
+
+class JSONDocumentIndex:
+    """Per-customer document manifest in documents.json"""
+
+    def __init__(self, documents_file: Path = DOCUMENTS_FILE):
+        self.documents_file = documents_file
+        self._lock = threading.Lock()
+        self._documents: Dict[str, Dict[str, Dict]] = {}
+        if documents_file.exists():
+            try:
+                with open(documents_file, 'r', encoding='utf-8') as f:
+                    self._documents = json.load(f)
+            except Exception as e:
+                print(f"Error loading document index: {e}")
+
+    def _save(self):
+        write_json_atomic(self.documents_file, self._documents)
+
+    def list(self, customer_id: str) -> List[Dict]:
+        with self._lock:
+            documents = self._documents.get(customer_id, {})
+            return sorted((dict(d) for d in documents.values()), key=lambda d: d.get("uploaded_at") or "")
+
+    def record_upload(self, customer_id: str, document: Dict):
+        with self._lock:
+            documents = self._documents.setdefault(customer_id, {})
+            existing = documents.get(document["filename"])
+            if existing:
+                document = dict(document)
+                document["chunks"] += existing.get("chunks", 0)
+                document["bytes"] = document.get("bytes", 0) + existing.get("bytes", 0)
+                document["first_point_id"] = min(
+                    filter(None, [existing.get("first_point_id"), document["first_point_id"]]), default=None
+                )
+                document["last_point_id"] = max(
+                    filter(None, [existing.get("last_point_id"), document["last_point_id"]]), default=None
+                )
+            documents[document["filename"]] = dict(document)
+            self._save()
+
+    def replace_customer(self, customer_id: str, documents: List[Dict]):
+        with self._lock:
+            self._documents[customer_id] = {d["filename"]: dict(d) for d in documents}
+            self._save()
+
+    def drop_customer(self, customer_id: str):
+        with self._lock:
+            if self._documents.pop(customer_id, None) is not None:
+                self._save()
+
+    def totals(self) -> Dict:
+        with self._lock:
+            documents = [d for customer in self._documents.values() for d in customer.values()]
+            return {
+                "documents": len(documents),
+                "chunks": sum(d.get("chunks", 0) for d in documents),
+                "bytes": sum(d.get("bytes", 0) for d in documents)
+            }
+
+
+def create_document_index():
+    """Create the document index selected by STORAGE_BACKEND"""
+    if STORAGE_BACKEND == "json":
+        return JSONDocumentIndex()
+    return SQLiteDocumentIndex(get_database())
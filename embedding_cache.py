@@ -0,0 +1,211 @@
+"""
+Embedding Cache
+Content-addressed store of chunk embeddings keyed by hash(model, text), so
+re-uploaded documents only embed the chunks that actually changed
+"""
+
+import hashlib
+import os
+import threading
+import time
+from array import array
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+from storage import DATABASE_FILE, SQLiteDatabase
+
+# Configuration
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+EMBEDDING_CACHE_FILE = Path(os.getenv("EMBEDDING_CACHE_FILE", DATABASE_FILE.parent / "embedding_cache.db"))
+EMBEDDING_CACHE_MAX_MB = float(os.getenv("EMBEDDING_CACHE_MAX_MB", 256))
+EVICT_TO_FRACTION = 0.9  # Evict down to this share of the size limit
+LOOKUP_BATCH = 500  # Keys per SELECT (below SQLite's variable limit)
+MARKER_BYTES = 64  # Size charged for a key-only entry (mark_many)
+
+EMBEDDING_CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    dim INTEGER NOT NULL,
+    vector BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used);
+"""
+
+
+def cache_key(model: str, text: str) -> str:
+    """Content address of a chunk embedding"""
+    return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+
+def _vector_bytes(vector) -> bytes:
+    """Float32 bytes of a vector (numpy float32 rows are copied as-is)"""
+    if getattr(vector, "dtype", None) == "float32":
+        return vector.tobytes()
+    return array("f", vector).tobytes()
+
+
+class EmbeddingCache:
+    """
+    Float32 vectors in SQLite with size-based LRU eviction
+
+    Lookups refresh last_used; once the stored vectors exceed max_mb the
+    least recently used ones are deleted down to EVICT_TO_FRACTION of it.
+    Key-only entries (dim 0) record chunks seen without keeping a vector.
+    """
+
+    def __init__(self, path: Path = EMBEDDING_CACHE_FILE, max_mb: float = EMBEDDING_CACHE_MAX_MB):
+        self.db = SQLiteDatabase(path, schema=EMBEDDING_CACHE_SCHEMA)
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._lock = threading.Lock()
+        self._stored_bytes = self._measure()
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+    def _measure(self) -> int:
+        row = self.db.connection().execute("SELECT COALESCE(SUM(size), 0) AS n FROM embeddings").fetchone()
+        return row["n"]
+
+    def get_many(self, model: str, texts: Sequence[str]) -> List[Optional[array]]:
+        """Cached vectors for texts in order, None for misses"""
+        keys = [cache_key(model, text) for text in texts]
+        found: Dict[str, array] = {}
+        conn = self.db.connection()
+
+        for start in range(0, len(keys), LOOKUP_BATCH):
+            batch = list(set(keys[start:start + LOOKUP_BATCH]))
+            placeholders = ",".join("?" * len(batch))
+            rows = conn.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders}) AND dim > 0", batch
+            ).fetchall()
+            for row in rows:
+                vector = array("f")
+                vector.frombytes(row["vector"])
+                found[row["key"]] = vector
+            self._touch(conn, [row["key"] for row in rows])
+
+        vectors = [found.get(key) for key in keys]
+        self._count(sum(1 for v in vectors if v is not None), len(vectors))
+        return vectors
+
+    def contains_many(self, model: str, texts: Sequence[str]) -> List[bool]:
+        """Whether each text was seen before (vector or key-only entry), without loading vectors"""
+        keys = [cache_key(model, text) for text in texts]
+        found = set()
+        conn = self.db.connection()
+
+        for start in range(0, len(keys), LOOKUP_BATCH):
+            batch = list(set(keys[start:start + LOOKUP_BATCH]))
+            placeholders = ",".join("?" * len(batch))
+            rows = conn.execute(f"SELECT key FROM embeddings WHERE key IN ({placeholders})", batch).fetchall()
+            found.update(row["key"] for row in rows)
+            self._touch(conn, [row["key"] for row in rows])
+
+        flags = [key in found for key in keys]
+        self._count(sum(flags), len(flags))
+        return flags
+
+    def _touch(self, conn, keys: List[str]):
+        if keys:
+            conn.execute(
+                f"UPDATE embeddings SET last_used = ? WHERE key IN ({','.join('?' * len(keys))})",
+                [time.time(), *keys]
+            )
+
+    def _count(self, hits: int, lookups: int):
+        with self._lock:
+            self.hits += hits
+            self.misses += lookups - hits
+
+    def put_many(self, model: str, texts: Sequence[str], vectors: Sequence[Sequence[float]]):
+        """Store vectors for texts, evicting old entries if over the size limit"""
+        now = time.time()
+        rows = []
+        for text, vector in zip(texts, vectors):
+            blob = _vector_bytes(vector)
+            rows.append((cache_key(model, text), model, len(blob) // 4, blob, len(blob), now))
+        if not rows:
+            return
+
+        with self.db.transaction() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, model, dim, vector, size, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+
+        self._grow(sum(row[4] for row in rows))
+
+    def mark_many(self, model: str, texts: Sequence[str]):
+        """Record texts as seen with key-only entries (existing vectors are kept)"""
+        now = time.time()
+        rows = [(cache_key(model, text), model, now) for text in texts]
+        if not rows:
+            return
+
+        with self.db.transaction() as conn:
+            cursor = conn.executemany(
+                f"INSERT OR IGNORE INTO embeddings (key, model, dim, vector, size, last_used) "
+                f"VALUES (?, ?, 0, x'', {MARKER_BYTES}, ?)",
+                rows
+            )
+        self._grow(cursor.rowcount * MARKER_BYTES)
+
+    def _grow(self, added_bytes: int):
+        with self._lock:
+            self._stored_bytes += added_bytes
+            over_limit = self._stored_bytes > self.max_bytes
+        if over_limit:
+            self._evict()
+
+    def _evict(self):
+        """Delete least recently used vectors until under EVICT_TO_FRACTION of the limit"""
+        target = int(self.max_bytes * EVICT_TO_FRACTION)
+        with self.db.transaction() as conn:
+            stored = conn.execute("SELECT COALESCE(SUM(size), 0) AS n FROM embeddings").fetchone()["n"]
+            deleted = 0
+            if stored > target:
+                doomed = []
+                for row in conn.execute("SELECT key, size FROM embeddings ORDER BY last_used"):
+                    if stored <= target:
+                        break
+                    doomed.append((row["key"],))
+                    stored -= row["size"]
+                conn.executemany("DELETE FROM embeddings WHERE key = ?", doomed)
+                deleted = len(doomed)
+
+        with self._lock:
+            self._stored_bytes = stored
+            self.evicted += deleted
+        if deleted:
+            print(f"[*] Embedding cache evicted {deleted} vectors")
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": True,
+            "stored_mb": round(self._stored_bytes / (1024 * 1024), 2),
+            "max_mb": round(self.max_bytes / (1024 * 1024), 2),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evicted": self.evicted,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0
+        }
+
+
+_embedding_cache: Optional[EmbeddingCache] = None
+_embedding_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """Get or create the global embedding cache (None if disabled)"""
+    global _embedding_cache
+    if not EMBEDDING_CACHE_ENABLED:
+        return None
+    with _embedding_cache_lock:
+        if _embedding_cache is None:
+            _embedding_cache = EmbeddingCache()
+    return _embedding_cache
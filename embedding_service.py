@@ -1,46 +1,254 @@
 """
 Embedding Service for Document Processing
 Uses HuggingFace Sentence Transformers for free local embeddings
+
+sentence_transformers (torch), docx and PyPDF2 are imported on first use,
+so importing this module (e.g. in extraction workers) stays cheap.
 """
 
+import multiprocessing
 import os
-from typing import List, Dict
+import queue
+import threading
+import time
+import uuid
+from bisect import bisect_right
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Iterator, List, Dict, Optional
 from pathlib import Path
-import PyPDF2
-import docx
-from sentence_transformers import SentenceTransformer
+import numpy as np
+
+from chunking import CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS, Chunk, chunk_segments, split_segments
+from embedding_cache import get_embedding_cache
+from pdf_pages import iter_pdf_pages
 
 # Configuration
 EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
-CHUNK_SIZE = 512  # Characters per chunk
-CHUNK_OVERLAP = 50  # Overlap between chunks
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", 64))  # Chunks per model.encode batch
+EMBEDDING_BATCH_WAIT_MS = float(os.getenv("EMBEDDING_BATCH_WAIT_MS", 10))  # Max wait to fill a batch
+EMBEDDING_INFERENCE = os.getenv("EMBEDDING_INFERENCE", "torch").lower()  # "torch" or "onnx-int8"
+EMBEDDING_ONNX_QUANTIZATION = os.getenv("EMBEDDING_ONNX_QUANTIZATION", "avx2")  # avx2, avx512, avx512_vnni, arm64
+EMBEDDING_ONNX_DIR = Path(os.getenv("EMBEDDING_ONNX_DIR", Path(__file__).parent / "data" / "onnx"))
+EMBEDDING_WARMUP = os.getenv("EMBEDDING_WARMUP", "false").lower() == "true"  # Load the model at startup
 
 
-class EmbeddingService:
-    """Generate embeddings for documents"""
+def _load_onnx_int8(model_name: str):
+    """
+    Load model_name as a dynamically int8-quantized ONNX model
 
-    def __init__(self, model_name: str = EMBEDDING_MODEL):
-        """Initialize embedding model"""
-        print(f"[*] Loading embedding model: {model_name}")
-        self.model = SentenceTransformer(model_name)
-        self.embedding_dim = self.model.get_sentence_embedding_dimension()
-        print(f"[*] Model loaded. Embedding dimension: {self.embedding_dim}")
+    The first load exports and quantizes the model into EMBEDDING_ONNX_DIR;
+    later loads reuse the exported file. Needs sentence-transformers[onnx].
+    """
+    from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
 
-    def extract_text_from_pdf(self, file_path: str) -> str:
-        """Extract text from PDF file"""
+    export_dir = EMBEDDING_ONNX_DIR / model_name.replace("/", "__")
+    quantized = sorted(export_dir.glob(f"onnx/model_qint8_{EMBEDDING_ONNX_QUANTIZATION}*.onnx"))
+    if not quantized:
+        print(f"[*] Exporting {model_name} to ONNX with int8 quantization ({EMBEDDING_ONNX_QUANTIZATION})")
+        model = SentenceTransformer(model_name, backend="onnx", device="cpu")
+        model.save_pretrained(str(export_dir))
+        export_dynamic_quantized_onnx_model(model, EMBEDDING_ONNX_QUANTIZATION, str(export_dir))
+        quantized = sorted(export_dir.glob(f"onnx/model_qint8_{EMBEDDING_ONNX_QUANTIZATION}*.onnx"))
+        if not quantized:
+            raise FileNotFoundError(f"quantized model not found in {export_dir / 'onnx'}")
+
+    return SentenceTransformer(
+        str(export_dir),
+        backend="onnx",
+        device="cpu",
+        model_kwargs={"file_name": f"onnx/{quantized[0].name}"}
+    )
+
+
+def load_sentence_model(model_name: str = EMBEDDING_MODEL, inference: str = EMBEDDING_INFERENCE):
+    """
+    Load a SentenceTransformer for the given inference mode
+
+    Returns (model, inference actually used); onnx-int8 falls back to torch
+    if the ONNX runtime is not installed or the export fails.
+    """
+    from sentence_transformers import SentenceTransformer
+
+    if inference == "onnx-int8":
+        try:
+            return _load_onnx_int8(model_name), inference
+        except Exception as e:
+            print(f"[!] ONNX int8 inference unavailable, using torch: {e}")
+    return SentenceTransformer(model_name), "torch"
+
+
+class _EncodeRequest:
+    """Texts of one caller, filled in batch by batch"""
+
+    def __init__(self, texts: List[str]):
+        self.texts = texts
+        self.future: Future = Future()
+        self.enqueued_at = time.monotonic()
+        self.vectors: Optional[np.ndarray] = None
+        self.remaining = len(texts)
+
+
+class MicroBatcher:
+    """
+    Merge texts from concurrent callers into shared encode batches
+
+    A background thread runs encode() once per batch of up to max_batch_size
+    texts, or sooner when the oldest queued request has waited max_wait_ms.
+    Large requests are split across batches; each caller gets a Future
+    resolving to its own rows.
+    """
+
+    def __init__(
+        self,
+        encode: Callable[[List[str]], np.ndarray],
+        max_batch_size: int = EMBEDDING_BATCH_SIZE,
+        max_wait_ms: float = EMBEDDING_BATCH_WAIT_MS
+    ):
+        self.encode = encode
+        self.max_batch_size = max(max_batch_size, 1)
+        self.max_wait = max(max_wait_ms, 0) / 1000
+        self._queue: "queue.Queue[_EncodeRequest]" = queue.Queue()
+        self._pending: deque = deque()  # [request, next_index], owned by the batch thread
+        self._queued_texts = 0
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.texts_encoded = 0
+        self.max_batch_seen = 0
+        self.encode_seconds = 0.0
+        self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, texts: List[str]) -> Future:
+        """Queue texts for encoding; the Future resolves to an array of vectors"""
+        request = _EncodeRequest(list(texts))
+        if not request.texts:
+            request.future.set_result(np.empty((0, 0), dtype=np.float32))
+            return request.future
+        with self._lock:
+            self._queued_texts += len(request.texts)
+        self._queue.put(request)
+        return request.future
+
+    def _pending_texts(self) -> int:
+        return sum(len(request.texts) - start for request, start in self._pending)
+
+    def _fill(self):
+        """Collect requests until the batch is full or the oldest one is due"""
+        if not self._pending:
+            self._pending.append([self._queue.get(), 0])
+        deadline = self._pending[0][0].enqueued_at + self.max_wait
+        while self._pending_texts() < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                request = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            self._pending.append([request, 0])
+
+    def _take_batch(self) -> tuple:
+        """Take up to max_batch_size texts from the pending requests"""
+        texts: List[str] = []
+        parts = []  # (request, start, count)
+        while self._pending and len(texts) < self.max_batch_size:
+            entry = self._pending[0]
+            request, start = entry
+            count = min(len(request.texts) - start, self.max_batch_size - len(texts))
+            texts.extend(request.texts[start:start + count])
+            parts.append((request, start, count))
+            if start + count == len(request.texts):
+                self._pending.popleft()
+            else:
+                entry[1] = start + count
+        return texts, parts
+
+    def _run(self):
+        while True:
+            self._fill()
+            texts, parts = self._take_batch()
+            with self._lock:
+                self._queued_texts -= len(texts)
+
+            try:
+                vectors = self._encode_batch(texts)
+            except Exception as e:
+                if len(parts) == 1:
+                    self._fail(parts[0][0], e)
+                    continue
+                # Retry per caller so one bad request does not fail the others
+                for request, start, count in parts:
+                    try:
+                        self._deliver(request, start, count, self._encode_batch(request.texts[start:start + count]))
+                    except Exception as part_error:
+                        self._fail(request, part_error)
+                continue
+
+            offset = 0
+            for request, start, count in parts:
+                self._deliver(request, start, count, vectors[offset:offset + count])
+                offset += count
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        started = time.perf_counter()
+        vectors = np.asarray(self.encode(texts))
+        self.encode_seconds += time.perf_counter() - started
+        self.batches += 1
+        self.texts_encoded += len(texts)
+        self.max_batch_seen = max(self.max_batch_seen, len(texts))
+        return vectors
+
+    def _deliver(self, request: _EncodeRequest, start: int, count: int, vectors: np.ndarray):
+        if request.future.done():
+            return
+        if request.vectors is None:
+            request.vectors = np.empty((len(request.texts), vectors.shape[1]), dtype=vectors.dtype)
+        request.vectors[start:start + count] = vectors
+        request.remaining -= count
+        if request.remaining == 0:
+            request.future.set_result(request.vectors)
+
+    def _fail(self, request: _EncodeRequest, error: Exception):
+        """Fail a request and drop its unprocessed rest"""
+        if not request.future.done():
+            request.future.set_exception(error)
+        for entry in [e for e in self._pending if e[0] is request]:
+            self._pending.remove(entry)
+            with self._lock:
+                self._queued_texts -= len(request.texts) - entry[1]
+
+    def stats(self) -> Dict:
+        """Queue depth and batch size metrics"""
+        return {
+            "queue_depth": self._queued_texts,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": self.batches,
+            "texts_encoded": self.texts_encoded,
+            "avg_batch_size": round(self.texts_encoded / self.batches, 1) if self.batches else 0,
+            "max_batch_seen": self.max_batch_seen,
+            "chunks_per_second": round(self.texts_encoded / self.encode_seconds, 1) if self.encode_seconds else 0
+        }
+
+
+class DocumentProcessor:
+    """Extract and chunk document text (no model needed)"""
+
+    def iter_pdf_pages(self, file_path: str) -> Iterator[str]:
+        """Yield PDF page texts in order (extracted page-parallel)"""
         try:
-            with open(file_path, 'rb') as file:
-                reader = PyPDF2.PdfReader(file)
-                text = ""
-                for page in reader.pages:
-                    text += page.extract_text() + "\n"
-                return text.strip()
+            yield from iter_pdf_pages(file_path)
         except Exception as e:
             raise Exception(f"PDF extraction error: {str(e)}")
 
+    def extract_text_from_pdf(self, file_path: str) -> str:
+        """Extract text from PDF file"""
+        return "".join(self.iter_pdf_pages(file_path)).strip()
+
     def extract_text_from_docx(self, file_path: str) -> str:
         """Extract text from DOCX file"""
         try:
+            import docx
             doc = docx.Document(file_path)
             text = "\n".join([paragraph.text for paragraph in doc.paragraphs])
             return text.strip()
@@ -70,37 +278,129 @@ class EmbeddingService:
 
         return extractor(file_path)
 
-    def chunk_text(self, text: str, chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP) -> List[str]:
-        """Split text into overlapping chunks"""
-        if len(text) <= chunk_size:
-            return [text]
+    def chunk_spans(
+        self,
+        text: str,
+        max_tokens: Optional[int] = None,
+        overlap: int = CHUNK_OVERLAP_TOKENS
+    ) -> List[Chunk]:
+        """Split text into token-limited overlapping chunks with character offsets"""
+        return list(chunk_segments(split_segments(text), max_tokens, overlap))
+
+    def chunk_text(self, text: str, max_tokens: Optional[int] = None, overlap: int = CHUNK_OVERLAP_TOKENS) -> List[str]:
+        """Split text into token-limited overlapping chunks"""
+        return [chunk.text for chunk in self.chunk_spans(text, max_tokens, overlap)]
+
 
-        chunks = []
-        start = 0
+# Encoder process state (set in the dedicated encoder process only)
+_encoder_args: Optional[tuple] = None
+_encoder_model = None
+_encoder_inference: Optional[str] = None
 
-        while start < len(text):
-            end = start + chunk_size
-            chunk = text[start:end]
 
-            # Try to break at sentence boundary
-            if end < len(text):
-                last_period = chunk.rfind('.')
-                last_newline = chunk.rfind('\n')
-                break_point = max(last_period, last_newline)
+def _init_encoder_process(model_name: str, inference: str):
+    global _encoder_args
+    _encoder_args = (model_name, inference)
 
-                if break_point > chunk_size * 0.5:  # At least 50% of chunk
-                    chunk = text[start:start + break_point + 1]
-                    end = start + break_point + 1
 
-            chunks.append(chunk.strip())
-            start = end - overlap
+def _get_encoder_model():
+    """Load the model in the encoder process on first use"""
+    global _encoder_model, _encoder_inference
+    if _encoder_model is None:
+        _encoder_model, _encoder_inference = load_sentence_model(*_encoder_args)
+    return _encoder_model
 
-        return [c for c in chunks if c]  # Remove empty chunks
+
+def _encoder_info() -> Dict:
+    """Encoder process entry point: load the model and describe it"""
+    model = _get_encoder_model()
+    return {
+        "inference": _encoder_inference,
+        "embedding_dim": model.get_sentence_embedding_dimension(),
+        "max_seq_length": getattr(model, "max_seq_length", None)
+    }
+
+
+def _encode_in_process(texts: List[str]) -> np.ndarray:
+    """Encoder process entry point: encode one micro-batch"""
+    return _get_encoder_model().encode(texts, batch_size=EMBEDDING_BATCH_SIZE, convert_to_numpy=True)
+
+
+class EmbeddingService(DocumentProcessor):
+    """
+    Generate embeddings for documents
+
+    The model lives in a dedicated encoder process, so inference never
+    competes with the API event loop for the GIL. The micro-batcher stays
+    in the API process and sends one merged batch at a time to the encoder.
+    """
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL, inference: str = EMBEDDING_INFERENCE):
+        """Start the encoder process and load the embedding model in it"""
+        print(f"[*] Loading embedding model: {model_name} ({inference})")
+        self._encoder_args = (model_name, inference)
+        self._encoder = self._start_encoder()
+        info = self._encoder.submit(_encoder_info).result()
+        self.inference = info["inference"]
+        # Quantized vectors differ slightly, so they get their own name in payloads and the cache
+        self.model_name = model_name if self.inference == "torch" else f"{model_name}@{self.inference}"
+        self.embedding_dim = info["embedding_dim"]
+        self.batcher = MicroBatcher(self._encode)
+        print(f"[*] Model loaded. Embedding dimension: {self.embedding_dim}")
+        max_seq_length = info["max_seq_length"]
+        if CHUNK_MAX_TOKENS and max_seq_length and max_seq_length < CHUNK_MAX_TOKENS:
+            print(f"[!] CHUNK_MAX_TOKENS={CHUNK_MAX_TOKENS} exceeds the model max_seq_length "
+                  f"({max_seq_length}); chunks will be truncated")
+
+    def _start_encoder(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=1,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_encoder_process,
+            initargs=self._encoder_args
+        )
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        try:
+            return self._encoder.submit(_encode_in_process, texts).result()
+        except BrokenProcessPool:
+            # The encoder process died (e.g. out of memory); later batches get a new one
+            print("[!] Embedding encoder process died, restarting it")
+            self._encoder = self._start_encoder()
+            raise
+
+    def close(self):
+        """Stop the encoder process"""
+        self._encoder.shutdown(wait=False, cancel_futures=True)
+
+    def embed_chunks(self, texts: List[str]) -> tuple:
+        """
+        Embed texts, encoding only those missing from the embedding cache
+
+        Returns (float32 array of vectors, list of cached flags per text)
+        """
+        cache = get_embedding_cache()
+        cached = cache.get_many(self.model_name, texts) if cache else [None] * len(texts)
+        vectors = np.empty((len(texts), self.embedding_dim), dtype=np.float32)
+        for index, vector in enumerate(cached):
+            if vector is not None:
+                vectors[index] = np.frombuffer(vector, dtype=np.float32)
+
+        misses = [index for index, vector in enumerate(cached) if vector is None]
+        if misses:
+            miss_texts = [texts[index] for index in misses]
+            encoded = self.batcher.submit(miss_texts).result().astype(np.float32, copy=False)
+            vectors[misses] = encoded
+            if cache:
+                cache.put_many(self.model_name, miss_texts, encoded)
+
+        return vectors, [vector is not None for vector in cached]
 
     def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
-        """Generate embeddings for list of texts"""
-        embeddings = self.model.encode(texts, convert_to_numpy=True)
-        return embeddings.tolist()
+        """Generate embeddings for list of texts (cached, batched with concurrent callers)"""
+        if not texts:
+            return []
+        return self.embed_chunks(texts)[0].tolist()
 
     def process_document(self, file_path: str, file_extension: str) -> Dict:
         """
@@ -143,11 +443,120 @@ class EmbeddingService:
 
 # Global instance
 _embedding_service = None
+_embedding_service_lock = threading.Lock()
 
 
 def get_embedding_service() -> EmbeddingService:
     """Get or create global embedding service instance"""
     global _embedding_service
     if _embedding_service is None:
-        _embedding_service = EmbeddingService()
+        with _embedding_service_lock:
+            if _embedding_service is None:
+                _embedding_service = EmbeddingService()
     return _embedding_service
+
+
+def shutdown_embedding_service():
+    """Stop the encoder process of the global embedding service, if it was started"""
+    global _embedding_service
+    with _embedding_service_lock:
+        if _embedding_service is not None:
+            _embedding_service.close()
+            _embedding_service = None
+
+
+def start_background_warmup() -> threading.Thread:
+    """Load the model and run one encode in a background thread"""
+    def warmup():
+        started = time.perf_counter()
+        try:
+            get_embedding_service().generate_embeddings(["warmup"])
+            print(f"[*] Embedding model warm in {time.perf_counter() - started:.1f}s")
+        except Exception as e:
+            print(f"[!] Embedding model warmup failed: {e}")
+
+    thread = threading.Thread(target=warmup, name="embedding-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def get_embedding_stats() -> Optional[Dict]:
+    """Micro-batcher metrics, or None if the model is not loaded yet"""
+    if _embedding_service is None:
+        return None
+    return _embedding_service.batcher.stats()
+
+
+def extract_and_chunk(file_path: str, file_extension: str) -> Dict:
+    """
+    Extract and chunk a document (process pool entry point)
+
+    PDF pages stream into the chunker as they are extracted, and chunk
+    metadata records the pages each chunk spans.
+    """
+    processor = DocumentProcessor()
+    page_starts: List[int] = []  # Document offset of each PDF page
+    total_chars = 0
+
+    def segments() -> Iterator[str]:
+        nonlocal total_chars
+        if file_extension.lower() == '.pdf':
+            for page in processor.iter_pdf_pages(file_path):
+                page_starts.append(total_chars)
+                total_chars += len(page)
+                yield page
+        else:
+            text = processor.extract_text(file_path, file_extension)
+            total_chars = len(text)
+            yield from split_segments(text)
+
+    chunks = []
+    chunk_metadata = []
+    for chunk in chunk_segments(segments()):
+        metadata = {"char_start": chunk.start, "char_end": chunk.end, "tokens": chunk.tokens}
+        if page_starts:
+            metadata["page_start"] = bisect_right(page_starts, chunk.start)
+            metadata["page_end"] = bisect_right(page_starts, chunk.end - 1)
+        chunks.append(chunk.text)
+        chunk_metadata.append(metadata)
+
+    if not chunks:
+        raise ValueError("No text extracted from document")
+    return {"chunks": chunks, "chunk_metadata": chunk_metadata, "total_chars": total_chars}
+
+
+def build_embedding_items(
+    chunks: List[str],
+    embeddings,
+    model_name: str,
+    total_chars: int,
+    cached: Optional[List[bool]] = None,
+    chunk_metadata: Optional[List[Dict]] = None
+) -> List[Dict]:
+    """
+    Pair chunks with their embeddings
+
+    Returns items in the same schema as the n8n embedding webhook:
+    [{ id, text, embedding, chunk_index, chunk_total, embedding_model, embedding_dim, metadata }]
+    plus "cached" when the embedding came from the embedding cache.
+    Embeddings stay rows of the embeddings array (no per-float objects).
+    """
+    chunk_total = len(chunks)
+    cached = cached or [False] * chunk_total
+    chunk_metadata = chunk_metadata or [{}] * chunk_total
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "text": chunk,
+            "embedding": embedding,
+            "chunk_index": index,
+            "chunk_total": chunk_total,
+            "embedding_model": model_name,
+            "embedding_dim": len(embedding),
+            "metadata": {"total_chars": total_chars, **metadata},
+            "cached": from_cache
+        }
+        for index, (chunk, embedding, from_cache, metadata) in enumerate(
+            zip(chunks, embeddings, cached, chunk_metadata)
+        )
+    ]
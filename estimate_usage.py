@@ -2,9 +2,10 @@
 Estimate customer usage from Qdrant text chunks
 Calculates approximate MB usage based on text length
 """
-import json
 import httpx
 
+from customer_manager import CustomerManager
+
 CUSTOMER_ID = "2122beac"
 COLLECTION_NAME = "customer_2122beac"
 
@@ -84,26 +85,24 @@ for doc_id, doc_bytes in sorted(unique_docs.items(), key=lambda x: x[1], reverse
     doc_mb = doc_bytes / (1024 * 1024)
     print(f"    {doc_id}: {doc_mb:.3f} MB ({doc_bytes:,} bytes)")
 
-# Update customers.json
-print(f"\n[*] Updating customers.json...")
-
-with open("customers.json", "r", encoding="utf-8") as f:
-    data = json.load(f)
-
-for customer in data["customers"]:
-    if customer["customer_id"] == CUSTOMER_ID:
-        customer["document_count"] = len(unique_docs)
-        customer["used_mb"] = round(total_mb, 2)
-        customer["usage_percent"] = round((total_mb / customer["quota_mb"]) * 100, 1)
-        customer["remaining_mb"] = round(customer["quota_mb"] - total_mb, 2)
-
-        print(f"\n[+] Updated customer: {customer['name']}")
-        print(f"    Document count: {customer['document_count']}")
-        print(f"    Used MB: {customer['used_mb']:.2f}")
-        print(f"    Usage: {customer['usage_percent']}%")
-        print(f"    Remaining: {customer['remaining_mb']:.2f} MB")
-
-with open("customers.json", "w", encoding="utf-8") as f:
-    json.dump(data, f, indent=2, ensure_ascii=False)
-
-print(f"\n[✓] customers.json updated successfully!")
+# Update the customer through CustomerManager (SQLite or customers.json,
+# whichever STORAGE_BACKEND selects; customers.json is import-only under SQLite)
+print(f"\n[*] Updating customer {CUSTOMER_ID}...")
+
+manager = CustomerManager()
+if not manager.update_customer(CUSTOMER_ID, {
+    "document_count": len(unique_docs),
+    "used_mb": round(total_mb, 2)
+}):
+    print(f"[!] Customer {CUSTOMER_ID} not found")
+    raise SystemExit(1)
+manager.flush()
+
+customer = manager.get_customer(CUSTOMER_ID).to_dict()
+print(f"\n[+] Updated customer: {customer['name']}")
+print(f"    Document count: {customer['document_count']}")
+print(f"    Used MB: {customer['used_mb']:.2f}")
+print(f"    Usage: {customer['usage_percent']}%")
+print(f"    Remaining: {customer['remaining_mb']:.2f} MB")
+
+print(f"\n[✓] Customer usage updated successfully!")
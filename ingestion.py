@@ -0,0 +1,338 @@
+"""
+Document Ingestion Helpers
+Streaming upload handling, incremental n8n response parsing and
+batched Qdrant upserts with bounded memory per upload
+"""
+
+import asyncio
+import json
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, Callable, Dict, List, Optional, Set
+
+import httpx
+import numpy as np
+from qdrant_client.models import Batch, SparseVector
+
+from embedding_cache import get_embedding_cache
+from sparse import HYBRID_SEARCH, SPARSE_VECTOR_NAME, document_sparse_vector, sparse_vector_config
+
+# Configuration
+UPSERT_BATCH_SIZE = int(os.getenv("UPSERT_BATCH_SIZE", 256))  # Points per upsert request
+UPSERT_CONCURRENCY = int(os.getenv("UPSERT_CONCURRENCY", 4))  # Parallel upsert requests per upload
+MAX_UPLOAD_MB = float(os.getenv("MAX_UPLOAD_MB", 100))
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "n8n").lower()  # "n8n" or "local"
+QDRANT_VECTOR_DATATYPE = os.getenv("QDRANT_VECTOR_DATATYPE", "float32").lower()  # Stored vectors: float32 or float16
+QDRANT_VECTOR_QUANTIZATION = os.getenv("QDRANT_VECTOR_QUANTIZATION", "").lower()  # "" or "int8" (scalar)
+EMBEDDING_WORKERS = int(os.getenv("EMBEDDING_WORKERS", 1))  # Processes for local text extraction and chunking
+
+BYTES_PER_MB = 1024 * 1024
+
+
+def upload_size(file) -> int:
+    """
+    Size of an uploaded file
+
+    Starlette has already spooled the whole multipart body by the time the
+    handler runs, so the size it recorded is used instead of reading the
+    file again (falling back to the spooled file's length).
+    """
+    if getattr(file, "size", None) is not None:
+        return file.size
+    position = file.file.tell()
+    size = file.file.seek(0, os.SEEK_END)
+    file.file.seek(position)
+    return size
+
+
+class _AsyncByteReader:
+    """Async file-like adapter over an async byte iterator (for ijson)"""
+
+    def __init__(self, chunks: AsyncIterator[bytes]):
+        self._chunks = chunks
+
+    async def read(self, size: int = -1) -> bytes:
+        # ijson probes the type with read(0); that must not consume a chunk
+        if size == 0:
+            return b""
+        # An empty chunk would read as end of stream
+        async for chunk in self._chunks:
+            if chunk:
+                return chunk
+        return b""
+
+
+async def iter_n8n_embeddings(response: httpx.Response) -> AsyncIterator[Dict]:
+    """
+    Yield items of the n8n "embeddings" array as they are parsed
+
+    Uses ijson to parse the streamed response body incrementally; falls
+    back to reading the whole body if ijson is not installed.
+    """
+    try:
+        import ijson
+    except ImportError:
+        data = json.loads(await response.aread())
+        for item in data.get('embeddings', []):
+            yield item
+        return
+
+    async for item in ijson.items(_AsyncByteReader(response.aiter_bytes()), 'embeddings.item', use_float=True):
+        yield item
+
+
+_embedding_executor: Optional[ProcessPoolExecutor] = None
+
+
+def get_embedding_executor() -> ProcessPoolExecutor:
+    """Get or create the process pool extracting and chunking documents for local embedding"""
+    global _embedding_executor
+    if _embedding_executor is None:
+        _embedding_executor = ProcessPoolExecutor(
+            max_workers=EMBEDDING_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _embedding_executor
+
+
+def shutdown_embedding_executor():
+    """Stop local embedding worker processes and the encoder process"""
+    global _embedding_executor
+    if _embedding_executor is not None:
+        _embedding_executor.shutdown(wait=False, cancel_futures=True)
+        _embedding_executor = None
+    module = sys.modules.get("embedding_service")
+    if module is not None:
+        module.shutdown_embedding_service()
+
+
+def _warm_extraction_worker():
+    """Load the chunking tokenizer and chunk size in an extraction worker"""
+    from chunking import get_chunk_max_tokens, get_tokenizer
+    get_tokenizer()
+    get_chunk_max_tokens()
+
+
+def start_local_embedding_warmup():
+    """
+    Warm the local backend without delaying startup when EMBEDDING_WARMUP is set
+
+    Loads the model in a background thread and the tokenizer in an
+    extraction worker; otherwise both load on the first upload.
+    """
+    from embedding_service import EMBEDDING_WARMUP, start_background_warmup
+
+    if not EMBEDDING_WARMUP:
+        return
+    start_background_warmup()
+    get_embedding_executor().submit(_warm_extraction_worker)
+
+
+async def get_local_embedding_service():
+    """Load the local EmbeddingService off the event loop"""
+    from embedding_service import get_embedding_service
+
+    return await asyncio.to_thread(get_embedding_service)
+
+
+async def embed_document_locally(file_path: str, file_extension: str) -> List[Dict]:
+    """
+    Embed a document with the local EmbeddingService
+
+    Extraction and chunking run in the process pool; chunks missing from
+    the embedding cache go through the service's micro-batcher, so chunks
+    of concurrent uploads share model.encode batches in the encoder process.
+    """
+    from embedding_service import build_embedding_items, extract_and_chunk
+
+    loop = asyncio.get_running_loop()
+    document = await loop.run_in_executor(get_embedding_executor(), extract_and_chunk, file_path, file_extension)
+    service = await get_local_embedding_service()
+    embeddings, cached = await asyncio.to_thread(service.embed_chunks, document["chunks"])
+    return build_embedding_items(
+        document["chunks"], embeddings, service.model_name, document["total_chars"],
+        cached=cached, chunk_metadata=document["chunk_metadata"]
+    )
+
+
+async def cache_n8n_embeddings(items: List[Dict]) -> List[Dict]:
+    """
+    Mark n8n embedding items seen before as "cached" for hit rate reporting
+
+    n8n embeds every chunk itself and its vectors are keyed by the n8n
+    model, so the local backend could never reuse them. Only key-only
+    entries are recorded, keeping the cache's space for local vectors.
+    """
+    cache = get_embedding_cache()
+    if cache is None or not items:
+        return items
+
+    def run():
+        by_model: Dict[str, List[Dict]] = {}
+        for item in items:
+            by_model.setdefault(item.get('embedding_model') or 'n8n', []).append(item)
+        for model, group in by_model.items():
+            seen = cache.contains_many(model, [item['text'] for item in group])
+            for item, cached in zip(group, seen):
+                item['cached'] = cached
+            cache.mark_many(model, [item['text'] for item, cached in zip(group, seen) if not cached])
+
+    await asyncio.to_thread(run)
+    return items
+
+
+def local_embedding_stats() -> Optional[Dict]:
+    """Micro-batcher metrics of the local EmbeddingService, if it was loaded"""
+    module = sys.modules.get("embedding_service")
+    return module.get_embedding_stats() if module is not None else None
+
+
+async def local_embedding_dimension() -> int:
+    """Vector size produced by the local embedding model"""
+    service = await get_local_embedding_service()
+    return service.embedding_dim
+
+
+def build_collection_config(vector_size: int) -> Dict:
+    """Qdrant collection config for a customer collection"""
+    vectors = {
+        "size": vector_size,
+        "distance": "Cosine"
+    }
+    if QDRANT_VECTOR_DATATYPE != "float32":
+        vectors["datatype"] = QDRANT_VECTOR_DATATYPE
+    config = {"vectors": vectors}
+    if HYBRID_SEARCH:
+        config["sparse_vectors"] = sparse_vector_config()
+    if QDRANT_VECTOR_QUANTIZATION == "int8":
+        config["quantization_config"] = {"scalar": {"type": "int8", "always_ram": True}}
+    return config
+
+
+def build_point_payload(
+    item: Dict,
+    customer_id: str,
+    filename: str,
+    description: Optional[str],
+    file_size_mb: float,
+    job_id: Optional[str] = None
+) -> Dict:
+    """Build a Qdrant point payload from an embedding item ({ id, text, embedding, metadata, ... })"""
+    return {
+        "customer_id": customer_id,
+        "filename": filename,
+        "text": item['text'],
+        "kind": item.get('kind', 'document'),
+        "question": item.get('question'),
+        "answer": item.get('answer'),
+        "chunk_index": item.get('chunk_index', 0),
+        "chunk_total": item.get('chunk_total', 1),
+        "description": description or "",
+        "file_size_mb": file_size_mb,
+        "embedding_model": item.get('embedding_model'),
+        "job_id": job_id,
+        "metadata": item.get('metadata', {})
+    }
+
+
+def vector_batch(vectors: List) -> List[List[float]]:
+    """
+    Vectors of one upsert batch as lists for the Qdrant client
+
+    NumPy rows (local backend) are stacked and converted in one C-level
+    pass; lists (parsed n8n responses) are passed through.
+    """
+    if vectors and all(isinstance(vector, np.ndarray) for vector in vectors):
+        return np.stack(vectors).astype(np.float32, copy=False).tolist()
+    return [vector.tolist() if isinstance(vector, np.ndarray) else vector for vector in vectors]
+
+
+class BatchUpserter:
+    """
+    Upsert points in batches as they arrive
+
+    At most `concurrency` batches are in flight; add() waits when that
+    limit is reached, so only a bounded number of points is held in memory.
+    Batches are sent as column-oriented Batch objects, so vectors stay
+    NumPy rows until the batch is serialized. With sparse=True each point
+    also gets a BM25 sparse vector computed from its payload text.
+    """
+
+    def __init__(
+        self,
+        client,
+        collection_name: str,
+        batch_size: int = UPSERT_BATCH_SIZE,
+        concurrency: int = UPSERT_CONCURRENCY,
+        on_progress: Optional[Callable[[int], None]] = None,
+        sparse: bool = False
+    ):
+        self.client = client
+        self.sparse = sparse
+        self.on_progress = on_progress
+        self.collection_name = collection_name
+        self.batch_size = max(batch_size, 1)
+        self._semaphore = asyncio.Semaphore(max(concurrency, 1))
+        self._ids: List = []
+        self._vectors: List = []
+        self._payloads: List[Dict] = []
+        self._tasks: Set[asyncio.Task] = set()
+        self.points_upserted = 0
+        self.batches = 0
+
+    async def add(self, point_id, vector, payload: Dict):
+        self._ids.append(point_id)
+        self._vectors.append(vector)
+        self._payloads.append(payload)
+        if len(self._ids) >= self.batch_size:
+            await self._submit()
+
+    async def _submit(self):
+        ids, vectors, payloads = self._ids, self._vectors, self._payloads
+        self._ids, self._vectors, self._payloads = [], [], []
+
+        # Surface failures of earlier batches instead of reading on
+        for task in [t for t in self._tasks if t.done()]:
+            self._tasks.discard(task)
+            task.result()
+
+        await self._semaphore.acquire()
+        task = asyncio.create_task(self._upsert(ids, vectors, payloads))
+        self._tasks.add(task)
+        self.batches += 1
+
+    async def _upsert(self, ids: List, vectors: List, payloads: List[Dict]):
+        try:
+            dense = vector_batch(vectors)
+            if self.sparse:
+                sparse = []
+                for payload in payloads:
+                    indices, values = document_sparse_vector(payload["text"])
+                    sparse.append(SparseVector(indices=indices, values=values))
+                batch = Batch(ids=ids, vectors={"": dense, SPARSE_VECTOR_NAME: sparse}, payloads=payloads)
+            else:
+                batch = Batch(ids=ids, vectors=dense, payloads=payloads)
+            await self.client.upsert(collection_name=self.collection_name, points=batch, wait=True)
+            self.points_upserted += len(ids)
+            if self.on_progress is not None:
+                self.on_progress(self.points_upserted)
+        finally:
+            self._semaphore.release()
+
+    async def finish(self) -> int:
+        """Upsert the remaining points, wait for all batches; returns the batch count"""
+        if self._ids:
+            await self._submit()
+        tasks, self._tasks = list(self._tasks), set()
+        await asyncio.gather(*tasks)
+        return self.batches
+
+    async def abort(self):
+        """Cancel batches still in flight"""
+        self._ids, self._vectors, self._payloads = [], [], []
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = set()
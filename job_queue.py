@@ -0,0 +1,364 @@
+"""
+Ingestion Job Queue
+Persistent SQLite-backed queue of document ingestion jobs with a bounded
+worker pool, per-customer concurrency limits and retries with backoff
+"""
+
+import asyncio
+import json
+import os
+import shutil
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+from storage import DATABASE_FILE, SQLiteDatabase, get_database
+
+# Configuration
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 4))  # Jobs running at once per process
+JOB_CUSTOMER_CONCURRENCY = int(os.getenv("JOB_CUSTOMER_CONCURRENCY", 1))  # Jobs running at once per customer, all processes
+JOB_MAX_RUNNING = int(os.getenv("JOB_MAX_RUNNING", 0))  # Jobs running at once across all processes (0 = no limit)
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 3))
+JOB_RETRY_BASE_DELAY = float(os.getenv("JOB_RETRY_BASE_DELAY", 10))  # Seconds, doubled on every retry
+JOB_POLL_INTERVAL = 1.0  # Seconds between queue checks when idle
+JOB_HEARTBEAT_INTERVAL = 15.0  # Seconds between heartbeats of a running job
+JOB_STALE_AFTER = 60.0  # Running jobs without a heartbeat for this long are requeued
+UPLOADS_DIR = Path(os.getenv("UPLOADS_DIR", DATABASE_FILE.parent / "uploads"))
+
+JOBS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    customer_id TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    content_type TEXT,
+    description TEXT,
+    file_path TEXT NOT NULL,
+    size_bytes INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    chunks_total INTEGER,
+    chunks_upserted INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    result TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    next_attempt_at REAL NOT NULL DEFAULT 0,
+    heartbeat_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, next_attempt_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_customer ON jobs(customer_id, created_at);
+"""
+
+# Progress callback: progress(chunks_upserted, chunks_total)
+ProgressCallback = Callable[[int, Optional[int]], None]
+# Failure hook: on_failed(job) cleans up after a job that will not be retried
+FailureHook = Callable[[Dict], Awaitable[None]]
+
+
+class PermanentJobError(Exception):
+    """Job failure that must not be retried"""
+
+
+def _now_iso() -> str:
+    return datetime.utcnow().isoformat()
+
+
+def _retry_delay(attempts: int) -> float:
+    """Backoff before the next attempt after `attempts` failed ones"""
+    return JOB_RETRY_BASE_DELAY * (2 ** (attempts - 1))
+
+
+def _job_from_row(row) -> Dict:
+    """Convert a jobs row to an API-friendly dict"""
+    job = dict(row)
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    total = job["chunks_total"]
+    job["progress_percent"] = round(job["chunks_upserted"] / total * 100, 1) if total else None
+    for internal in ("file_path", "next_attempt_at", "heartbeat_at"):
+        job.pop(internal, None)
+    return job
+
+
+class JobQueue:
+    """
+    Ingestion jobs persisted in SQLite so they survive restarts
+
+    handler(job, progress) runs one job and returns its result dict.
+    Exceptions are retried with exponential backoff up to JOB_MAX_ATTEMPTS,
+    except PermanentJobError which fails the job immediately. on_failed(job)
+    runs once a job is marked failed, e.g. to remove what it wrote.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[Dict, ProgressCallback], Awaitable[Dict]],
+        db: Optional[SQLiteDatabase] = None,
+        on_failed: Optional[FailureHook] = None
+    ):
+        self.handler = handler
+        self.on_failed = on_failed
+        self._cleanup_tasks: Set[asyncio.Task] = set()
+        self.db = db or get_database()
+        self.db.connection().executescript(JOBS_SCHEMA)
+        UPLOADS_DIR.mkdir(parents=True, exist_ok=True)
+        self._wakeup: Optional[asyncio.Event] = None
+        self._workers: List[asyncio.Task] = []
+        self._running_here = 0
+        self._last_stale_check = 0.0
+
+    async def enqueue(
+        self,
+        customer_id: str,
+        filename: str,
+        file_obj,
+        size_bytes: int,
+        content_type: Optional[str] = None,
+        description: Optional[str] = None,
+        byte_limit: Optional[int] = None
+    ) -> Optional[Dict]:
+        """
+        Copy the upload to the uploads directory and queue an ingestion job
+
+        With byte_limit, the job is only queued if it fits together with the
+        customer's queued and running jobs (checked atomically on insert);
+        otherwise the copy is removed and None is returned.
+        """
+        job_id = uuid.uuid4().hex
+        file_path = UPLOADS_DIR / f"{job_id}{Path(filename).suffix.lower()}"
+
+        def copy_upload():
+            with open(file_path, 'wb') as dst:
+                shutil.copyfileobj(file_obj, dst, 1024 * 1024)
+
+        await asyncio.to_thread(copy_upload)
+
+        now = _now_iso()
+        cursor = self.db.connection().execute(
+            "INSERT INTO jobs (job_id, customer_id, filename, content_type, description, file_path, "
+            "size_bytes, status, max_attempts, created_at, updated_at) "
+            "SELECT ?, ?, ?, ?, ?, ?, ?, 'queued', ?, ?, ? "
+            "WHERE ? IS NULL OR ? + (SELECT COALESCE(SUM(size_bytes), 0) FROM jobs "
+            "WHERE customer_id = ? AND status IN ('queued', 'running')) <= ?",
+            (job_id, customer_id, filename, content_type, description or "", str(file_path),
+             size_bytes, JOB_MAX_ATTEMPTS, now, now,
+             byte_limit, size_bytes, customer_id, byte_limit)
+        )
+        if not cursor.rowcount:
+            self._remove_file({"file_path": str(file_path)})
+            return None
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        row = self.db.connection().execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return _job_from_row(row) if row else None
+
+    def pending_bytes(self, customer_id: str) -> int:
+        """Upload bytes of the customer's queued and running jobs (not yet in used_mb)"""
+        row = self.db.connection().execute(
+            "SELECT COALESCE(SUM(size_bytes), 0) AS n FROM jobs "
+            "WHERE customer_id = ? AND status IN ('queued', 'running')",
+            (customer_id,)
+        ).fetchone()
+        return row["n"]
+
+    def list_for_customer(self, customer_id: str, limit: int = 50) -> List[Dict]:
+        rows = self.db.connection().execute(
+            "SELECT * FROM jobs WHERE customer_id = ? ORDER BY created_at DESC LIMIT ?",
+            (customer_id, limit)
+        ).fetchall()
+        return [_job_from_row(row) for row in rows]
+
+    def stats(self) -> Dict:
+        rows = self.db.connection().execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        return {
+            "workers": len(self._workers),
+            "running_here": self._running_here,
+            "jobs": {row["status"]: row["n"] for row in rows}
+        }
+
+    async def start(self, workers: int = JOB_WORKERS):
+        """Start the worker pool (called from the app lifespan)"""
+        self._wakeup = asyncio.Event()
+        self._requeue_stale()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(workers)]
+        print(f"[*] Ingestion job queue started with {workers} workers")
+
+    async def stop(self):
+        """Stop the worker pool; interrupted jobs are requeued on next start"""
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def _requeue_stale(self):
+        """
+        Requeue running jobs whose worker stopped sending heartbeats (crash, restart)
+
+        The interrupted run counts as an attempt: jobs out of attempts are
+        failed (a document that kills its worker must not crash-loop the
+        service), the others are retried after the usual backoff.
+        """
+        conn = self.db.connection()
+        cutoff = time.time() - JOB_STALE_AFTER
+        stale = conn.execute(
+            "SELECT * FROM jobs WHERE status = 'running' AND COALESCE(heartbeat_at, 0) < ?", (cutoff,)
+        ).fetchall()
+
+        requeued = failed = 0
+        for row in stale:
+            job = dict(row)
+            error = f"Worker stopped during attempt {job['attempts']}"
+            if job["attempts"] >= job["max_attempts"]:
+                cursor = conn.execute(
+                    "UPDATE jobs SET status = 'failed', error = ?, updated_at = ? "
+                    "WHERE job_id = ? AND status = 'running' AND COALESCE(heartbeat_at, 0) < ?",
+                    (error, _now_iso(), job["job_id"], cutoff)
+                )
+                if cursor.rowcount:
+                    self._remove_file(job)
+                    self._schedule_cleanup(job)
+                    failed += 1
+            else:
+                cursor = conn.execute(
+                    "UPDATE jobs SET status = 'queued', error = ?, next_attempt_at = ?, updated_at = ? "
+                    "WHERE job_id = ? AND status = 'running' AND COALESCE(heartbeat_at, 0) < ?",
+                    (error, time.time() + _retry_delay(job["attempts"]), _now_iso(), job["job_id"], cutoff)
+                )
+                requeued += cursor.rowcount
+
+        if requeued:
+            print(f"[*] Requeued {requeued} interrupted ingestion jobs")
+        if failed:
+            print(f"[!] Failed {failed} interrupted ingestion jobs that were out of attempts")
+        self._last_stale_check = time.time()
+
+    def _claim(self) -> Optional[Dict]:
+        """
+        Atomically claim the oldest due job whose customer is below its limit
+
+        The limits count running jobs in the database, so they hold across
+        all uvicorn workers sharing it.
+        """
+        if time.time() - self._last_stale_check > JOB_STALE_AFTER:
+            self._requeue_stale()
+
+        conn = self.db.connection()
+        candidates = conn.execute(
+            "SELECT job_id, customer_id FROM jobs WHERE status = 'queued' AND next_attempt_at <= ? "
+            "ORDER BY created_at LIMIT 50",
+            (time.time(),)
+        ).fetchall()
+
+        for candidate in candidates:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, heartbeat_at = ?, "
+                "error = NULL, updated_at = ? WHERE job_id = ? AND status = 'queued' "
+                "AND (SELECT COUNT(*) FROM jobs WHERE customer_id = ? AND status = 'running') < ? "
+                "AND (? <= 0 OR (SELECT COUNT(*) FROM jobs WHERE status = 'running') < ?)",
+                (time.time(), _now_iso(), candidate["job_id"],
+                 candidate["customer_id"], JOB_CUSTOMER_CONCURRENCY,
+                 JOB_MAX_RUNNING, JOB_MAX_RUNNING)
+            )
+            if cursor.rowcount:
+                row = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (candidate["job_id"],)).fetchone()
+                return dict(row)
+        return None
+
+    async def _worker(self):
+        while True:
+            job = self._claim()
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=JOB_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run(job)
+
+    async def _heartbeat(self, job_id: str):
+        while True:
+            await asyncio.sleep(JOB_HEARTBEAT_INTERVAL)
+            self.db.connection().execute(
+                "UPDATE jobs SET heartbeat_at = ? WHERE job_id = ?", (time.time(), job_id)
+            )
+
+    def _progress(self, job_id: str) -> ProgressCallback:
+        def progress(chunks_upserted: int, chunks_total: Optional[int] = None):
+            self.db.connection().execute(
+                "UPDATE jobs SET chunks_upserted = ?, chunks_total = COALESCE(?, chunks_total), "
+                "heartbeat_at = ?, updated_at = ? WHERE job_id = ?",
+                (chunks_upserted, chunks_total, time.time(), _now_iso(), job_id)
+            )
+        return progress
+
+    async def _run(self, job: Dict):
+        job_id = job["job_id"]
+        self._running_here += 1
+        heartbeat = asyncio.create_task(self._heartbeat(job_id))
+        conn = self.db.connection()
+
+        try:
+            result = await self.handler(job, self._progress(job_id))
+            conn.execute(
+                "UPDATE jobs SET status = 'completed', result = ?, updated_at = ? WHERE job_id = ?",
+                (json.dumps(result, default=str), _now_iso(), job_id)
+            )
+            self._remove_file(job)
+            print(f"[*] Ingestion job {job_id} completed")
+
+        except asyncio.CancelledError:
+            # Shutdown: leave the job running so it is requeued as stale on restart
+            raise
+
+        except Exception as e:
+            error = getattr(e, "detail", None) or str(e)
+            if isinstance(e, PermanentJobError) or job["attempts"] >= job["max_attempts"]:
+                conn.execute(
+                    "UPDATE jobs SET status = 'failed', error = ?, updated_at = ? WHERE job_id = ?",
+                    (error, _now_iso(), job_id)
+                )
+                self._remove_file(job)
+                print(f"[!] Ingestion job {job_id} failed: {error}")
+                await self._cleanup(job)
+            else:
+                delay = _retry_delay(job["attempts"])
+                conn.execute(
+                    "UPDATE jobs SET status = 'queued', error = ?, next_attempt_at = ?, updated_at = ? "
+                    "WHERE job_id = ?",
+                    (error, time.time() + delay, _now_iso(), job_id)
+                )
+                print(f"[!] Ingestion job {job_id} attempt {job['attempts']} failed, retrying in {delay:.0f}s: {error}")
+
+        finally:
+            heartbeat.cancel()
+            self._running_here -= 1
+            if self._wakeup is not None:
+                self._wakeup.set()
+
+    async def _cleanup(self, job: Dict):
+        """Run on_failed for a failed job; errors are logged, not raised"""
+        if self.on_failed is None:
+            return
+        try:
+            await self.on_failed(job)
+        except Exception as e:
+            print(f"[!] Cleanup of failed ingestion job {job['job_id']} failed: {e}")
+
+    def _schedule_cleanup(self, job: Dict):
+        """Run _cleanup in the background (from the synchronous stale check)"""
+        task = asyncio.get_running_loop().create_task(self._cleanup(job))
+        self._cleanup_tasks.add(task)
+        task.add_done_callback(self._cleanup_tasks.discard)
+
+    @staticmethod
+    def _remove_file(job: Dict):
+        try:
+            os.remove(job["file_path"])
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,139 @@
+"""
+Prometheus Metrics
+Request latency middleware, upstream call and ingestion metrics, cache
+hit ratios and event-loop lag for the dashboard's own /metrics endpoint
+
+Metrics are per process; with several uvicorn workers each one is
+scraped separately (or set up prometheus_client multiprocess mode).
+"""
+
+import asyncio
+import os
+import time
+from typing import Callable, Dict, Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+# Configuration
+EVENT_LOOP_LAG_INTERVAL = float(os.getenv("EVENT_LOOP_LAG_INTERVAL", 0.5))  # Seconds between lag probes
+
+HTTP_REQUESTS = Counter(
+    "dashboard_http_requests_total", "HTTP requests handled", ["method", "route", "status"]
+)
+HTTP_LATENCY = Histogram(
+    "dashboard_http_request_duration_seconds", "HTTP request latency", ["method", "route"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+QDRANT_LATENCY = Histogram(
+    "dashboard_qdrant_request_duration_seconds", "Qdrant API call latency", ["method", "endpoint"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+QDRANT_ERRORS = Counter(
+    "dashboard_qdrant_request_errors_total", "Failed Qdrant API calls", ["method", "endpoint"]
+)
+N8N_DURATION = Histogram(
+    "dashboard_n8n_webhook_duration_seconds", "n8n embedding webhook duration", ["outcome"],
+    buckets=(0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+)
+UPLOAD_BYTES = Counter("dashboard_upload_bytes_total", "Bytes of ingested documents", ["backend"])
+UPLOAD_CHUNKS = Counter("dashboard_upload_chunks_total", "Chunks upserted for ingested documents", ["backend"])
+EVENT_LOOP_LAG = Gauge("dashboard_event_loop_lag_seconds", "Latest event loop scheduling delay")
+EVENT_LOOP_LAG_HISTOGRAM = Histogram(
+    "dashboard_event_loop_lag_distribution_seconds", "Event loop scheduling delay",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+)
+
+
+def qdrant_endpoint_label(endpoint: str) -> str:
+    """Low-cardinality label for a Qdrant path: its first segment (collection names dropped)"""
+    return endpoint.strip("/").split("/", 1)[0] or "root"
+
+
+class CacheStatsCollector:
+    """
+    Export hit ratio, hits and misses of the app's caches at scrape time
+
+    Sources are callables returning a stats dict with "hit_ratio" and
+    optionally "hits"/"misses" (or None when the cache is disabled).
+    """
+
+    def __init__(self):
+        self._sources: Dict[str, Callable[[], Optional[Dict]]] = {}
+
+    def register(self, name: str, stats: Callable[[], Optional[Dict]]):
+        self._sources[name] = stats
+
+    def collect(self):
+        ratio = GaugeMetricFamily("dashboard_cache_hit_ratio", "Cache hit ratio", labels=["cache"])
+        hits = CounterMetricFamily("dashboard_cache_hits", "Cache hits", labels=["cache"])
+        misses = CounterMetricFamily("dashboard_cache_misses", "Cache misses", labels=["cache"])
+        for name, source in self._sources.items():
+            try:
+                stats = source()
+            except Exception:
+                continue
+            if not stats:
+                continue
+            ratio.add_metric([name], stats.get("hit_ratio", 0))
+            if "hits" in stats:
+                hits.add_metric([name], stats["hits"])
+            if "misses" in stats:
+                misses.add_metric([name], stats["misses"])
+        yield ratio
+        yield hits
+        yield misses
+
+
+cache_stats = CacheStatsCollector()
+REGISTRY.register(cache_stats)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording latency and status of every HTTP request
+
+    Requests are labelled with the route template (e.g.
+    /api/customers/{customer_id}) so label cardinality stays bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            method = scope.get("method", "GET")
+            HTTP_LATENCY.labels(method, route_path).observe(time.perf_counter() - started)
+            HTTP_REQUESTS.labels(method, route_path, str(status["code"])).inc()
+
+
+async def monitor_event_loop_lag(interval: float = EVENT_LOOP_LAG_INTERVAL):
+    """Measure how late a sleep(interval) wakes up; runs until cancelled"""
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        lag = max(loop.time() - started - interval, 0.0)
+        EVENT_LOOP_LAG.set(lag)
+        EVENT_LOOP_LAG_HISTOGRAM.observe(lag)
+
+
+def render_metrics() -> tuple:
+    """Exposition body and content type for /metrics"""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
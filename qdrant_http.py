@@ -0,0 +1,177 @@
+"""
+Qdrant HTTP Connection Pool
+Shared long-lived httpx client for all Qdrant REST calls made by the dashboard
+"""
+
+import asyncio
+import os
+import time
+from typing import Dict, Optional
+
+import httpx
+
+# Configuration
+QDRANT_HTTP2 = os.getenv("QDRANT_HTTP2", "true").lower() == "true"
+QDRANT_POOL_MAX_CONNECTIONS = int(os.getenv("QDRANT_POOL_MAX_CONNECTIONS", 50))
+QDRANT_POOL_MAX_KEEPALIVE = int(os.getenv("QDRANT_POOL_MAX_KEEPALIVE", 20))
+QDRANT_POOL_KEEPALIVE_EXPIRY = float(os.getenv("QDRANT_POOL_KEEPALIVE_EXPIRY", 30.0))
+QDRANT_CONNECT_TIMEOUT = float(os.getenv("QDRANT_CONNECT_TIMEOUT", 5.0))
+QDRANT_TIMEOUT = float(os.getenv("QDRANT_TIMEOUT", 30.0))
+
+# Read timeouts per endpoint, keyed by the first path segment ("" is the root)
+# Override with e.g. QDRANT_ENDPOINT_TIMEOUTS="telemetry=60,metrics=15"
+ENDPOINT_TIMEOUTS = {
+    "": 5.0,
+    "cluster": 10.0,
+    "collections": QDRANT_TIMEOUT,
+    "metrics": 15.0,
+    "telemetry": 60.0,
+}
+
+
+def parse_seconds_map(value: str) -> Dict[str, float]:
+    """Parse "name=seconds,name=seconds" into a dict"""
+    timeouts = {}
+    for item in value.split(","):
+        if "=" not in item:
+            continue
+        name, seconds = item.split("=", 1)
+        try:
+            timeouts[name.strip()] = float(seconds)
+        except ValueError:
+            print(f"[!] Invalid timeout for endpoint '{name.strip()}': {seconds}")
+    return timeouts
+
+
+ENDPOINT_TIMEOUTS.update(parse_seconds_map(os.getenv("QDRANT_ENDPOINT_TIMEOUTS", "")))
+
+
+def _http2_available() -> bool:
+    """HTTP/2 needs the optional h2 package (httpx[http2])"""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class QdrantHTTPPool:
+    """Long-lived pooled HTTP client for the Qdrant REST API"""
+
+    def __init__(self, base_url: str, api_key: Optional[str] = None):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._http2 = False
+
+        # Pool statistics
+        self._in_use = 0
+        self._requests = 0
+        self._waited = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    async def start(self):
+        """Open the shared client (called from the app lifespan)"""
+        if self._client is not None:
+            return
+
+        http2 = QDRANT_HTTP2 and _http2_available()
+        self._http2 = http2
+        if QDRANT_HTTP2 and not http2:
+            print("[!] h2 package not installed, Qdrant pool falling back to HTTP/1.1")
+
+        headers = {"api-key": self.api_key} if self.api_key else {}
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            headers=headers,
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=QDRANT_POOL_MAX_CONNECTIONS,
+                max_keepalive_connections=QDRANT_POOL_MAX_KEEPALIVE,
+                keepalive_expiry=QDRANT_POOL_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(QDRANT_TIMEOUT, connect=QDRANT_CONNECT_TIMEOUT),
+        )
+        self._semaphore = asyncio.Semaphore(QDRANT_POOL_MAX_CONNECTIONS)
+        print(f"[*] Qdrant HTTP pool started (http2={http2}, max_connections={QDRANT_POOL_MAX_CONNECTIONS})")
+
+    async def close(self):
+        """Close the shared client and all pooled connections"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            self._semaphore = None
+
+    def timeout_for(self, endpoint: str) -> httpx.Timeout:
+        """Get the configured timeout for an endpoint path"""
+        segment = endpoint.lstrip("/").split("/", 1)[0].split("?", 1)[0]
+        read_timeout = ENDPOINT_TIMEOUTS.get(segment, QDRANT_TIMEOUT)
+        return httpx.Timeout(read_timeout, connect=QDRANT_CONNECT_TIMEOUT)
+
+    async def request(
+        self,
+        method: str,
+        endpoint: str,
+        json: Optional[dict] = None,
+        timeout: Optional[float] = None
+    ) -> httpx.Response:
+        """Send a request through the shared client"""
+        if self._client is None:
+            # Outside the app lifespan (scripts, ad-hoc use)
+            await self.start()
+
+        if timeout is not None:
+            request_timeout = httpx.Timeout(timeout, connect=QDRANT_CONNECT_TIMEOUT)
+        else:
+            request_timeout = self.timeout_for(endpoint)
+
+        wait_start = time.perf_counter()
+        async with self._semaphore:
+            waited = time.perf_counter() - wait_start
+            self._requests += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+            if waited > 0.001:
+                self._waited += 1
+
+            self._in_use += 1
+            try:
+                return await self._client.request(
+                    method,
+                    "/" + endpoint.lstrip("/"),
+                    json=json,
+                    timeout=request_timeout,
+                )
+            finally:
+                self._in_use -= 1
+
+    def stats(self) -> Dict:
+        """Get connection pool statistics"""
+        connections = []
+        if self._client is not None:
+            pool = getattr(self._client._transport, "_pool", None)
+            connections = list(getattr(pool, "connections", []))
+
+        idle = 0
+        for connection in connections:
+            try:
+                if connection.is_idle():
+                    idle += 1
+            except Exception:
+                pass
+
+        return {
+            "started": self._client is not None,
+            "http2": self._http2,
+            "max_connections": QDRANT_POOL_MAX_CONNECTIONS,
+            "max_keepalive": QDRANT_POOL_MAX_KEEPALIVE,
+            "connections_open": len(connections),
+            "connections_idle": idle,
+            "requests_in_use": self._in_use,
+            "requests_total": self._requests,
+            "requests_waited": self._waited,
+            "wait_avg_ms": round(self._wait_total / self._requests * 1000, 2) if self._requests else 0,
+            "wait_max_ms": round(self._wait_max * 1000, 2),
+        }
@@ -0,0 +1,136 @@
+"""
+Search Reranking
+Optional cross-encoder rerank stage with a per-request time budget;
+results keep their vector order when the budget is exceeded
+"""
+
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+# Configuration
+RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1")  # Multilingual
+RERANK_DEFAULT = os.getenv("RERANK_DEFAULT", "false").lower() == "true"  # Rerank when the request does not say
+RERANK_TOP_K = int(os.getenv("RERANK_TOP_K", 30))  # Candidates retrieved for reranking
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", 16))  # Query/text pairs per model call
+RERANK_WORKERS = int(os.getenv("RERANK_WORKERS", 2))
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", 300))
+
+
+class Reranker:
+    """Score query/text pairs with a sentence-transformers CrossEncoder"""
+
+    def __init__(self, model_name: str = RERANK_MODEL):
+        """Initialize cross-encoder model"""
+        from sentence_transformers import CrossEncoder
+
+        print(f"[*] Loading rerank model: {model_name}")
+        self.model_name = model_name
+        self.model = CrossEncoder(model_name)
+        print(f"[*] Rerank model loaded")
+
+    def score(self, query: str, texts: List[str]) -> List[float]:
+        return [float(score) for score in self.model.predict([(query, text) for text in texts])]
+
+
+# Global instance, loaded in the background on first use
+_reranker: Optional[Reranker] = None
+_reranker_lock = threading.Lock()
+_reranker_error: Optional[str] = None
+_rerank_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _load_reranker():
+    global _reranker, _reranker_error
+    with _reranker_lock:
+        if _reranker is not None:
+            return
+        try:
+            _reranker = Reranker()
+            _reranker_error = None
+        except Exception as e:
+            _reranker_error = str(e)
+            print(f"[!] Rerank model could not be loaded: {e}")
+
+
+def get_rerank_executor() -> ThreadPoolExecutor:
+    """Get or create the worker pool running rerank batches"""
+    global _rerank_executor
+    if _rerank_executor is None:
+        _rerank_executor = ThreadPoolExecutor(max_workers=RERANK_WORKERS, thread_name_prefix="rerank")
+    return _rerank_executor
+
+
+def shutdown_rerank_executor():
+    global _rerank_executor
+    if _rerank_executor is not None:
+        _rerank_executor.shutdown(wait=False, cancel_futures=True)
+        _rerank_executor = None
+
+
+def get_reranker() -> Optional[Reranker]:
+    """
+    The loaded Reranker, or None while it is loading
+
+    The first call starts loading the model in the background, so a
+    request never waits for the model beyond its own budget. A failed
+    load is not retried until restart.
+    """
+    if _reranker is None and _reranker_error is None and not _reranker_lock.locked():
+        threading.Thread(target=_load_reranker, name="rerank-load", daemon=True).start()
+    return _reranker
+
+
+async def rerank(
+    query: str,
+    results: List[Dict],
+    budget_ms: float = RERANK_BUDGET_MS
+) -> Tuple[List[Dict], Dict]:
+    """
+    Reorder results by cross-encoder score of their payload text
+
+    Batches of RERANK_BATCH_SIZE pairs run in the worker pool. If they do
+    not all finish within budget_ms (or the model is still loading), the
+    results are returned in their original order. Returns (results, info).
+    """
+    info = {"applied": False, "candidates": len(results), "model": RERANK_MODEL}
+    if not results:
+        return results, info
+
+    reranker = get_reranker()
+    if reranker is None:
+        info["reason"] = f"model unavailable: {_reranker_error}" if _reranker_error else "model loading"
+        return results, info
+
+    texts = [(result.get("payload") or {}).get("text") or "" for result in results]
+    loop = asyncio.get_running_loop()
+    executor = get_rerank_executor()
+    futures = [
+        loop.run_in_executor(executor, reranker.score, query, texts[start:start + RERANK_BATCH_SIZE])
+        for start in range(0, len(texts), RERANK_BATCH_SIZE)
+    ]
+
+    done, pending = await asyncio.wait(futures, timeout=max(budget_ms, 0) / 1000)
+    if pending:
+        # Batches that have not started are dropped; running ones finish unobserved
+        for future in pending:
+            future.cancel()
+        info["reason"] = f"budget of {budget_ms:.0f} ms exceeded"
+        return results, info
+
+    failed = [future for future in futures if future.exception() is not None]
+    if failed:
+        info["reason"] = f"rerank failed: {failed[0].exception()}"
+        return results, info
+
+    scores = [score for future in futures for score in future.result()]
+    reranked = []
+    for result, score in zip(results, scores):
+        result = dict(result)
+        result["rerank_score"] = score
+        reranked.append(result)
+    reranked.sort(key=lambda result: result["rerank_score"], reverse=True)
+    info["applied"] = True
+    return reranked, info
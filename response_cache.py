@@ -0,0 +1,159 @@
+"""
+Response Cache
+Per-endpoint TTL cache with single-flight request coalescing and
+stale-while-revalidate for read-only Qdrant proxy endpoints
+"""
+
+import asyncio
+import os
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+from qdrant_http import parse_seconds_map
+
+# Fresh lifetime per endpoint in seconds
+# Override with e.g. QDRANT_CACHE_TTLS="collections=5,telemetry=30"
+CACHE_TTLS = {
+    "status": 5.0,
+    "collections": 10.0,
+    "collection": 10.0,
+    "cluster": 15.0,
+    "telemetry": 15.0,
+}
+CACHE_TTLS.update(parse_seconds_map(os.getenv("QDRANT_CACHE_TTLS", "")))
+CACHE_DEFAULT_TTL = float(os.getenv("QDRANT_CACHE_DEFAULT_TTL", 10.0))
+# How long an expired entry may still be served while it is refreshed in the background
+CACHE_STALE_TTL = float(os.getenv("QDRANT_CACHE_STALE_TTL", 30.0))
+CACHE_ENABLED = os.getenv("QDRANT_CACHE_ENABLED", "true").lower() == "true"
+
+
+class _EndpointStats:
+    """Counters for one cached endpoint"""
+
+    def __init__(self):
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.errors = 0
+
+    def to_dict(self) -> Dict:
+        lookups = self.hits + self.stale_hits + self.misses + self.coalesced
+        return {
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+            "hit_ratio": round((self.hits + self.stale_hits + self.coalesced) / lookups, 3) if lookups else 0,
+        }
+
+
+class ResponseCache:
+    """
+    TTL cache keyed by request path
+
+    Concurrent misses for the same key share one upstream call. Entries
+    older than their TTL but younger than TTL + stale TTL are served
+    immediately while a single background refresh runs.
+    """
+
+    def __init__(self, ttls: Dict[str, float] = CACHE_TTLS, stale_ttl: float = CACHE_STALE_TTL, enabled: bool = CACHE_ENABLED):
+        self.ttls = ttls
+        self.stale_ttl = stale_ttl
+        self.enabled = enabled
+        self._entries: Dict[str, tuple] = {}  # key -> (stored_at, value)
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._generation = 0
+        self._stats: Dict[str, _EndpointStats] = {}
+
+    def _stats_for(self, name: str) -> _EndpointStats:
+        if name not in self._stats:
+            self._stats[name] = _EndpointStats()
+        return self._stats[name]
+
+    def _start_fetch(self, name: str, key: str, fetch: Callable[[], Awaitable]) -> asyncio.Task:
+        """Start one shared upstream call for key"""
+        generation = self._generation
+
+        async def run():
+            try:
+                value = await fetch()
+                # Do not store results that raced with an invalidation
+                if generation == self._generation:
+                    self._entries[key] = (time.monotonic(), value)
+                return value
+            except Exception:
+                self._stats_for(name).errors += 1
+                raise
+            finally:
+                # An invalidation may have replaced this call with a newer one
+                if self._inflight.get(key) is asyncio.current_task():
+                    del self._inflight[key]
+
+        task = asyncio.ensure_future(run())
+        self._inflight[key] = task
+        return task
+
+    async def get_or_fetch(self, name: str, key: str, fetch: Callable[[], Awaitable]):
+        """Get a cached response for key, calling fetch() at most once on a miss"""
+        if not self.enabled:
+            return await fetch()
+
+        stats = self._stats_for(name)
+        ttl = self.ttls.get(name, CACHE_DEFAULT_TTL)
+        entry = self._entries.get(key)
+
+        if entry is not None:
+            age = time.monotonic() - entry[0]
+            if age < ttl:
+                stats.hits += 1
+                return entry[1]
+            if age < ttl + self.stale_ttl:
+                stats.stale_hits += 1
+                if key not in self._inflight:
+                    task = self._start_fetch(name, key, fetch)
+                    # Background refresh errors are counted, the stale value stays
+                    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+                return entry[1]
+
+        task = self._inflight.get(key)
+        if task is not None:
+            stats.coalesced += 1
+        else:
+            stats.misses += 1
+            task = self._start_fetch(name, key, fetch)
+
+        # Shield so a cancelled caller does not cancel the shared call
+        return await asyncio.shield(task)
+
+    def invalidate(self, prefix: Optional[str] = None):
+        """
+        Drop entries whose key starts with prefix (all entries if None)
+
+        In-flight calls for those keys are detached too, so the next caller
+        starts a fresh fetch instead of joining one that began before the
+        change; the old call still finishes for its own callers but its
+        result is not stored.
+        """
+        self._generation += 1
+        if prefix is None:
+            self._entries.clear()
+            self._inflight.clear()
+            return
+        for key in [k for k in self._entries if k.startswith(prefix)]:
+            del self._entries[key]
+        for key in [k for k in self._inflight if k.startswith(prefix)]:
+            del self._inflight[key]
+
+    def stats(self) -> Dict:
+        """Get per-endpoint and overall cache statistics"""
+        endpoints = {name: s.to_dict() for name, s in self._stats.items()}
+        served = sum(s.hits + s.stale_hits + s.coalesced for s in self._stats.values())
+        lookups = served + sum(s.misses for s in self._stats.values())
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "hit_ratio": round(served / lookups, 3) if lookups else 0,
+            "endpoints": endpoints,
+        }
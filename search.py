@@ -0,0 +1,202 @@
+"""
+Search Helpers
+Server-side query embedding with an LRU cache of query vectors, so
+repeated queries skip model inference, and batched multi-collection search
+"""
+
+import asyncio
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ingestion import get_local_embedding_service
+from sparse import SPARSE_VECTOR_NAME, query_sparse_vector
+
+# Configuration
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", 2048))  # Query embeddings kept in memory
+SEARCH_DEFAULT_LIMIT = int(os.getenv("SEARCH_DEFAULT_LIMIT", 10))
+SEARCH_MAX_LIMIT = int(os.getenv("SEARCH_MAX_LIMIT", 100))
+SEARCH_SCORE_THRESHOLD = float(os.getenv("SEARCH_SCORE_THRESHOLD", 0)) or None  # 0 disables
+HYBRID_CANDIDATE_FACTOR = int(os.getenv("HYBRID_CANDIDATE_FACTOR", 4))  # Candidates per source = limit x factor
+SEARCH_BATCH_MAX = int(os.getenv("SEARCH_BATCH_MAX", 100))  # Searches per Qdrant search/batch request
+SEARCH_BATCH_CONCURRENCY = int(os.getenv("SEARCH_BATCH_CONCURRENCY", 8))  # Parallel search/batch requests
+SEARCH_PAYLOAD_FIELDS = ["filename", "text", "chunk_index", "chunk_total", "description", "metadata"]
+
+# Qdrant collection names: 1-255 characters without <>:"/\|?* or control
+# characters; whitespace, "#" and "%" are refused too since the name goes
+# into the request URL
+_COLLECTION_NAME_PATTERN = re.compile(r'[^<>:"/\\|?*#%\s\x00-\x1f]{1,255}')
+
+
+def normalize_query(query: str) -> str:
+    """Collapse whitespace so trivially different queries share a cache entry"""
+    return " ".join(query.split())
+
+
+def parse_fields(fields: Optional[str]) -> List[str]:
+    """Payload fields to return, from a comma separated list (default SEARCH_PAYLOAD_FIELDS)"""
+    if not fields:
+        return list(SEARCH_PAYLOAD_FIELDS)
+    return [field.strip() for field in fields.split(",") if field.strip()]
+
+
+class QueryEmbeddingCache:
+    """LRU cache of (model, normalized query) -> query vector"""
+
+    def __init__(self, max_size: int = QUERY_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries: "OrderedDict[Tuple[str, str], np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, model: str, query: str) -> Optional[np.ndarray]:
+        with self._lock:
+            vector = self._entries.get((model, query))
+            if vector is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((model, query))
+            self.hits += 1
+            return vector
+
+    def put(self, model: str, query: str, vector: np.ndarray):
+        with self._lock:
+            self._entries[(model, query)] = vector
+            self._entries.move_to_end((model, query))
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0
+        }
+
+
+query_cache = QueryEmbeddingCache()
+
+
+async def embed_query(query: str) -> Tuple[np.ndarray, bool]:
+    """
+    Embed a search query with the local EmbeddingService
+
+    Returns (vector, cached). Cache misses go through the service's
+    micro-batcher, so concurrent queries share encode batches.
+    """
+    service = await get_local_embedding_service()
+    query = normalize_query(query)
+    vector = query_cache.get(service.model_name, query)
+    if vector is not None:
+        return vector, True
+
+    vectors = await asyncio.wrap_future(service.batcher.submit([query]))
+    vector = vectors[0]
+    query_cache.put(service.model_name, query, vector)
+    return vector, False
+
+
+def build_search_request(
+    vector: np.ndarray,
+    limit: int,
+    fields: List[str],
+    score_threshold: Optional[float] = None
+) -> Dict:
+    """Qdrant points/search body with payload projection"""
+    body = {
+        "vector": vector.tolist(),
+        "limit": limit,
+        "with_payload": {"include": fields},
+        "with_vector": False
+    }
+    if score_threshold is not None:
+        body["score_threshold"] = score_threshold
+    return body
+
+
+def build_sparse_search_request(query: str, limit: int, fields: List[str]) -> Optional[Dict]:
+    """Qdrant points/search body for the BM25 sparse vector (None if the query has no terms)"""
+    indices, values = query_sparse_vector(query)
+    if not indices:
+        return None
+    return {
+        "vector": {"name": SPARSE_VECTOR_NAME, "vector": {"indices": indices, "values": values}},
+        "limit": limit,
+        "with_payload": {"include": fields},
+        "with_vector": False
+    }
+
+
+def hybrid_candidates(limit: int) -> int:
+    """Results fetched from each source before fusion"""
+    return max(limit * HYBRID_CANDIDATE_FACTOR, 20)
+
+
+def group_searches(searches: List[Dict]) -> Dict[str, List[Tuple[int, Dict]]]:
+    """
+    Group searches by collection, keeping their request positions
+
+    Each search is a Qdrant search body plus a "collection" key.
+    Raises ValueError for searches without a valid collection name or
+    without a vector.
+    """
+    groups: Dict[str, List[Tuple[int, Dict]]] = {}
+    for index, search in enumerate(searches):
+        if not isinstance(search, dict) or not search.get("collection"):
+            raise ValueError(f"searches[{index}]: collection is required")
+        collection = search["collection"]
+        if (
+            not isinstance(collection, str)
+            or collection in (".", "..")
+            or not _COLLECTION_NAME_PATTERN.fullmatch(collection)
+        ):
+            raise ValueError(f"searches[{index}]: invalid collection name")
+        if "vector" not in search:
+            raise ValueError(f"searches[{index}]: vector is required")
+        body = {key: value for key, value in search.items() if key != "collection"}
+        groups.setdefault(search["collection"], []).append((index, body))
+    return groups
+
+
+async def run_search_batch(
+    searches: List[Dict],
+    search_batch: Callable[[str, List[Dict]], Awaitable[List]],
+    concurrency: int = SEARCH_BATCH_CONCURRENCY
+) -> List[Dict]:
+    """
+    Run many searches as one Qdrant search/batch call per collection
+
+    search_batch(collection, bodies) returns one result list per body.
+    Collections (split into SEARCH_BATCH_MAX sized requests) run
+    concurrently; results come back in request order. A failed request
+    marks only its own searches with an error.
+    """
+    results: List[Optional[Dict]] = [None] * len(searches)
+    semaphore = asyncio.Semaphore(max(concurrency, 1))
+
+    async def run(collection: str, group: List[Tuple[int, Dict]]):
+        async with semaphore:
+            try:
+                batch_results = await search_batch(collection, [body for _, body in group])
+                for (index, _), points in zip(group, batch_results):
+                    results[index] = {"collection": collection, "result": points}
+            except Exception as e:
+                error = getattr(e, "detail", None) or str(e)
+                for index, _ in group:
+                    results[index] = {"collection": collection, "error": error}
+
+    requests = [
+        (collection, group[start:start + SEARCH_BATCH_MAX])
+        for collection, group in group_searches(searches).items()
+        for start in range(0, len(group), SEARCH_BATCH_MAX)
+    ]
+    await asyncio.gather(*(run(collection, group) for collection, group in requests))
+    return results
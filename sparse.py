@@ -0,0 +1,112 @@
+"""
+Sparse (BM25) Vectors
+Turkish-aware tokenizer, BM25 term weights for Qdrant sparse vectors and
+reciprocal rank fusion of dense and sparse search results
+"""
+
+import os
+import re
+import zlib
+from collections import Counter
+from typing import Dict, List, Tuple
+
+# Configuration
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "true").lower() == "true"  # Sparse vectors for new collections
+SPARSE_VECTOR_NAME = "bm25"
+BM25_K1 = float(os.getenv("BM25_K1", 1.2))
+BM25_B = float(os.getenv("BM25_B", 0.75))
+BM25_AVG_DOC_TOKENS = float(os.getenv("BM25_AVG_DOC_TOKENS", 80))  # Average terms per chunk
+STEM_PREFIX = 5  # Turkish words are truncated to their first 5 letters (F5 stemming)
+RRF_K = 60
+
+# Numbers keep their separators so "5/1", "6098" and "4.2" match exactly
+_TOKEN_PATTERN = re.compile(r"\d+(?:[./-]\d+)*|[^\W\d_]+", re.UNICODE)
+
+TURKISH_STOPWORDS = {
+    "acaba", "ama", "ancak", "bazı", "belki", "ben", "bir", "biri", "birkaç", "bu", "buna", "bunu",
+    "bunun", "çok", "çünkü", "da", "daha", "de", "değil", "diğer", "diye", "en", "gibi", "hem",
+    "hep", "her", "hiç", "için", "ile", "ise", "kadar", "ki", "kim", "mı", "mi", "mu", "mü", "nasıl",
+    "ne", "neden", "niye", "o", "olan", "olarak", "onu", "onun", "sonra", "şey", "şu", "tüm", "ve",
+    "veya", "ya", "yani", "yine",
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "is", "it", "of", "on",
+    "or", "that", "the", "this", "to", "was", "with",
+}
+
+
+def turkish_lower(text: str) -> str:
+    """Lowercase with Turkish dotted/dotless I rules"""
+    return text.replace("I", "ı").replace("İ", "i").lower()
+
+
+def tokenize(text: str) -> List[str]:
+    """Terms of text: Turkish-lowercased, stopwords removed, words stemmed to STEM_PREFIX letters"""
+    terms = []
+    for token in _TOKEN_PATTERN.findall(turkish_lower(text)):
+        if token[0].isdigit():
+            terms.append(token)
+        elif len(token) > 1 and token not in TURKISH_STOPWORDS:
+            terms.append(token[:STEM_PREFIX])
+    return terms
+
+
+def term_index(term: str) -> int:
+    """Stable uint32 index of a term"""
+    return zlib.crc32(term.encode("utf-8"))
+
+
+def _hashed_counts(terms: List[str]) -> Dict[int, float]:
+    counts: Dict[int, float] = {}
+    for term, count in Counter(terms).items():
+        index = term_index(term)
+        counts[index] = counts.get(index, 0) + count
+    return counts
+
+
+def document_sparse_vector(text: str) -> Tuple[List[int], List[float]]:
+    """
+    BM25 term-frequency weights of a chunk as (indices, values)
+
+    IDF is applied by Qdrant (sparse vector modifier "idf"), so the
+    weights only carry the saturated, length-normalized term frequency.
+    """
+    terms = tokenize(text)
+    length_norm = 1 - BM25_B + BM25_B * len(terms) / BM25_AVG_DOC_TOKENS
+    counts = _hashed_counts(terms)
+    indices = list(counts)
+    values = [tf * (BM25_K1 + 1) / (tf + BM25_K1 * length_norm) for tf in counts.values()]
+    return indices, values
+
+
+def query_sparse_vector(text: str) -> Tuple[List[int], List[float]]:
+    """Query terms as (indices, values), one weight per distinct term"""
+    indices = list(_hashed_counts(tokenize(text)))
+    return indices, [1.0] * len(indices)
+
+
+def sparse_vector_config() -> Dict:
+    """sparse_vectors section of a collection config"""
+    return {SPARSE_VECTOR_NAME: {"modifier": "idf"}}
+
+
+def reciprocal_rank_fusion(rankings: Dict[str, List[Dict]], limit: int, k: int = RRF_K) -> List[Dict]:
+    """
+    Fuse ranked Qdrant results with reciprocal rank fusion
+
+    rankings maps a source name (e.g. "dense", "sparse") to its results.
+    Fused points get score = sum(1 / (k + rank)) and the rank and score
+    they had in each source.
+    """
+    fused: Dict = {}
+    for source, points in rankings.items():
+        for rank, point in enumerate(points, start=1):
+            entry = fused.get(point["id"])
+            if entry is None:
+                entry = fused[point["id"]] = {
+                    "id": point["id"],
+                    "score": 0.0,
+                    "payload": point.get("payload") or {},
+                    "sources": {}
+                }
+            entry["score"] += 1.0 / (k + rank)
+            entry["sources"][source] = {"rank": rank, "score": point["score"]}
+    return sorted(fused.values(), key=lambda entry: entry["score"], reverse=True)[:limit]
@@ -214,10 +214,19 @@ async function handleUploadDocument(e) {
 
         if (response.ok) {
             const result = await response.json();
-            addLog('Belge basariyla yuklendi: ' + result.file_name);
-            alert('Belge basariyla yuklendi!\n\nDosya: ' + result.file_name + '\nBoyut: ' + result.size_mb + ' MB');
+            addLog('Belge kuyruga alindi: ' + result.file_name + ' (is: ' + result.job_id + ')');
             closeUploadModal();
 
+            // Embedding runs in the background, poll the job until it finishes
+            const job = await waitForJob(result.job_id);
+            if (job.status === 'completed') {
+                addLog('Belge basariyla yuklendi: ' + job.filename + ' (' + job.chunks_upserted + ' chunk)');
+                alert('Belge basariyla yuklendi!\n\nDosya: ' + job.filename + '\nBoyut: ' + result.size_mb + ' MB');
+            } else {
+                addLog('Belge yukleme hatasi: ' + job.error);
+                alert('Hata: ' + job.error);
+            }
+
             // Refresh customers list
             await fetchCustomers();
             await fetchCustomerStats();
@@ -232,6 +241,34 @@ async function handleUploadDocument(e) {
     }
 }
 
+async function waitForJob(jobId, intervalMs = 2000, maxWaitMs = 30 * 60 * 1000) {
+    let lastProgress = null;
+    const deadline = Date.now() + maxWaitMs;
+    while (true) {
+        const response = await fetch(`/api/jobs/${jobId}`);
+        if (!response.ok) {
+            const error = await response.json().catch(() => ({}));
+            throw new Error('Is durumu alinamadi (' + response.status + '): ' + (error.detail || response.statusText));
+        }
+        const job = await response.json();
+
+        if (job.status === 'completed' || job.status === 'failed') {
+            return job;
+        }
+
+        if (job.chunks_total && job.progress_percent !== lastProgress) {
+            lastProgress = job.progress_percent;
+            addLog(`Embedding: ${job.filename} ${job.chunks_upserted}/${job.chunks_total} chunk (%${job.progress_percent})`);
+        }
+
+        if (Date.now() > deadline) {
+            throw new Error('Is ' + jobId + ' hala suruyor, durumu /api/jobs/' + jobId + ' adresinden izlenebilir');
+        }
+
+        await new Promise(resolve => setTimeout(resolve, intervalMs));
+    }
+}
+
 // ============================================
 // Delete Customer
 // ============================================
@@ -174,33 +174,20 @@ async function fetchQdrantStatus() {
 async function fetchCollections() {
     console.log('🔄 fetchCollections() called');
     try {
-        const response = await fetch('/api/qdrant/collections');
+        // One request for all collections and their details (server fans out, ETag-cached)
+        const response = await fetch('/api/qdrant/collections/overview?fields=points_count,config');
         console.log('📡 Collections API response:', response.status);
         if (response.ok) {
             const data = await response.json();
             console.log('📦 Collections data:', data);
-            const collections = data.result?.collections || [];
-
-            // Fetch detailed info for each collection
-            const detailedCollections = await Promise.all(
-                collections.map(async (col) => {
-                    try {
-                        const detailResponse = await fetch(`/api/qdrant/collections/${col.name}`);
-                        if (detailResponse.ok) {
-                            const detailData = await detailResponse.json();
-                            return {
-                                name: col.name,
-                                points_count: detailData.result?.points_count || 0,
-                                vectors_count: detailData.result?.points_count || 0,
-                                config: detailData.result?.config || {}
-                            };
-                        }
-                    } catch (err) {
-                        console.error(`Failed to fetch details for ${col.name}:`, err);
-                    }
-                    return { name: col.name, points_count: 0, vectors_count: 0, config: {} };
-                })
-            );
+            const collections = data.collections || [];
+
+            const detailedCollections = collections.map(col => ({
+                name: col.name,
+                points_count: col.points_count || 0,
+                vectors_count: col.points_count || 0,
+                config: col.config || {}
+            }));
 
             displayCollections(detailedCollections);
             document.getElementById('stat-collections').textContent = collections.length;
@@ -0,0 +1,392 @@
+"""
+Storage Backend
+SQLite storage for customers and users, safe to share between uvicorn workers
+"""
+
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+# Configuration
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "sqlite").lower()  # "sqlite" or "json"
+DATABASE_FILE = Path(os.getenv("DATABASE_FILE", Path(__file__).parent / "data" / "dashboard.db"))
+
+CUSTOMER_COLUMNS = (
+    "customer_id",
+    "name",
+    "email",
+    "quota_mb",
+    "used_mb",
+    "collection_name",
+    "created_at",
+    "active",
+    "document_count",
+    "last_upload",
+)
+
+CUSTOMER_DEFAULTS = {
+    "quota_mb": 100,
+    "used_mb": 0.0,
+    "active": True,
+    "document_count": 0,
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS customers (
+    customer_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    email TEXT NOT NULL,
+    quota_mb INTEGER NOT NULL DEFAULT 100,
+    used_mb REAL NOT NULL DEFAULT 0,
+    collection_name TEXT NOT NULL,
+    created_at TEXT,
+    active INTEGER NOT NULL DEFAULT 1,
+    document_count INTEGER NOT NULL DEFAULT 0,
+    last_upload TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_customers_collection ON customers(collection_name);
+CREATE INDEX IF NOT EXISTS idx_customers_email ON customers(email COLLATE NOCASE);
+
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS documents (
+    customer_id TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    chunks INTEGER NOT NULL DEFAULT 0,
+    first_point_id TEXT,
+    last_point_id TEXT,
+    bytes INTEGER NOT NULL DEFAULT 0,
+    description TEXT,
+    embedding_model TEXT,
+    uploaded_at TEXT,
+    PRIMARY KEY (customer_id, filename)
+);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def write_json_atomic(path: Path, data):
+    """Write JSON to a temp file in the same directory and rename it over path"""
+    path = Path(path)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class SQLiteDatabase:
+    """SQLite database in WAL mode with one connection per thread"""
+
+    def __init__(self, path: Path = DATABASE_FILE, schema: str = SCHEMA):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self.connection().executescript(schema)
+
+    def connection(self) -> sqlite3.Connection:
+        """Get this thread's connection"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        """Run statements in one write transaction"""
+        conn = self.connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def get_meta(self, key: str) -> Optional[str]:
+        """Get a metadata value"""
+        row = self.connection().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row["value"] if row else None
+
+    def set_meta(self, key: str, value: str):
+        """Set a metadata value"""
+        self.connection().execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, value)
+        )
+
+    def import_json(self, path: Path, importer: Callable[[object], None]) -> bool:
+        """
+        Import a JSON file through importer(data) if the file changed
+        since it was last imported (tracked by mtime and size)
+        """
+        path = Path(path)
+        if not path.exists():
+            return False
+
+        stat = path.stat()
+        stamp = f"{stat.st_mtime_ns}:{stat.st_size}"
+        key = f"imported:{path.name}"
+        if self.get_meta(key) == stamp:
+            return False
+
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f"[!] Could not import {path.name}: {e}")
+            return False
+
+        importer(data)
+        self.set_meta(key, stamp)
+        print(f"[*] Imported {path.name} into {self.path.name}")
+        return True
+
+
+def _customer_from_row(row: sqlite3.Row) -> Dict:
+    """Convert a customers row to a customer dict"""
+    data = dict(row)
+    data["active"] = bool(data["active"])
+    return data
+
+
+class SQLiteCustomerStore:
+    """Customer records in SQLite with indexed lookups and atomic counters"""
+
+    def __init__(self, db: SQLiteDatabase):
+        self.db = db
+
+    def _fetch_one(self, where: str, value) -> Optional[Dict]:
+        row = self.db.connection().execute(
+            f"SELECT * FROM customers WHERE {where} LIMIT 1", (value,)
+        ).fetchone()
+        return _customer_from_row(row) if row else None
+
+    def get(self, customer_id: str) -> Optional[Dict]:
+        return self._fetch_one("customer_id = ?", customer_id)
+
+    def get_by_collection(self, collection_name: str) -> Optional[Dict]:
+        return self._fetch_one("collection_name = ?", collection_name)
+
+    def get_by_email(self, email: str) -> Optional[Dict]:
+        return self._fetch_one("email = ? COLLATE NOCASE", email)
+
+    def all(self) -> List[Dict]:
+        rows = self.db.connection().execute("SELECT * FROM customers ORDER BY created_at").fetchall()
+        return [_customer_from_row(row) for row in rows]
+
+    def _upsert(self, conn: sqlite3.Connection, record: Dict):
+        values = [record.get(column, CUSTOMER_DEFAULTS.get(column)) for column in CUSTOMER_COLUMNS]
+        conn.execute(
+            f"INSERT OR REPLACE INTO customers ({', '.join(CUSTOMER_COLUMNS)}) "
+            f"VALUES ({', '.join('?' for _ in CUSTOMER_COLUMNS)})",
+            values
+        )
+
+    def insert(self, record: Dict):
+        with self.db.transaction() as conn:
+            self._upsert(conn, record)
+
+    def upsert_many(self, records: List[Dict]):
+        with self.db.transaction() as conn:
+            for record in records:
+                self._upsert(conn, record)
+
+    def import_new(self, records: List[Dict]) -> int:
+        """
+        Insert customers from customers.json that were never imported before
+
+        Existing rows are left alone so live counters (used_mb,
+        document_count, last_upload) are not reset by a stale file, and
+        customers deleted through the API are not brought back. Returns
+        the number of customers inserted.
+        """
+        seen = set(json.loads(self.db.get_meta("imported:customer_ids") or "[]"))
+        inserted = 0
+        with self.db.transaction() as conn:
+            for record in records:
+                if record["customer_id"] in seen:
+                    continue
+                values = [record.get(column, CUSTOMER_DEFAULTS.get(column)) for column in CUSTOMER_COLUMNS]
+                cursor = conn.execute(
+                    f"INSERT OR IGNORE INTO customers ({', '.join(CUSTOMER_COLUMNS)}) "
+                    f"VALUES ({', '.join('?' for _ in CUSTOMER_COLUMNS)})",
+                    values
+                )
+                inserted += cursor.rowcount
+        seen.update(record["customer_id"] for record in records)
+        self.db.set_meta("imported:customer_ids", json.dumps(sorted(seen)))
+        return inserted
+
+    def replace_all(self, records: List[Dict]):
+        with self.db.transaction() as conn:
+            conn.execute("DELETE FROM customers")
+            for record in records:
+                self._upsert(conn, record)
+
+    def update(self, customer_id: str, updates: Dict) -> bool:
+        fields = {k: v for k, v in updates.items() if k in CUSTOMER_COLUMNS and k != "customer_id"}
+        if not fields:
+            return self.get(customer_id) is not None
+
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        cursor = self.db.connection().execute(
+            f"UPDATE customers SET {assignments} WHERE customer_id = ?",
+            [*fields.values(), customer_id]
+        )
+        return cursor.rowcount > 0
+
+    def delete(self, customer_id: str) -> bool:
+        cursor = self.db.connection().execute("DELETE FROM customers WHERE customer_id = ?", (customer_id,))
+        return cursor.rowcount > 0
+
+    def add_usage(self, customer_id: str, mb: float, timestamp: str) -> bool:
+        """Atomically add usage unless it would exceed the quota"""
+        cursor = self.db.connection().execute(
+            "UPDATE customers SET used_mb = ROUND(used_mb + ?, 2), last_upload = ? "
+            "WHERE customer_id = ? AND used_mb + ? <= quota_mb",
+            (mb, timestamp, customer_id, mb)
+        )
+        return cursor.rowcount > 0
+
+    def increment_document_count(self, customer_id: str, timestamp: str) -> bool:
+        """Atomically increment the document count"""
+        cursor = self.db.connection().execute(
+            "UPDATE customers SET document_count = document_count + 1, last_upload = ? "
+            "WHERE customer_id = ?",
+            (timestamp, customer_id)
+        )
+        return cursor.rowcount > 0
+
+    def flush(self):
+        """Writes are committed immediately"""
+        pass
+
+
+class SQLiteUserStore:
+    """Dashboard users in SQLite, stored as JSON documents keyed by username"""
+
+    def __init__(self, db: SQLiteDatabase):
+        self.db = db
+
+    def load(self) -> Dict[str, Dict]:
+        rows = self.db.connection().execute("SELECT username, data FROM users").fetchall()
+        return {row["username"]: json.loads(row["data"]) for row in rows}
+
+    def upsert_many(self, users: Dict[str, Dict]):
+        with self.db.transaction() as conn:
+            for username, user in users.items():
+                conn.execute(
+                    "INSERT OR REPLACE INTO users (username, data) VALUES (?, ?)",
+                    (username, json.dumps(user, ensure_ascii=False))
+                )
+
+    def replace_all(self, users: Dict[str, Dict]):
+        with self.db.transaction() as conn:
+            conn.execute("DELETE FROM users")
+            for username, user in users.items():
+                conn.execute(
+                    "INSERT INTO users (username, data) VALUES (?, ?)",
+                    (username, json.dumps(user, ensure_ascii=False))
+                )
+
+
+DOCUMENT_COLUMNS = (
+    "filename",
+    "chunks",
+    "first_point_id",
+    "last_point_id",
+    "bytes",
+    "description",
+    "embedding_model",
+    "uploaded_at",
+)
+
+
+class SQLiteDocumentIndex:
+    """Per-customer document manifest in SQLite"""
+
+    def __init__(self, db: SQLiteDatabase):
+        self.db = db
+
+    def list(self, customer_id: str) -> List[Dict]:
+        rows = self.db.connection().execute(
+            f"SELECT {', '.join(DOCUMENT_COLUMNS)} FROM documents WHERE customer_id = ? ORDER BY uploaded_at",
+            (customer_id,)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def record_upload(self, customer_id: str, document: Dict):
+        """Add an uploaded document, accumulating chunks and bytes if the filename exists"""
+        self.db.connection().execute(
+            f"INSERT INTO documents (customer_id, {', '.join(DOCUMENT_COLUMNS)}) "
+            f"VALUES (?, {', '.join('?' for _ in DOCUMENT_COLUMNS)}) "
+            "ON CONFLICT(customer_id, filename) DO UPDATE SET "
+            "chunks = chunks + excluded.chunks, "
+            "first_point_id = COALESCE(MIN(first_point_id, excluded.first_point_id), excluded.first_point_id), "
+            "last_point_id = COALESCE(MAX(last_point_id, excluded.last_point_id), excluded.last_point_id), "
+            "bytes = bytes + excluded.bytes, "
+            "description = excluded.description, "
+            "embedding_model = excluded.embedding_model, "
+            "uploaded_at = excluded.uploaded_at",
+            [customer_id, *(document.get(column) for column in DOCUMENT_COLUMNS)]
+        )
+
+    def replace_customer(self, customer_id: str, documents: List[Dict]):
+        """Replace a customer's manifest (used by reconcile)"""
+        with self.db.transaction() as conn:
+            conn.execute("DELETE FROM documents WHERE customer_id = ?", (customer_id,))
+            for document in documents:
+                conn.execute(
+                    f"INSERT INTO documents (customer_id, {', '.join(DOCUMENT_COLUMNS)}) "
+                    f"VALUES (?, {', '.join('?' for _ in DOCUMENT_COLUMNS)})",
+                    [customer_id, *(document.get(column) for column in DOCUMENT_COLUMNS)]
+                )
+
+    def drop_customer(self, customer_id: str):
+        self.db.connection().execute("DELETE FROM documents WHERE customer_id = ?", (customer_id,))
+
+    def totals(self) -> Dict:
+        row = self.db.connection().execute(
+            "SELECT COUNT(*) AS documents, COALESCE(SUM(chunks), 0) AS chunks, "
+            "COALESCE(SUM(bytes), 0) AS bytes FROM documents"
+        ).fetchone()
+        return {"documents": row["documents"], "chunks": row["chunks"], "bytes": row["bytes"]}
+
+
+# Global instance
+_database = None
+_database_lock = threading.Lock()
+
+
+def get_database() -> SQLiteDatabase:
+    """Get or create global SQLite database instance"""
+    global _database
+    with _database_lock:
+        if _database is None:
+            _database = SQLiteDatabase()
+    return _database
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Chunking time and allocations on a 500-page document
+Compares chunking.chunk_segments over the page stream with the previous
+EmbeddingService.chunk_text (512-character windows with rfind, run on the
+whole text built with `text += page`). Peak allocations are measured with
+tracemalloc, time as the best of BENCH_REPEAT runs.
+
+Uses the model tokenizer if transformers is installed, else the regex
+fallback (printed at start). chunk_text never tokenizes, so the
+"tokenize only" row shows how much of chunk_segments is the tokenizer pass
+(the model tokenizes every chunk again at encode time anyway).
+
+Usage: python tests/bench_chunking.py
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_DIR))
+
+from check_onnx_quality import SAMPLE_TEXTS  # noqa: E402
+
+PAGES = int(os.getenv("BENCH_PAGES", 500))
+SENTENCES_PER_PAGE = 40  # ~3 KB per page, like a dense legal PDF page
+BENCH_REPEAT = 3
+
+OLD_CHUNK_SIZE = 512
+OLD_CHUNK_OVERLAP = 50
+
+
+def old_chunk_text(text: str, chunk_size: int = OLD_CHUNK_SIZE, overlap: int = OLD_CHUNK_OVERLAP):
+    """EmbeddingService.chunk_text before the token-aware chunker"""
+    if len(text) <= chunk_size:
+        return [text]
+
+    chunks = []
+    start = 0
+
+    while start < len(text):
+        end = start + chunk_size
+        chunk = text[start:end]
+
+        # Try to break at sentence boundary
+        if end < len(text):
+            last_period = chunk.rfind('.')
+            last_newline = chunk.rfind('\n')
+            break_point = max(last_period, last_newline)
+
+            if break_point > chunk_size * 0.5:  # At least 50% of chunk
+                chunk = text[start:start + break_point + 1]
+                end = start + break_point + 1
+
+        chunks.append(chunk.strip())
+        start = end - overlap
+
+    return [c for c in chunks if c]  # Remove empty chunks
+
+
+def build_pages() -> list:
+    pages = []
+    for page in range(PAGES):
+        lines = [f"Sayfa {page + 1}"]
+        for i in range(SENTENCES_PER_PAGE):
+            sentence = SAMPLE_TEXTS[(page * 7 + i) % len(SAMPLE_TEXTS)]
+            lines.append(f"Madde {page * SENTENCES_PER_PAGE + i}. {sentence}")
+        pages.append("\n".join(lines) + "\n")
+    return pages
+
+
+def old_pipeline(pages: list) -> list:
+    text = ""
+    for page in pages:
+        text += page
+    return old_chunk_text(text)
+
+
+def new_pipeline(pages: list) -> list:
+    from chunking import chunk_segments
+
+    return [chunk.text for chunk in chunk_segments(iter(pages))]
+
+
+def tokenize_only(pages: list) -> list:
+    """The tokenizer pass inside chunk_segments, for its share of the time"""
+    from chunking import get_tokenizer
+
+    tokenizer = get_tokenizer()
+    return [tokenizer.offsets(page) for page in pages]
+
+
+def measure(pipeline, pages: list) -> dict:
+    best = float("inf")
+    for _ in range(BENCH_REPEAT):
+        started = time.perf_counter()
+        chunks = pipeline(pages)
+        best = min(best, time.perf_counter() - started)
+
+    tracemalloc.start()
+    pipeline(pages)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"seconds": best, "peak": peak, "chunks": len(chunks)}
+
+
+def main():
+    from chunking import get_chunk_max_tokens, get_tokenizer
+
+    pages = build_pages()
+    total_chars = sum(len(page) for page in pages)
+    tokenizer = type(get_tokenizer()).__name__
+    print(f"[*] {PAGES} pages, {total_chars / 2**20:.1f} MB of text; tokenizer {tokenizer}, "
+          f"{get_chunk_max_tokens()} tokens per chunk")
+
+    for name, pipeline in (
+        ("chunk_text", old_pipeline),
+        ("chunk_segments", new_pipeline),
+        ("tokenize only", tokenize_only),
+    ):
+        report = measure(pipeline, pages)
+        print(f"[*] {name:15s} {report['seconds'] * 1000:8.1f} ms, peak allocations "
+              f"{report['peak'] / 2**20:6.1f} MB, {report['chunks']} chunks/pages")
+
+
+if __name__ == "__main__":
+    main()
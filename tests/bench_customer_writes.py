@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Concurrent customer writes: SQLite store vs customers.json
+10k customers are seeded, then several processes (standing in for uvicorn
+workers) record uploads on random customers at the same time. Reports
+throughput and how many document_count increments were lost.
+
+Usage: python tests/bench_customer_writes.py
+(BENCH_CUSTOMERS / BENCH_WORKERS / BENCH_UPLOADS_PER_WORKER override the sizes)
+
+Measured with 4 x 250 uploads: sqlite ~10k uploads/s, none lost; json
+(one write per change) ~2.5 uploads/s, ~75% lost; json coalesced ~770
+uploads/s, ~75% lost.
+"""
+
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_DIR))
+
+CUSTOMERS = int(os.getenv("BENCH_CUSTOMERS", 10_000))
+WORKERS = int(os.getenv("BENCH_WORKERS", 4))
+UPLOADS_PER_WORKER = int(os.getenv("BENCH_UPLOADS_PER_WORKER", 50))  # json rewrites ~2 MB per change
+
+
+def seed_records():
+    from customer_manager import Customer
+
+    records = []
+    for i in range(CUSTOMERS):
+        customer = Customer(f"c{i:05d}", f"Customer {i}", f"customer{i}@example.com", quota_mb=10**6)
+        records.append(customer.to_dict())
+    return records
+
+
+def open_store(backend: str, path: Path):
+    from customer_manager import JSONCustomerStore
+    from storage import SQLiteCustomerStore, SQLiteDatabase
+
+    if backend == "sqlite":
+        return SQLiteCustomerStore(SQLiteDatabase(path))
+    if backend == "json":
+        return JSONCustomerStore(path, write_delay=0)  # One write per change
+    return JSONCustomerStore(path)  # Coalesced write-behind (CUSTOMERS_WRITE_DELAY)
+
+
+def record_uploads(backend: str, path: Path, worker: int):
+    """Worker process: what upload_document does per successful upload"""
+    store = open_store(backend, path)
+    rng = random.Random(worker)
+    for _ in range(UPLOADS_PER_WORKER):
+        customer_id = f"c{rng.randrange(CUSTOMERS):05d}"
+        timestamp = time.strftime("%Y-%m-%dT%H:%M:%S")
+        store.add_usage(customer_id, 0.01, timestamp)
+        store.increment_document_count(customer_id, timestamp)
+    store.flush()
+
+
+def run(backend: str, path: Path, records) -> dict:
+    store = open_store(backend, path)
+    store.replace_all(records)
+    store.flush()
+
+    processes = [
+        multiprocessing.Process(target=record_uploads, args=(backend, path, worker))
+        for worker in range(WORKERS)
+    ]
+    started = time.perf_counter()
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - started
+
+    store = open_store(backend, path)
+    counted = sum(c.get("document_count", 0) for c in store.all())
+    expected = WORKERS * UPLOADS_PER_WORKER
+    return {
+        "elapsed": elapsed,
+        "uploads_per_s": expected / elapsed,
+        "lost": expected - counted,
+        "expected": expected,
+    }
+
+
+def main():
+    records = seed_records()
+    print(f"[*] {CUSTOMERS} customers, {WORKERS} processes x {UPLOADS_PER_WORKER} uploads")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend, path in (
+            ("sqlite", Path(tmp) / "dashboard.db"),
+            ("json", Path(tmp) / "customers.json"),
+            ("json-coalesced", Path(tmp) / "customers-coalesced.json"),
+        ):
+            report = run(backend, path, records)
+            print(f"[*] {backend:15s} {report['elapsed']:7.2f}s  {report['uploads_per_s']:9.1f} uploads/s  "
+                  f"lost {report['lost']}/{report['expected']} document_count increments")
+
+
+if __name__ == "__main__":
+    main()
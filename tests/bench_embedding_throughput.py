@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Local embedding throughput with concurrent uploads
+Concurrent uploads embed their chunks three ways and the script reports
+chunks/s plus the event loop lag seen meanwhile:
+
+- per-call: each upload runs model.encode on its own chunks in a thread
+  of the API process (before micro-batching)
+- batched-thread: MicroBatcher merging uploads, model in the API process
+- batched-process: EmbeddingService (MicroBatcher feeding the dedicated
+  encoder process)
+
+Needs the local embedding stack (sentence-transformers). The embedding
+cache is bypassed so every chunk is encoded.
+
+Usage: python tests/bench_embedding_throughput.py
+"""
+
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_DIR))
+sys.path.insert(0, str(REPO_DIR / "tests"))
+
+from bench_upload_event_loop import bucket_quantile, format_bound, lag_snapshot  # noqa: E402
+from check_onnx_quality import SAMPLE_TEXTS  # noqa: E402
+
+UPLOADS = int(os.getenv("BENCH_UPLOADS", 16))  # Concurrent uploads
+CHUNKS_PER_UPLOAD = int(os.getenv("BENCH_CHUNKS_PER_UPLOAD", 32))
+LAG_PROBE_INTERVAL = 0.01
+
+
+def upload_chunks(upload: int) -> list:
+    """Distinct chunk-like texts of one upload"""
+    return [
+        f"Madde {upload}.{i}: " + " ".join(SAMPLE_TEXTS[(upload + i + k) % len(SAMPLE_TEXTS)] for k in range(4))
+        for i in range(CHUNKS_PER_UPLOAD)
+    ]
+
+
+async def measure(embed) -> dict:
+    """Run all uploads concurrently through embed(texts) in threads"""
+    from metrics import monitor_event_loop_lag
+
+    uploads = [upload_chunks(upload) for upload in range(UPLOADS)]
+    monitor = asyncio.create_task(monitor_event_loop_lag(LAG_PROBE_INTERVAL))
+    await asyncio.sleep(LAG_PROBE_INTERVAL * 5)
+    before = lag_snapshot()
+    started = time.perf_counter()
+    results = await asyncio.gather(*(asyncio.to_thread(embed, texts) for texts in uploads))
+    elapsed = time.perf_counter() - started
+    await asyncio.sleep(LAG_PROBE_INTERVAL * 2)
+    after = lag_snapshot()
+    monitor.cancel()
+
+    chunks = sum(len(vectors) for vectors in results)
+    probes = int(after["count"] - before["count"])
+    return {
+        "chunks_per_s": chunks / elapsed,
+        "elapsed": elapsed,
+        "lag_mean": (after["sum"] - before["sum"]) / max(probes, 1),
+        "lag_max": bucket_quantile(before, after, 1.0),
+    }
+
+
+def main():
+    from embedding_service import EMBEDDING_BATCH_SIZE, EmbeddingService, MicroBatcher, load_sentence_model
+
+    print(f"[*] {UPLOADS} concurrent uploads x {CHUNKS_PER_UPLOAD} chunks, "
+          f"micro-batches of up to {EMBEDDING_BATCH_SIZE}")
+
+    model, _ = load_sentence_model()
+    model.encode(["warmup"], convert_to_numpy=True)
+    batcher = MicroBatcher(lambda texts: model.encode(texts, batch_size=EMBEDDING_BATCH_SIZE, convert_to_numpy=True))
+    service = EmbeddingService()
+    service.batcher.submit(["warmup"]).result()
+
+    modes = (
+        ("per-call", lambda texts: model.encode(texts, convert_to_numpy=True)),
+        ("batched-thread", lambda texts: batcher.submit(texts).result()),
+        ("batched-process", lambda texts: service.batcher.submit(texts).result()),
+    )
+    try:
+        for name, embed in modes:
+            report = asyncio.run(measure(embed))
+            print(f"[*] {name:16s} {report['chunks_per_s']:8.1f} chunks/s ({report['elapsed']:.2f}s), "
+                  f"event loop lag mean {report['lag_mean'] * 1000:.1f} ms, max {format_bound(report['lag_max'])}")
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
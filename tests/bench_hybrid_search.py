@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Recall and latency of dense, sparse (BM25) and hybrid search
+Indexes the Turkish legal fixture corpus (tests/fixtures/turkish_legal.json)
+in an in-memory Qdrant (or BENCH_QDRANT_URL) with the same sparse vectors
+and dense model as uploads, runs the fixture queries in each mode the way
+/api/customers/{id}/search does, and reports recall@k, MRR and per-query
+latency (query embedding included).
+
+Dense and hybrid need the local embedding model (sentence-transformers);
+without it only sparse is measured.
+
+Usage: python tests/bench_hybrid_search.py
+"""
+
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_DIR))
+
+FIXTURE = REPO_DIR / "tests" / "fixtures" / "turkish_legal.json"
+QDRANT_LOCATION = os.getenv("BENCH_QDRANT_URL", ":memory:")
+COLLECTION = "bench_hybrid"
+RECALL_AT = (1, 5)
+
+
+def load_dense_model():
+    """The local embedding model, or None if the embedding stack is not installed"""
+    try:
+        from embedding_service import load_sentence_model
+        return load_sentence_model()[0]
+    except Exception as e:
+        print(f"[!] Local embedding model unavailable, measuring sparse only: {e}")
+        return None
+
+
+def to_query_request(body: dict):
+    """A points/search body built by search.py as a Query API request"""
+    from qdrant_client import models
+
+    vector = body["vector"]
+    if isinstance(vector, dict):
+        query = models.SparseVector(**vector["vector"])
+        return models.QueryRequest(query=query, using=vector["name"], limit=body["limit"], with_payload=True)
+    return models.QueryRequest(query=vector, limit=body["limit"], with_payload=True)
+
+
+async def index_corpus(client, documents: list, model):
+    from qdrant_client import models
+    from ingestion import build_collection_config
+    from sparse import SPARSE_VECTOR_NAME, document_sparse_vector, sparse_vector_config
+
+    texts = [document["text"] for document in documents]
+    sparse = [
+        models.SparseVector(indices=indices, values=values)
+        for indices, values in map(document_sparse_vector, texts)
+    ]
+    sparse_config = {name: models.SparseVectorParams(**params) for name, params in sparse_vector_config().items()}
+    vectors = {SPARSE_VECTOR_NAME: sparse}
+    vectors_config = {}
+    if model is not None:
+        dense = model.encode(texts, convert_to_numpy=True)
+        vectors[""] = dense.tolist()
+        vectors_config = models.VectorParams(**build_collection_config(dense.shape[1])["vectors"])
+
+    if await client.collection_exists(COLLECTION):
+        await client.delete_collection(COLLECTION)
+    await client.create_collection(COLLECTION, vectors_config=vectors_config, sparse_vectors_config=sparse_config)
+    await client.upsert(COLLECTION, points=models.Batch(
+        ids=list(range(len(documents))),
+        vectors=vectors,
+        payloads=[{"doc": document["doc"], "text": document["text"]} for document in documents]
+    ), wait=True)
+
+
+async def search(client, model, mode: str, query: str, limit: int) -> list:
+    """Ranked fixture doc ids for a query, as the customer search endpoint ranks them"""
+    from search import build_search_request, build_sparse_search_request, hybrid_candidates
+    from sparse import reciprocal_rank_fusion
+
+    candidates = hybrid_candidates(limit) if mode == "hybrid" else limit
+    searches = {}
+    if mode in ("dense", "hybrid"):
+        vector = model.encode([query], convert_to_numpy=True)[0]
+        searches["dense"] = build_search_request(vector, candidates, ["doc"])
+    if mode in ("sparse", "hybrid"):
+        sparse_search = build_sparse_search_request(query, candidates, ["doc"])
+        if sparse_search is not None:
+            searches["sparse"] = sparse_search
+
+    responses = await client.query_batch_points(COLLECTION, requests=[to_query_request(body) for body in searches.values()])
+    rankings = {
+        source: [{"id": point.id, "score": point.score, "payload": point.payload} for point in response.points]
+        for source, response in zip(searches, responses)
+    }
+    if mode == "hybrid":
+        results = reciprocal_rank_fusion(rankings, limit)
+    else:
+        results = rankings.get(mode, [])
+    return [point["payload"]["doc"] for point in results[:limit]]
+
+
+async def evaluate(client, model, mode: str, queries: list) -> dict:
+    limit = max(RECALL_AT)
+    recalls = {k: [] for k in RECALL_AT}
+    reciprocal_ranks = []
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        ranked = await search(client, model, mode, query["query"], limit)
+        latencies.append(time.perf_counter() - started)
+
+        relevant = set(query["relevant"])
+        for k in RECALL_AT:
+            recalls[k].append(len(relevant & set(ranked[:k])) / len(relevant))
+        first_hit = next((rank for rank, doc in enumerate(ranked, start=1) if doc in relevant), None)
+        reciprocal_ranks.append(1 / first_hit if first_hit else 0.0)
+
+    return {
+        "recall": {k: statistics.mean(values) for k, values in recalls.items()},
+        "mrr": statistics.mean(reciprocal_ranks),
+        "latency_mean": statistics.mean(latencies),
+        "latency_p95": sorted(latencies)[int(len(latencies) * 0.95) - 1],
+    }
+
+
+async def run():
+    from qdrant_client import AsyncQdrantClient
+
+    with open(FIXTURE, 'r', encoding='utf-8') as f:
+        fixture = json.load(f)
+    model = load_dense_model()
+    if model is not None:
+        model.encode(["warmup"], convert_to_numpy=True)
+
+    client = AsyncQdrantClient(location=QDRANT_LOCATION) if QDRANT_LOCATION == ":memory:" else AsyncQdrantClient(
+        url=QDRANT_LOCATION, api_key=os.getenv("QDRANT_API_KEY"))
+    try:
+        await index_corpus(client, fixture["documents"], model)
+        print(f"[*] {len(fixture['documents'])} documents, {len(fixture['queries'])} queries, Qdrant {QDRANT_LOCATION}")
+
+        modes = ("dense", "sparse", "hybrid") if model is not None else ("sparse",)
+        for mode in modes:
+            report = await evaluate(client, model, mode, fixture["queries"])
+            recalls = ", ".join(f"recall@{k} {report['recall'][k]:.2f}" for k in RECALL_AT)
+            print(f"[*] {mode:7s} {recalls}, MRR {report['mrr']:.2f}, latency mean "
+                  f"{report['latency_mean'] * 1000:.1f} ms, p95 {report['latency_p95'] * 1000:.1f} ms")
+    finally:
+        if QDRANT_LOCATION != ":memory:":
+            await client.delete_collection(COLLECTION)
+        await client.close()
+
+
+def main():
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
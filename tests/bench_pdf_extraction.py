@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+PDF extraction speedup on a several-hundred-page PDF
+Generates a text PDF and times the previous sequential extractor
+(`text += page.extract_text()`) against pdf_pages.iter_pdf_pages for
+several PDF_EXTRACT_WORKERS values. The time to the first page shows how
+soon chunking can start. Each range task re-opens the PDF, so that cost
+is part of the measured time.
+
+Usage: python tests/bench_pdf_extraction.py [file.pdf]
+(a generated BENCH_PAGES-page PDF is used when no file is given)
+"""
+
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_DIR))
+
+from check_onnx_quality import SAMPLE_TEXTS  # noqa: E402
+
+PAGES = int(os.getenv("BENCH_PAGES", 400))
+LINES_PER_PAGE = 60
+
+
+def write_text_pdf(path: Path, pages: int):
+    """Minimal PDF with LINES_PER_PAGE lines of Helvetica text per page"""
+    ascii_texts = [
+        text.translate(str.maketrans("çğıöşüÇĞİÖŞÜ", "cgiosuCGIOSU")).replace("(", "").replace(")", "")
+        for text in SAMPLE_TEXTS
+    ]
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # Pages, filled in once the page objects are numbered
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_ids = []
+    for page in range(pages):
+        lines = [f"Sayfa {page + 1}"] + [
+            f"Madde {page * LINES_PER_PAGE + i}. {ascii_texts[(page + i) % len(ascii_texts)]}"
+            for i in range(LINES_PER_PAGE - 1)
+        ]
+        content = "BT /F1 9 Tf 40 810 Td 13 TL " + " ".join(f"({line}) '" for line in lines) + " ET"
+        stream = content.encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        page_ids.append(len(objects))
+    kids = b" ".join(b"%d 0 R" % page_id for page_id in page_ids)
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+
+    body = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(len(body))
+        body += b"%d 0 obj\n%s\nendobj\n" % (number, obj)
+    xref = len(body)
+    body += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    body += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    body += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    path.write_bytes(bytes(body))
+
+
+def old_extract(file_path: str) -> str:
+    """DocumentProcessor.extract_text_from_pdf before page-parallel extraction"""
+    import PyPDF2
+
+    with open(file_path, 'rb') as file:
+        reader = PyPDF2.PdfReader(file)
+        text = ""
+        for page in reader.pages:
+            text += page.extract_text() + "\n"
+        return text.strip()
+
+
+def time_iter_pdf_pages(file_path: str, workers: int) -> tuple:
+    """(seconds to the first page, total seconds, characters) with `workers` extraction processes"""
+    import pdf_pages
+
+    pdf_pages.PDF_EXTRACT_WORKERS = workers
+    pdf_pages._pdf_executor = None
+    executor = pdf_pages.get_pdf_executor()
+    # Start the workers before timing, as a running API process would have them
+    list(executor.map(abs, range(workers)))
+
+    started = time.perf_counter()
+    first_page = None
+    chars = 0
+    for page in pdf_pages.iter_pdf_pages(file_path):
+        if first_page is None:
+            first_page = time.perf_counter() - started
+        chars += len(page)
+    elapsed = time.perf_counter() - started
+    executor.shutdown()
+    return first_page, elapsed, chars
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        if len(sys.argv) > 1:
+            file_path = sys.argv[1]
+        else:
+            file_path = str(Path(tmp) / "bench.pdf")
+            write_text_pdf(Path(file_path), PAGES)
+
+        from pdf_pages import PDF_PAGES_PER_TASK, pdf_page_count
+
+        cpus = os.cpu_count() or 1
+        print(f"[*] {pdf_page_count(file_path)} pages, {cpus} CPUs, {PDF_PAGES_PER_TASK} pages per task")
+
+        started = time.perf_counter()
+        old_chars = len(old_extract(file_path))
+        old_seconds = time.perf_counter() - started
+        print(f"[*] sequential (old)   {old_seconds:6.2f}s total, first page only after all pages, "
+              f"{old_chars} chars")
+
+        for workers in sorted({1, 2, max(cpus - 1, 1), cpus}):
+            first_page, elapsed, chars = time_iter_pdf_pages(file_path, workers)
+            print(f"[*] iter_pdf_pages x{workers:<2d} {elapsed:6.2f}s total, first page after "
+                  f"{first_page:.2f}s, {chars} chars, speedup {old_seconds / elapsed:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Event loop lag during a 5k-chunk n8n upload
+Runs metrics.monitor_event_loop_lag next to the upload path and reports the
+scheduling delay other dashboard requests would see: the old path (whole
+response parsed, one synchronous QdrantClient.upsert of PointStructs)
+against the current one (streamed parsing, BatchUpserter on an async client).
+
+The fake Qdrant clients serialize each request body as JSON, as the real
+client does, and wait QDRANT_LATENCY_S per request (blocking for the
+synchronous client, awaited for the async one).
+
+Usage: python tests/bench_upload_event_loop.py
+
+Measured: the CPU work (parsing, serializing) is about the same on both
+paths, but the old one blocks the loop in one ~6 s stretch while the
+current one hands it back between batches (mean lag ~35 ms, max <= 500 ms).
+"""
+
+import asyncio
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_DIR))
+sys.path.insert(0, str(REPO_DIR / "tests"))
+
+from test_upload_memory import RESPONSE_CHUNK_BYTES, FakeN8NResponse  # noqa: E402
+
+POINTS = int(os.getenv("BENCH_POINTS", 5000))
+DIMENSIONS = int(os.getenv("BENCH_DIMENSIONS", 1536))
+QDRANT_LATENCY_S = float(os.getenv("BENCH_QDRANT_LATENCY_S", 0.05))
+LAG_PROBE_INTERVAL = 0.01
+
+
+class PrebuiltN8NResponse:
+    """
+    n8n response whose body is generated up front, so building it is not
+    counted as loop lag; chunks arrive with a yield to the loop like socket reads
+    """
+
+    def __init__(self, body: bytes):
+        self.body = body
+
+    async def aiter_bytes(self):
+        for start in range(0, len(self.body), RESPONSE_CHUNK_BYTES):
+            await asyncio.sleep(0)
+            yield self.body[start:start + RESPONSE_CHUNK_BYTES]
+
+    async def aread(self) -> bytes:
+        await asyncio.sleep(0)
+        return self.body
+
+
+def build_body() -> bytes:
+    fake = FakeN8NResponse(POINTS, DIMENSIONS)
+    return b"".join(fake._items())
+
+
+class BlockingQdrantClient:
+    """Synchronous client: serializes and waits on the calling thread"""
+
+    def upsert(self, collection_name, points, wait=True):
+        json.dumps([point.model_dump() for point in points])
+        time.sleep(QDRANT_LATENCY_S)
+
+
+class AsyncQdrantClientStub:
+    """Async client: serializes on the loop, awaits the round trip"""
+
+    async def upsert(self, collection_name, points, wait=True):
+        json.dumps(points.model_dump())
+        await asyncio.sleep(QDRANT_LATENCY_S)
+
+
+async def old_upload(response):
+    """upload_document before batching: response.json(), PointStructs, one upsert"""
+    from qdrant_client.models import PointStruct
+
+    result = json.loads(await response.aread())
+    points = [
+        PointStruct(id=item["id"], vector=item["embedding"], payload={"text": item["text"]})
+        for item in result["embeddings"]
+    ]
+    BlockingQdrantClient().upsert(collection_name="bench", points=points)
+    return len(points)
+
+
+async def current_upload(response):
+    """run_ingestion_job: streamed parsing into BatchUpserter"""
+    from ingestion import BatchUpserter, iter_n8n_embeddings
+
+    upserter = BatchUpserter(AsyncQdrantClientStub(), "bench")
+    async for item in iter_n8n_embeddings(response):
+        await upserter.add(item["id"], item["embedding"], {"text": item["text"]})
+    await upserter.finish()
+    return upserter.points_upserted
+
+
+def lag_snapshot() -> dict:
+    """Cumulative bucket counts, count and sum of the event loop lag histogram"""
+    from metrics import EVENT_LOOP_LAG_HISTOGRAM
+
+    snapshot = {"buckets": {}}
+    for sample in EVENT_LOOP_LAG_HISTOGRAM.collect()[0].samples:
+        if sample.name.endswith("_bucket"):
+            snapshot["buckets"][float(sample.labels["le"])] = sample.value
+        elif sample.name.endswith("_count"):
+            snapshot["count"] = sample.value
+        elif sample.name.endswith("_sum"):
+            snapshot["sum"] = sample.value
+    return snapshot
+
+
+def bucket_quantile(before: dict, after: dict, quantile: float) -> float:
+    """Upper bound of the bucket holding the given quantile of new probes"""
+    count = after["count"] - before["count"]
+    for bound in sorted(after["buckets"]):
+        if after["buckets"][bound] - before["buckets"][bound] >= quantile * count:
+            return bound
+    return float("inf")
+
+
+async def measure(upload, body: bytes) -> dict:
+    from metrics import monitor_event_loop_lag
+
+    monitor = asyncio.create_task(monitor_event_loop_lag(LAG_PROBE_INTERVAL))
+    await asyncio.sleep(LAG_PROBE_INTERVAL * 5)
+    before = lag_snapshot()
+    started = time.perf_counter()
+    upserted = await upload(PrebuiltN8NResponse(body))
+    elapsed = time.perf_counter() - started
+    await asyncio.sleep(LAG_PROBE_INTERVAL * 2)  # Let the probe blocked by the upload report
+    after = lag_snapshot()
+    monitor.cancel()
+
+    probes = int(after["count"] - before["count"])
+    return {
+        "upserted": upserted,
+        "elapsed": elapsed,
+        "probes": probes,
+        "lag_total": after["sum"] - before["sum"],
+        "lag_mean": (after["sum"] - before["sum"]) / max(probes, 1),
+        "lag_p99": bucket_quantile(before, after, 0.99),
+        "lag_max": bucket_quantile(before, after, 1.0),
+    }
+
+
+def format_bound(seconds: float) -> str:
+    if seconds == float("inf"):
+        largest = max(bound for bound in lag_snapshot()["buckets"] if bound != float("inf"))
+        return f"> {largest * 1000:.0f} ms"
+    return f"<= {seconds * 1000:.0f} ms"
+
+
+def main():
+    import ingestion  # noqa: F401  (imports are not part of the measured time)
+    import metrics  # noqa: F401
+
+    body = build_body()
+
+    print(f"[*] {POINTS} chunks x {DIMENSIONS} dims, {QDRANT_LATENCY_S * 1000:.0f} ms per Qdrant request, "
+          f"probe every {LAG_PROBE_INTERVAL * 1000:.0f} ms")
+    for name, upload in (("old", old_upload), ("current", current_upload)):
+        report = asyncio.run(measure(upload, body))
+        print(f"[*] {name:8s} {report['elapsed']:6.2f}s upload, {report['upserted']} points; "
+              f"loop blocked {report['lag_total']:.2f}s over {report['probes']} probes, "
+              f"mean lag {report['lag_mean'] * 1000:.1f} ms, p99 {format_bound(report['lag_p99'])}, "
+              f"max {format_bound(report['lag_max'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Memory and time per 10k chunks from encode output to upsert request body
+Compares the previous path (embeddings.tolist(), one PointStruct per chunk,
+one upsert of all points) with the current one (NumPy rows into
+BatchUpserter, Batch objects built with vector_batch per upsert batch).
+Both serialize the request bodies as JSON, as the Qdrant client does.
+Peak allocations are measured with tracemalloc.
+
+Usage: python tests/bench_vector_batches.py
+"""
+
+import asyncio
+import json
+import os
+import sys
+import time
+import tracemalloc
+import uuid
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_DIR))
+
+import numpy as np  # noqa: E402
+
+CHUNKS = int(os.getenv("BENCH_CHUNKS", 10_000))
+DIMENSIONS = int(os.getenv("BENCH_DIMENSIONS", 384))  # paraphrase-multilingual-MiniLM-L12-v2
+
+
+class SerializingQdrantClient:
+    """Serializes each upsert body and discards it"""
+
+    def __init__(self):
+        self.body_bytes = 0
+
+    async def upsert(self, collection_name, points, wait=True):
+        self.body_bytes += len(json.dumps(points.model_dump()))
+
+
+def old_path(ids, embeddings, payloads) -> int:
+    from qdrant_client.models import PointStruct
+
+    vectors = embeddings.tolist()
+    points = [
+        PointStruct(id=point_id, vector=vector, payload=payload)
+        for point_id, vector, payload in zip(ids, vectors, payloads)
+    ]
+    return len(json.dumps([point.model_dump() for point in points]))
+
+
+def current_path(ids, embeddings, payloads) -> int:
+    from ingestion import BatchUpserter
+
+    async def run():
+        client = SerializingQdrantClient()
+        upserter = BatchUpserter(client, "bench")
+        for index, point_id in enumerate(ids):
+            await upserter.add(point_id, embeddings[index], payloads[index])
+        await upserter.finish()
+        return client.body_bytes
+
+    return asyncio.run(run())
+
+
+def measure(path, ids, embeddings, payloads) -> dict:
+    started = time.perf_counter()
+    path(ids, embeddings, payloads)
+    seconds = time.perf_counter() - started
+
+    tracemalloc.start()
+    body_bytes = path(ids, embeddings, payloads)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"seconds": seconds, "peak": peak, "body_bytes": body_bytes}
+
+
+def main():
+    import ingestion  # noqa: F401  (imports are not part of the measurement)
+    from ingestion import UPSERT_BATCH_SIZE, UPSERT_CONCURRENCY
+
+    rng = np.random.default_rng(0)
+    embeddings = rng.standard_normal((CHUNKS, DIMENSIONS), dtype=np.float32)
+    ids = [str(uuid.UUID(int=index)) for index in range(CHUNKS)]
+    payloads = [{"text": f"Madde {index}: kira bedeli her ayın beşinde ödenir.", "chunk_index": index}
+                for index in range(CHUNKS)]
+
+    print(f"[*] {CHUNKS} chunks x {DIMENSIONS} dims ({embeddings.nbytes / 2**20:.1f} MB as float32), "
+          f"batches of {UPSERT_BATCH_SIZE}, {UPSERT_CONCURRENCY} in flight")
+    for name, path in (("PointStruct list", old_path), ("Batch + vector_batch", current_path)):
+        report = measure(path, ids, embeddings, payloads)
+        print(f"[*] {name:21s} {report['seconds']:6.2f}s, peak allocations {report['peak'] / 2**20:7.1f} MB, "
+              f"{report['body_bytes'] / 2**20:.1f} MB of request bodies")
+
+
+if __name__ == "__main__":
+    main()
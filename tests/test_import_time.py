@@ -0,0 +1,45 @@
+"""
+Startup regression test
+`python -X importtime -c "import app"` in a fresh interpreter must not pull
+in the optional embedding stack and must stay within a time budget
+"""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+HEAVY_MODULES = {"torch", "sentence_transformers", "transformers", "onnxruntime", "PyPDF2", "docx"}
+IMPORT_TIME_BUDGET_S = float(os.getenv("IMPORT_TIME_BUDGET_S", 5))  # Generous; catches heavy imports creeping back
+
+
+def import_app_with_importtime(tmp_path) -> dict:
+    """Cumulative import time in microseconds per module imported by `import app`"""
+    env = dict(os.environ, DATABASE_FILE=str(tmp_path / "dashboard.db"), EMBEDDING_WARMUP="false")
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"],
+        cwd=REPO_DIR, env=env, capture_output=True, text=True, timeout=120
+    )
+    assert completed.returncode == 0, completed.stderr
+
+    modules = {}
+    for line in completed.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = int(cumulative)
+    return modules
+
+
+def test_import_app_skips_embedding_stack(tmp_path):
+    modules = import_app_with_importtime(tmp_path)
+    loaded = {name.split(".")[0] for name in modules} & HEAVY_MODULES
+    assert not loaded, f"importing app pulled in {sorted(loaded)}"
+
+
+def test_import_app_within_budget(tmp_path):
+    modules = import_app_with_importtime(tmp_path)
+    seconds = modules["app"] / 1_000_000
+    assert seconds < IMPORT_TIME_BUDGET_S, f"import app took {seconds:.2f}s (budget {IMPORT_TIME_BUDGET_S}s)"
@@ -0,0 +1,123 @@
+"""
+Peak RSS of the n8n ingestion path
+A ~60 MB n8n response is parsed and upserted in a fresh interpreter; peak
+RSS must grow by a bounded amount (buffered parsing needs several times
+the body size)
+"""
+
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+POINTS = 4000
+DIMENSIONS = 1536
+RESPONSE_CHUNK_BYTES = 64 * 1024
+MAX_RSS_GROWTH_MB = 32  # Streaming holds a few upsert batches (~14 MB measured)
+
+
+class FakeN8NResponse:
+    """Streams an n8n embeddings response without ever holding all of it"""
+
+    def __init__(self, points: int, dimensions: int):
+        self.points = points
+        self.dimensions = dimensions
+        self.body_bytes = 0
+
+    def _items(self):
+        yield b'{"success": true, "embeddings": ['
+        for i in range(self.points):
+            item = {
+                "id": f"00000000-0000-0000-0000-{i:012d}",
+                "text": f"chunk {i} " * 20,
+                "embedding": [round(((i * 31 + d) % 997) / 997 - 0.5, 6) for d in range(self.dimensions)],
+                "chunk_index": i,
+                "chunk_total": self.points
+            }
+            yield (b"," if i else b"") + json.dumps(item).encode()
+        yield b"]}"
+
+    async def aiter_bytes(self):
+        buffer = b""
+        for part in self._items():
+            buffer += part
+            if len(buffer) >= RESPONSE_CHUNK_BYTES:
+                self.body_bytes += len(buffer)
+                yield buffer
+                buffer = b""
+        self.body_bytes += len(buffer)
+        yield buffer
+
+    async def aread(self) -> bytes:
+        """Whole body, used when ijson is not installed"""
+        return b"".join([chunk async for chunk in self.aiter_bytes()])
+
+
+class DiscardingQdrantClient:
+    """Accepts upserts and keeps only a count"""
+
+    def __init__(self):
+        self.points = 0
+
+    async def upsert(self, collection_name, points, wait=True):
+        self.points += len(points.ids)
+        await asyncio.sleep(0)
+
+
+def peak_rss_bytes() -> int:
+    """Peak resident set size of this process (Linux reports KB)"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+async def ingest(response, client) -> int:
+    from ingestion import BatchUpserter, iter_n8n_embeddings
+
+    upserter = BatchUpserter(client, "memory_test", batch_size=64, concurrency=2)
+    async for item in iter_n8n_embeddings(response):
+        await upserter.add(item["id"], item["embedding"], {"text": item["text"]})
+    await upserter.finish()
+    return upserter.points_upserted
+
+
+def measure():
+    """Child process: ingest a large response and report RSS figures as JSON"""
+    import ingestion  # noqa: F401  (imports are not part of the measured growth)
+
+    asyncio.run(ingest(FakeN8NResponse(8, DIMENSIONS), DiscardingQdrantClient()))
+    baseline = peak_rss_bytes()
+
+    response = FakeN8NResponse(POINTS, DIMENSIONS)
+    client = DiscardingQdrantClient()
+    upserted = asyncio.run(ingest(response, client))
+    print(json.dumps({
+        "baseline": baseline,
+        "peak": peak_rss_bytes(),
+        "body_bytes": response.body_bytes,
+        "upserted": upserted,
+        "received": client.points
+    }))
+
+
+def test_n8n_ingestion_peak_rss_is_bounded(tmp_path):
+    env = dict(os.environ, DATABASE_FILE=str(tmp_path / "dashboard.db"))
+    completed = subprocess.run(
+        [sys.executable, __file__],
+        cwd=REPO_DIR, env=env, capture_output=True, text=True, timeout=600
+    )
+    assert completed.returncode == 0, completed.stderr
+    report = json.loads(completed.stdout.strip().splitlines()[-1])
+
+    assert report["upserted"] == report["received"] == POINTS
+    growth = report["peak"] - report["baseline"]
+    assert growth < MAX_RSS_GROWTH_MB * 2**20, (
+        f"peak RSS grew by {growth / 2**20:.1f} MB for a {report['body_bytes'] / 2**20:.1f} MB response"
+    )
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, str(REPO_DIR))
+    measure()